@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import exc as sa_exc
+
+from metrics import metrics
+
+# 请求优先级，数值越小越优先：过载时低优先级先被限流、先被拒绝
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = ("high", "normal", "low")
+
+# 当前请求的优先级，由 PriorityMiddleware 按路由设置，准入控制在数据库调用处读取
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_NORMAL)
+
+ADMISSION_REJECTED = metrics.counter(
+    "db_admission_rejected_total", "数据库过载时被拒绝的调用数", ("limiter", "priority", "reason"))
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "db_admission_wait_seconds", "数据库调用排队等待准入的耗时", ("limiter",))
+
+# 视为数据库过载信号的异常：连接池签出超时、连接/锁等待类错误
+_OVERLOAD_ERRORS = (sa_exc.TimeoutError, sa_exc.OperationalError, asyncio.TimeoutError)
+
+
+class Overloaded(Exception):
+    """
+    数据库过载，调用被拒绝（排队已满或排队超时），接口应返回 503 并带 Retry-After
+    """
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    自适应并发限制（AIMD）：数据库调用耗时低于目标时并发上限缓慢加一，超过目标或出现过载错误时按比例下调
+    超过上限的调用按优先级排队，等待有界（超时即拒绝），队列满时挤掉更低优先级的等待者；
+    低优先级只能使用上限的一部分，写请求堆积时读请求仍有余量
+    所有方法都在事件循环线程中调用，无需加锁
+    """
+
+    def __init__(self, name: str, initial_limit: int = 10, min_limit: int = 2, max_limit: int = 100,
+                 latency_target: float = 0.25, backoff: float = 0.9, max_wait: float = 0.5, max_queue: int = 100,
+                 priority_shares: Sequence[float] = (1.0, 0.9, 0.6)):
+        """
+        @param {str} name - 名称（指标标签）
+        @param {int} initial_limit - 初始并发上限
+        @param {int} min_limit - 并发上限下限
+        @param {int} max_limit - 并发上限上限（一般为连接池容量）
+        @param {float} latency_target - 目标耗时秒数，超过视为数据库变慢
+        @param {float} backoff - 下调比例
+        @param {float} max_wait - 排队最长等待秒数
+        @param {int} max_queue - 最多排队调用数
+        @param {Sequence[float]} priority_shares - 各优先级可使用的并发上限比例
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.priority_shares = tuple(priority_shares)
+        self._limit = float(min(max(initial_limit, min_limit), self.max_limit))
+        self._in_flight = 0
+        # 等待者小顶堆: [优先级, 序号, future]
+        self._waiters: List[list] = []
+        self._seq = itertools.count()
+        self._last_drop = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.evicted = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _capacity(self, priority: int) -> int:
+        share = self.priority_shares[min(priority, len(self.priority_shares) - 1)]
+        return max(1, int(self.limit * share))
+
+    def retry_after(self) -> int:
+        """
+        建议的重试秒数：按平均耗时估算排队中的调用全部完成所需时间，至少1秒
+        """
+        latency = self.latency_ewma or self.latency_target
+        return max(1, math.ceil(latency * (self.queued + 1) / self.limit))
+
+    def _overloaded(self, priority: int, reason: str) -> Overloaded:
+        self.rejected += 1
+        ADMISSION_REJECTED.inc((self.name, PRIORITY_NAMES[min(priority, len(PRIORITY_NAMES) - 1)], reason))
+        return Overloaded(f"数据库繁忙（{reason}），请稍后重试", self.retry_after())
+
+    async def acquire(self, priority: Optional[int] = None) -> None:
+        """
+        申请一个并发名额，名额不足时排队
+        @param {int} priority - 优先级，默认取当前请求的 request_priority
+        @throws {Overloaded} 队列已满或排队超时
+        """
+        priority = request_priority.get() if priority is None else priority
+        waiting_ahead = any(not f.done() and p <= priority for p, _, f in self._waiters)
+        if not waiting_ahead and self._in_flight < self._capacity(priority):
+            self._in_flight += 1
+            self.admitted += 1
+            return
+
+        live = [entry for entry in self._waiters if not entry[2].done()]
+        if len(live) >= self.max_queue:
+            worst = max(live, key=lambda entry: (entry[0], entry[1]))
+            if worst[0] <= priority:
+                raise self._overloaded(priority, "queue_full")
+            # 挤掉优先级最低、最晚进入的等待者
+            self.evicted += 1
+            worst[2].set_exception(self._overloaded(worst[0], "evicted"))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, [priority, next(self._seq), future])
+        self.queued_total += 1
+        timer = loop.call_later(self.max_wait, self._expire, future, priority)
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已分到名额后才被取消，归还名额
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            timer.cancel()
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, (self.name,))
+
+    def _expire(self, future: asyncio.Future, priority: int) -> None:
+        if not future.done():
+            self.timeouts += 1
+            future.set_exception(self._overloaded(priority, "timeout"))
+
+    def release(self, latency: float, overloaded: bool = False, feedback: bool = True) -> None:
+        """
+        归还名额并根据本次耗时调整并发上限
+        @param {float} latency - 本次调用耗时秒数
+        @param {bool} overloaded - 是否出现过载类错误
+        @param {bool} feedback - 是否按本次耗时调整上限，为False时只有过载错误会下调上限
+        """
+        self._in_flight -= 1
+        if not feedback and not overloaded:
+            self._wake()
+            return
+        self.latency_ewma = latency if self.latency_ewma is None else self.latency_ewma * 0.9 + latency * 0.1
+        now = time.monotonic()
+        if overloaded or latency > self.latency_target:
+            # 每个目标耗时窗口最多下调一次，避免同一批慢调用把上限连续压到底
+            if now - self._last_drop >= self.latency_target:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_drop = now
+        elif self._in_flight + 1 >= self._limit / 2:
+            # 只有并发确实用到上限一半以上时才加，空闲时上限不会无限上涨
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._in_flight >= self._capacity(priority):
+                break
+            heapq.heappop(self._waiters)
+            self._in_flight += 1
+            self.admitted += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None, feedback: bool = True):
+        """
+        占用一个名额执行数据库调用，退出时按耗时及是否出现过载错误调整上限
+        用法: async with limiter.slot(): ...
+        @param {int} priority - 优先级，默认取当前请求的 request_priority
+        @param {bool} feedback - 是否按占用时长调整上限；流式查询等占用时长取决于客户端消费速度的调用应传 False
+        """
+        await self.acquire(priority)
+        start = time.perf_counter()
+        overloaded = False
+        try:
+            yield
+        except _OVERLOAD_ERRORS:
+            overloaded = True
+            raise
+        finally:
+            self.release(time.perf_counter() - start, overloaded, feedback)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        准入控制统计
+        @returns {Dict[str, Any]} 当前上限、执行中、排队数、累计准入/排队/拒绝/超时/被挤掉次数及平均耗时
+        """
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "evicted": self.evicted,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 3) if self.latency_ewma is not None else None,
+        }
+
+
+class PriorityMiddleware:
+    """
+    纯ASGI中间件：按请求路径设置 request_priority（精确匹配，其次按路径前缀，如 /test7 匹配 /test7/2）
+    """
+
+    def __init__(self, app, priorities: Dict[str, int], default: int = PRIORITY_NORMAL):
+        self.app = app
+        self.priorities = priorities
+        self.default = default
+
+    def lookup(self, path: str) -> int:
+        path = path.rstrip("/") or "/"
+        while path:
+            priority = self.priorities.get(path)
+            if priority is not None:
+                return priority
+            path = path.rsplit("/", 1)[0]
+        return self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = request_priority.set(self.lookup(scope["path"]))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_priority.reset(token)
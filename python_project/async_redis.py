@@ -1,6 +1,11 @@
+import asyncio
 import logging
+import os
+import time
+import weakref
 from logging.handlers import TimedRotatingFileHandler
 from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Optional
 
 # 日志配置
 log_handler = TimedRotatingFileHandler(
@@ -13,42 +18,201 @@ logger.addHandler(log_handler)
 
 
 from redis import asyncio as aioredis
+from redis.asyncio.client import Pipeline
+
+import settings
+from instrumentation import REDIS_COMMAND_SECONDS
+from profiler import span
+
+# 所有实例，fork 后在子进程中统一重置
+_instances: "weakref.WeakSet[AsyncRedisServer]" = weakref.WeakSet()
+
+
+class _TimedPipeline(Pipeline):
+    """
+    记录整个管道一次往返耗时的管道
+    """
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            with span("redis.PIPELINE"):
+                return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_SECONDS.observe(time.perf_counter() - start, ("PIPELINE",))
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """
+    记录每条命令往返耗时的Redis客户端
+    """
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            with span(f"redis.{command}"):
+                return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.observe(time.perf_counter() - start, (command,))
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
 
 class AsyncRedisServer:
-    def __init__(self):
-        self.redis_url = "redis://:abcd@127.0.0.1:6379/4"
+    def __init__(self, redis_url: str = "redis://:abcd@127.0.0.1:6379/4", max_connections: int = 50,
+                 health_check_interval: int = 30, socket_timeout: float = 5, socket_connect_timeout: float = 5,
+                 drain_timeout: float = 10, pool_timeout: float = 2):
+        """
+        @param {str} redis_url - Redis连接地址
+        @param {int} max_connections - 连接池最大连接数，连接都在使用中时等待归还（最多 pool_timeout 秒）而不是直接报错
+        @param {int} health_check_interval - 空闲连接超过该秒数后，下次使用前先做健康检查
+        @param {float} socket_timeout - 命令读写超时秒数
+        @param {float} socket_connect_timeout - 建立连接超时秒数
+        @param {float} drain_timeout - 关闭时等待在用连接归还的最长秒数
+        @param {float} pool_timeout - 连接池已满时等待空闲连接的最长秒数
+        """
+        self.redis_url = redis_url
+        self.max_connections = max_connections
+        self.health_check_interval = health_check_interval
+        self.socket_timeout = socket_timeout
+        self.socket_connect_timeout = socket_connect_timeout
+        self.drain_timeout = drain_timeout
+        self.pool_timeout = pool_timeout
+        self.pool = None
         self.redis = None
-        
+        self._in_use = 0
+        self._closing = False
+        _instances.add(self)
+
     async def connect(self):
         """
-        连接Redis服务器
+        创建长连接池并连接Redis服务器，重复调用不会重建连接池
         @returns {None}
         """
         if self.redis is None:
-            self.redis = await aioredis.from_url(self.redis_url)
-            logger.info("Redis连接已建立")
+            self.pool = aioredis.BlockingConnectionPool.from_url(
+                self.redis_url,
+                max_connections=self.max_connections,
+                timeout=self.pool_timeout,
+                health_check_interval=self.health_check_interval,
+                socket_timeout=self.socket_timeout,
+                socket_connect_timeout=self.socket_connect_timeout,
+                retry_on_timeout=True,
+            )
+            self.redis = InstrumentedRedis(connection_pool=self.pool)
+            self._closing = False
+            logger.info(f"Redis连接池已建立: max_connections={self.max_connections}")
+
+    def reset_after_fork(self):
+        """
+        fork 后在子进程中调用：丢弃父进程的连接池（不断开，父进程仍在使用），子进程需重新 connect
+        @returns {None}
+        """
+        self.pool = None
+        self.redis = None
+        self._in_use = 0
+        self._closing = False
 
     async def close(self):
         """
-        关闭Redis连接
+        优雅关闭：先等待在用的连接归还（最多 drain_timeout 秒），再断开连接池
         @returns {None}
         """
-        if self.redis is not None:
-            await self.redis.close()
-            self.redis = None
-            logger.info("Redis连接已关闭")
-            
+        if self.redis is None:
+            return
+        self._closing = True
+        deadline = time.monotonic() + self.drain_timeout
+        while self._in_use > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._in_use > 0:
+            logger.warning(f"Redis连接池关闭时仍有 {self._in_use} 个请求未完成")
+        redis, pool = self.redis, self.pool
+        self.redis = None
+        self.pool = None
+        close = getattr(redis, "aclose", None) or redis.close
+        await close()
+        await pool.disconnect()
+        # 关闭后仍可通过 get_redis 按需重新连接
+        self._closing = False
+        logger.info("Redis连接池已关闭")
+
     @asynccontextmanager
     async def get_redis(self):
         """
-        获取Redis连接的异步上下文管理器
-        @returns {aioredis.Redis} Redis连接实例
+        获取Redis客户端的异步上下文管理器，复用长连接池，退出时不会关闭连接
+        @returns {aioredis.Redis} Redis客户端实例
         """
+        if self._closing:
+            raise RuntimeError("Redis连接池正在关闭")
         await self.connect()
+        self._in_use += 1
         try:
             yield self.redis
         finally:
-            await self.close()
+            self._in_use -= 1
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = True):
+        """
+        获取管道，多条命令一次往返发送；transaction为True时以 MULTI/EXEC 事务执行
+        调用方在上下文内自行 await pipe.execute() 获取结果
+        @param {bool} transaction - 是否使用事务
+        @returns {aioredis.client.Pipeline} 管道对象
+        """
+        async with self.get_redis() as redis:
+            async with redis.pipeline(transaction=transaction) as pipe:
+                yield pipe
+
+    async def get_many(self, keys: Iterable[str]) -> List[Optional[bytes]]:
+        """
+        批量获取多个键的值（MGET，一次往返）
+        @param {Iterable[str]} keys - 键列表
+        @returns {List[Optional[bytes]]} 与键顺序一致的值列表，不存在的键为None
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        async with self.get_redis() as redis:
+            return await redis.mget(keys)
+
+    async def set_many(self, mapping: Dict[str, Any], ex: Optional[int] = None, transaction: bool = False) -> List[Any]:
+        """
+        批量设置多个键值，可统一设置过期时间（管道，一次往返）
+        @param {Dict[str, Any]} mapping - 键值字典
+        @param {int} ex - 过期秒数，None表示不过期
+        @param {bool} transaction - 是否以事务方式执行
+        @returns {List[Any]} 每条命令的执行结果
+        """
+        if not mapping:
+            return []
+        async with self.pipeline(transaction=transaction) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ex)
+            return await pipe.execute()
+
+    async def execute_batch(self, commands: Iterable[tuple], transaction: bool = True) -> List[Any]:
+        """
+        在一个管道中批量执行任意命令
+        @param {Iterable[tuple]} commands - 命令列表，如 [("incr", "a"), ("expire", "a", 10)]
+        @param {bool} transaction - 是否以事务方式执行
+        @returns {List[Any]} 每条命令的执行结果
+        """
+        async with self.pipeline(transaction=transaction) as pipe:
+            for command, *args in commands:
+                pipe.execute_command(command.upper(), *args)
+            return await pipe.execute()
 
 # 创建全局实例
-async_redis_server = AsyncRedisServer()
+async_redis_server = AsyncRedisServer(settings.REDIS_URL, max_connections=settings.redis_max_connections(),
+                                      pool_timeout=settings.REDIS_POOL_TIMEOUT_MS / 1000)
+
+
+def _reset_after_fork():
+    for server in list(_instances):
+        server.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
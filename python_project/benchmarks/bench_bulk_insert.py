@@ -0,0 +1,46 @@
+"""
+批量插入基准：对比 executemany 与分块多行 bulk_insert 写入 users 表的耗时
+运行: cd python_project && python benchmarks/bench_bulk_insert.py [数据库地址] [行数]
+默认写入本地SQLite临时文件 100万 行；对MySQL请传入 mysql+pymysql://... 地址
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import MySQLServer
+
+
+def _reset(server: MySQLServer) -> None:
+    server.execute("DROP TABLE IF EXISTS users_bulk_bench")
+    if server.engine.dialect.name == "mysql":
+        server.execute("CREATE TABLE users_bulk_bench (id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(64), age INT)")
+    else:
+        server.execute("CREATE TABLE users_bulk_bench (id INTEGER PRIMARY KEY, name VARCHAR(64), age INT)")
+
+
+def main(database_url: str, rows: int) -> None:
+    server = MySQLServer(database_url=database_url)
+    data = [{"name": f"user{i}", "age": i % 100} for i in range(rows)]
+
+    _reset(server)
+    start = time.perf_counter()
+    server.executemany("INSERT INTO users_bulk_bench (name, age) VALUES (:name, :age)", data)
+    executemany_s = time.perf_counter() - start
+
+    _reset(server)
+    start = time.perf_counter()
+    result = server.bulk_insert("users_bulk_bench", data, chunk_size=5000)
+    bulk_s = time.perf_counter() - start
+
+    print(f"rows={rows}")
+    print(f"executemany: {executemany_s:8.2f} s")
+    print(f"bulk_insert: {bulk_s:8.2f} s  chunks={result['chunks']} id_ranges={result['id_ranges'][:3]}")
+    server.execute("DROP TABLE IF EXISTS users_bulk_bench")
+
+
+if __name__ == "__main__":
+    default_url = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_bulk.db')}"
+    main(sys.argv[1] if len(sys.argv) > 1 else default_url, int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
@@ -0,0 +1,85 @@
+"""
+DataLoader 批量加载基准：并发的按id单行查询，逐条 get_row 与通过 loader 合并为 WHERE id IN 查询的
+数据库往返次数（语句数）及吞吐对比，分别测试 AsyncMySQLServer 与 ThreadedMySQLServer
+默认使用本地SQLite文件，传入 MYSQL_URL / ASYNC_MYSQL_URL 环境变量可压测真实数据库（会重建 users 表）
+运行: cd python_project && python benchmarks/bench_dataloader.py [每个并发的查询次数]
+依赖: pip install aiosqlite
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+
+from async_database import AsyncMySQLServer
+from database import MySQLServer
+from threaded_database import ThreadedMySQLServer
+
+DB_PATH = "/tmp/bench_dataloader.db"
+ROWS = 10000
+SQL = "SELECT * FROM users WHERE id = :id"
+
+
+def _seed(url: str) -> None:
+    engine = create_engine(url)
+    id_column = "id INTEGER PRIMARY KEY" if engine.dialect.name == "sqlite" else "id INT AUTO_INCREMENT PRIMARY KEY"
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text(f"CREATE TABLE users ({id_column}, name VARCHAR(64), age INT)"))
+        conn.execute(text("INSERT INTO users (name, age) VALUES (:name, :age)"),
+                     [{"name": f"user{i}", "age": i % 80} for i in range(1, ROWS + 1)])
+    engine.dispose()
+
+
+async def _run(lookup, concurrency: int, per_worker: int, counter: Counter):
+    async def worker(seed: int):
+        rng = random.Random(seed)
+        for _ in range(per_worker):
+            row = await lookup(rng.randint(1, ROWS))
+            assert row is not None
+
+    counter.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def _main(per_worker: int) -> None:
+    sync_url = os.environ.get("MYSQL_URL", f"sqlite:///{DB_PATH}")
+    async_url = os.environ.get("ASYNC_MYSQL_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+    _seed(sync_url)
+    threaded = ThreadedMySQLServer(MySQLServer(sync_url))
+    async_server = AsyncMySQLServer(async_url)
+    counter: Counter = Counter()
+    for engine in (threaded.server.engine, async_server.engine.sync_engine):
+        event.listen(engine, "before_cursor_execute", lambda *args: counter.update(["statements"]))
+
+    cases = (
+        ("async get_row", lambda i: async_server.get_row(SQL, {"id": i})),
+        ("async loader", lambda i: async_server.loader("users").load(i)),
+        ("threaded get_row", lambda i: threaded.get_row(SQL, {"id": i})),
+        ("threaded loader", lambda i: threaded.loader("users").load(i)),
+    )
+    print(f"{'concurrency':>12} {'mode':<18}{'lookups':>9}{'stmts':>8}{'stmt/lookup':>13}{'lookups/s':>12}")
+    for concurrency in (1, 16, 64, 256):
+        for label, lookup in cases:
+            elapsed = await _run(lookup, concurrency, per_worker, counter)
+            lookups = concurrency * per_worker
+            print(f"{concurrency:>12} {label:<18}{lookups:>9}{counter['statements']:>8}"
+                  f"{counter['statements'] / lookups:>13.3f}{lookups / elapsed:>12.0f}")
+    for name, loader in async_server.loaders.items():
+        print(f"async {name}: {loader.stats()}")
+    for name, loader in threaded.loaders.items():
+        print(f"threaded {name}: {loader.stats()}")
+    threaded.shutdown()
+    threaded.server.engine.dispose()
+    await async_server.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,65 @@
+"""
+JSON响应序列化基准：1千/10万 行查询结果（含 PyMySQL 返回的 datetime / Decimal / bytes 列），
+对比 FastAPI 默认路径（jsonable_encoder + 标准库 json）与 fast_json（orjson）直接序列化的耗时及响应大小
+列式格式的行元组直接编码，不构造中间字典
+运行: cd python_project && python benchmarks/bench_json_response.py
+依赖: pip install orjson
+"""
+import datetime
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from fast_json import orjson, success
+from result_format import format_rows
+
+COLUMNS = ["id", "name", "age", "balance", "avatar", "created_at"]
+
+
+def _rows(n: int):
+    start = datetime.datetime(2024, 1, 1)
+    return [(i, f"user{i}", i % 100, Decimal(i) / 100, f"u{i}.png".encode(), start + datetime.timedelta(seconds=i))
+            for i in range(n)]
+
+
+def _fastapi_default(data) -> bytes:
+    # 接口返回 dict 时 FastAPI 的处理：jsonable_encoder 递归转换后再由 JSONResponse 渲染
+    return JSONResponse(jsonable_encoder({"code": 200, "message": "success", "data": data})).body
+
+
+def _fast(data) -> bytes:
+    return success(data).body
+
+
+def _measure(fn, data, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, len(body) / 1024
+
+
+def main() -> None:
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'json (orjson 未安装)'}")
+    print(f"{'rows':>8} {'format':<10}{'path':<18}{'ms':>10}{'KB':>10}{'speedup':>10}")
+    for n, repeat in ((1000, 20), (100000, 3)):
+        rows = _rows(n)
+        for result_format in ("dict", "columnar"):
+            data = format_rows(COLUMNS, rows, result_format)
+            base_ms = None
+            for label, fn in (("fastapi default", _fastapi_default), ("fast_json", _fast)):
+                ms, size_kb = _measure(fn, data, repeat)
+                base_ms = base_ms or ms
+                print(f"{n:>8} {result_format:<10}{label:<18}{ms:>10.2f}{size_kb:>10.1f}{base_ms / ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+指标开销基准：单次记录操作的耗时，以及记录/不记录语句统计时同一条查询的耗时差
+运行: cd python_project && python benchmarks/bench_metrics.py [次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from instrumentation import instrument_engine, observe_checkout, observe_statement
+from metrics import MetricsRegistry
+from sql_utils import fingerprint
+
+SQL_QUERY = "SELECT * FROM users WHERE id = :id"
+
+
+def _timeit(fn, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(64), age INT)"))
+        conn.execute(text("INSERT INTO users (name, age) VALUES ('a', 1)"))
+    return engine
+
+
+def main(n: int = 200000) -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "bench", ("pool", "fingerprint"))
+    counter = registry.counter("bench_total", "bench", ("pool", "fingerprint"))
+    labels = ("mysql+pymysql://127.0.0.1/test", "select * from users where id = ?")
+
+    engine = _engine()
+    instrument_engine(engine)
+    statement = text(SQL_QUERY)
+
+    print(f"{'operation':36}{'us/call':>10}")
+    print(f"{'histogram.observe':36}{_timeit(lambda i: histogram.observe(0.001, labels), n):10.3f}")
+    print(f"{'counter.inc':36}{_timeit(lambda i: counter.inc(labels), n):10.3f}")
+    print(f"{'fingerprint (cached)':36}{_timeit(lambda i: fingerprint(SQL_QUERY), n):10.3f}")
+    print(f"{'observe_checkout':36}{_timeit(lambda i: observe_checkout(engine, 0.001), n):10.3f}")
+    print(f"{'observe_statement':36}{_timeit(lambda i: observe_statement(SQL_QUERY, 0.001, 1), n):10.3f}")
+
+    def query(i):
+        return conn.execute(statement, {"id": 1}).fetchall()
+
+    def query_observed(i):
+        start = time.perf_counter()
+        rows = conn.execute(statement, {"id": 1}).fetchall()
+        observe_statement(SQL_QUERY, time.perf_counter() - start, len(rows))
+        return rows
+
+    rounds = n // 10
+    with engine.connect() as conn:
+        # 两种方式交替跑多轮取最小值，降低机器抖动的影响
+        base = with_metrics = float("inf")
+        for _ in range(5):
+            base = min(base, _timeit(query, rounds // 5))
+            with_metrics = min(with_metrics, _timeit(query_observed, rounds // 5))
+    print(f"{'query (no metrics)':36}{base:10.3f}")
+    print(f"{'query (statement metrics)':36}{with_metrics:10.3f}")
+    print(f"{'overhead per statement':36}{with_metrics - base:10.3f}")
+
+    start = time.perf_counter()
+    body = registry.render()
+    print(f"render: {(time.perf_counter() - start) * 1000:.3f} ms, {len(body)} bytes")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,112 @@
+"""
+连接存活检测基准：对比每次签出都 ping（pool_pre_ping）与只 ping 空闲连接时，每次调用的数据库往返次数及耗时
+包括连续请求，以及每批请求之间空闲超过阈值（每批第一次签出各连接时需要 ping）两种负载
+运行: cd python_project && python benchmarks/bench_pool_ping.py [同步数据库地址] [异步数据库地址] [调用次数]
+默认使用本地SQLite文件；往返次数 = 语句数 + ping 次数（不含归还连接时的 rollback，两种方式相同），
+对MySQL运行时往返次数的差异直接体现为耗时差异
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from async_database import AsyncMySQLServer
+from database import MySQLServer
+
+SQL_QUERY = "SELECT id, name FROM users WHERE id = :id"
+CONCURRENCY = 16
+BATCH = 100
+BATCH_IDLE = 0.1
+
+
+class RoundTrips:
+    """
+    统计引擎上的语句数与 ping 次数（两种检测方式最终都调用 dialect.do_ping）
+    """
+
+    def __init__(self, engine):
+        engine = getattr(engine, "sync_engine", engine)
+        self.statements = 0
+        self.pings = 0
+        do_ping = engine.dialect.do_ping
+
+        def counting_ping(dbapi_connection):
+            self.pings += 1
+            return do_ping(dbapi_connection)
+
+        engine.dialect.do_ping = counting_ping
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self.statements += 1
+
+    def reset(self) -> None:
+        self.statements = self.pings = 0
+
+
+def _seed(server: MySQLServer) -> None:
+    server.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name VARCHAR(64), age INT)")
+    if not server.get_var("SELECT COUNT(*) FROM users"):
+        server.executemany("INSERT INTO users (name, age) VALUES (:name, :age)",
+                           [{"name": f"user{i}", "age": i % 100} for i in range(1000)])
+
+
+def _print(label: str, calls: int, counter: RoundTrips, seconds: float) -> None:
+    trips = counter.statements + counter.pings
+    print(f"{label:40}{counter.pings:>8}{trips / calls:>14.2f}{seconds / calls * 1000:>10.3f}")
+
+
+def bench_sync(database_url: str, n: int, ping_idle_seconds, batch_idle: float = 0.0):
+    server = MySQLServer(database_url, pool_size=CONCURRENCY, max_overflow=0, ping_idle_seconds=ping_idle_seconds)
+    counter = RoundTrips(server.engine)
+    server.get_row(SQL_QUERY, {"id": 1})
+    counter.reset()
+    elapsed = 0.0
+    for start in range(0, n, BATCH):
+        if batch_idle:
+            time.sleep(batch_idle)
+        begin = time.perf_counter()
+        for i in range(start, min(n, start + BATCH)):
+            server.get_row(SQL_QUERY, {"id": i % 1000 + 1})
+        elapsed += time.perf_counter() - begin
+    return counter, elapsed
+
+
+async def bench_async(database_url: str, n: int, ping_idle_seconds, batch_idle: float = 0.0):
+    server = AsyncMySQLServer(database_url, pool_size=CONCURRENCY, max_overflow=0, ping_idle_seconds=ping_idle_seconds)
+    counter = RoundTrips(server.engine)
+    await asyncio.gather(*(server.get_row(SQL_QUERY, {"id": 1}) for _ in range(CONCURRENCY)))
+    counter.reset()
+    elapsed = 0.0
+    for start in range(0, n, BATCH):
+        if batch_idle:
+            await asyncio.sleep(batch_idle)
+        begin = time.perf_counter()
+        ids = range(start, min(n, start + BATCH))
+        for i in range(0, len(ids), CONCURRENCY):
+            await asyncio.gather(*(server.get_row(SQL_QUERY, {"id": j % 1000 + 1}) for j in ids[i:i + CONCURRENCY]))
+        elapsed += time.perf_counter() - begin
+    await server.engine.dispose()
+    return counter, elapsed
+
+
+def main(database_url: str, async_database_url: str, n: int) -> None:
+    _seed(MySQLServer(database_url))
+    print(f"{'case':40}{'pings':>8}{'trips/call':>14}{'ms/call':>10}")
+    for label, ping_idle, batch_idle in (("pre_ping, continuous", None, 0.0), ("idle>30s, continuous", 30, 0.0),
+                                         ("pre_ping, idle between batches", None, BATCH_IDLE),
+                                         ("idle>0.05s, idle between batches", 0.05, BATCH_IDLE)):
+        _print(f"sync  {label}", n, *bench_sync(database_url, n, ping_idle, batch_idle))
+        _print(f"async {label}", n, *asyncio.run(bench_async(async_database_url, n, ping_idle, batch_idle)))
+
+
+if __name__ == "__main__":
+    default_path = os.path.join(tempfile.gettempdir(), "bench_pool_ping.db")
+    main(sys.argv[1] if len(sys.argv) > 1 else f"sqlite:///{default_path}",
+         sys.argv[2] if len(sys.argv) > 2 else f"sqlite+aiosqlite:///{default_path}",
+         int(sys.argv[3]) if len(sys.argv) > 3 else 2000)
@@ -0,0 +1,74 @@
+"""
+请求采样分析开销基准：span 在请求未被分析时的单次耗时，以及不分析、按比例分析、全部分析时同一个接口的吞吐
+运行: cd python_project && python benchmarks/bench_profiler.py [请求数] [采样间隔毫秒]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fast_json import dumps
+from profiler import ProfilerMiddleware, SamplingProfiler, span
+
+ROWS = [{"id": i, "name": f"user{i}", "age": i % 100} for i in range(200)]
+CONCURRENCY = 32
+
+
+async def _app(scope, receive, send):
+    # 模拟一个接口：一次数据库往返 + 序列化结果
+    with span("db.session"):
+        await asyncio.sleep(0)
+        body = dumps(ROWS)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _noop(message):
+    pass
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _throughput(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/bench", "headers": []}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await app(dict(scope), _receive, _noop)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, interval_ms: int) -> None:
+    n = 200000
+    start = time.perf_counter()
+    for _ in range(n):
+        with span("db.session"):
+            pass
+    print(f"span (not profiled): {(time.perf_counter() - start) / n * 1e6:.3f} us/call\n")
+
+    print(f"{'case':28}{'req/s':>10}{'overhead':>10}{'samples':>10}")
+    baseline = None
+    for label, rate in (("no middleware", None), ("sample_rate=0", 0.0), ("sample_rate=0.01", 0.01),
+                        ("sample_rate=1 (max 4)", 1.0)):
+        profiler = SamplingProfiler(interval=interval_ms / 1000)
+        app = _app if rate is None else ProfilerMiddleware(_app, profiler, sample_rate=rate, max_concurrent=4)
+        await _throughput(app, requests // 10)
+        rps = await _throughput(app, requests)
+        baseline = baseline or rps
+        samples = sum(profiler.aggregate.values())
+        print(f"{label:28}{rps:>10.0f}{(baseline / rps - 1) * 100:>9.1f}%{samples:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 5))
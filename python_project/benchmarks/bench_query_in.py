@@ -0,0 +1,104 @@
+"""
+大IN列表查询基准：对比整条语句、拆块依次执行、异步拆块并发执行及临时表关联四种方式查询5万个ID的耗时
+默认使用本地SQLite文件，传入 MYSQL_URL / ASYNC_MYSQL_URL 环境变量可压测真实数据库（会重建 users 表）
+运行: cd python_project && python benchmarks/bench_query_in.py [ID个数] [表行数]
+依赖: pip install aiosqlite
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from async_database import AsyncMySQLServer
+from database import MySQLServer
+from in_query import DEFAULT_IN_CHUNK_SIZE
+
+DB_PATH = "/tmp/bench_query_in.db"
+SQL_QUERY = "SELECT id, name, age FROM users WHERE id IN :ids"
+ROUNDS = 3
+
+
+def _seed(url: str, rows: int) -> None:
+    engine = create_engine(url)
+    id_column = "id INTEGER PRIMARY KEY" if engine.dialect.name == "sqlite" else "id INT AUTO_INCREMENT PRIMARY KEY"
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text(f"CREATE TABLE users ({id_column}, name VARCHAR(64), age INT)"))
+        insert = text("INSERT INTO users (name, age) VALUES (:name, :age)")
+        for offset in range(0, rows, 5000):
+            conn.execute(insert, [{"name": f"user{i}", "age": i % 80}
+                                  for i in range(offset + 1, min(rows, offset + 5000) + 1)])
+    engine.dispose()
+
+
+def _best(fn) -> tuple:
+    best, count = float("inf"), 0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        count = len(fn())
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, count
+
+
+async def _best_async(fn) -> tuple:
+    best, count = float("inf"), 0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        count = len(await fn())
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, count
+
+
+def main(n: int = 50000, rows: int = 200000) -> None:
+    sync_url = os.environ.get("MYSQL_URL", f"sqlite:///{DB_PATH}")
+    async_url = os.environ.get("ASYNC_MYSQL_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+    _seed(sync_url, rows)
+    ids = tuple(random.sample(range(1, rows + 1), n))
+    server = MySQLServer(sync_url)
+    async_server = AsyncMySQLServer(async_url)
+
+    cases = [
+        ("sync single statement", lambda: server.query_in(SQL_QUERY, "ids", ids, chunk_size=0,
+                                                          temp_table_threshold=None)),
+        ("sync chunked (1000)", lambda: server.query_in(SQL_QUERY, "ids", ids, chunk_size=DEFAULT_IN_CHUNK_SIZE,
+                                                        temp_table_threshold=None)),
+        ("sync temp table", lambda: server.query_in(SQL_QUERY, "ids", ids, temp_table_threshold=0)),
+    ]
+    print(f"{n} ids / {rows} rows, {server.engine.dialect.name}")
+    print(f"{'case':34}{'ms':>10}{'rows':>8}")
+    for label, fn in cases:
+        elapsed, count = _best(fn)
+        print(f"{label:34}{elapsed:10.1f}{count:8}")
+
+    async def run_async():
+        async_cases = [
+            ("async single statement", lambda: async_server.query_in(SQL_QUERY, "ids", ids, chunk_size=0,
+                                                                     temp_table_threshold=None)),
+            ("async chunked, concurrency 1", lambda: async_server.query_in(SQL_QUERY, "ids", ids, concurrency=1,
+                                                                           chunk_size=DEFAULT_IN_CHUNK_SIZE,
+                                                                           temp_table_threshold=None)),
+            ("async chunked, concurrency 4", lambda: async_server.query_in(SQL_QUERY, "ids", ids, concurrency=4,
+                                                                           chunk_size=DEFAULT_IN_CHUNK_SIZE,
+                                                                           temp_table_threshold=None)),
+            ("async chunked, concurrency 8", lambda: async_server.query_in(SQL_QUERY, "ids", ids, concurrency=8,
+                                                                           chunk_size=DEFAULT_IN_CHUNK_SIZE,
+                                                                           temp_table_threshold=None)),
+            ("async temp table", lambda: async_server.query_in(SQL_QUERY, "ids", ids, temp_table_threshold=0)),
+        ]
+        for label, fn in async_cases:
+            elapsed, count = await _best_async(fn)
+            print(f"{label:34}{elapsed:10.1f}{count:8}")
+        await async_server.engine.dispose()
+
+    asyncio.run(run_async())
+    server.engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
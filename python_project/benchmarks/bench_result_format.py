@@ -0,0 +1,45 @@
+"""
+返回格式基准：对比 dict-per-row 与列式格式在 1万/10万 行结果下的内存占用和JSON序列化耗时
+运行: cd python_project && python benchmarks/bench_result_format.py
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_format import columnar_jsonable, format_rows
+
+COLUMNS = ["id", "name", "age", "score"]
+
+
+def _rows(n: int):
+    return [(i, f"user{i}", i % 100, i * 0.5) for i in range(n)]
+
+
+def _measure(rows, result_format: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = format_rows(COLUMNS, rows, result_format)
+    build_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    payload = json.dumps(result if result_format == "dict" else columnar_jsonable(result), default=str)
+    dumps_ms = (time.perf_counter() - start) * 1000
+    return build_ms, peak / 1024 / 1024, dumps_ms, len(payload) / 1024 / 1024
+
+
+def main() -> None:
+    print(f"{'rows':>8} {'format':<16}{'build ms':>10}{'peak MB':>10}{'dumps ms':>10}{'json MB':>10}")
+    for n in (10000, 100000):
+        rows = _rows(n)
+        for result_format in ("dict", "columnar", "columnar_typed"):
+            build_ms, peak_mb, dumps_ms, size_mb = _measure(rows, result_format)
+            print(f"{n:>8} {result_format:<16}{build_ms:>10.2f}{peak_mb:>10.2f}{dumps_ms:>10.2f}{size_mb:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
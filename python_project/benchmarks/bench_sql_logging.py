@@ -0,0 +1,57 @@
+"""
+SQL日志开销基准：对比旧的逐行 literal_binds 编译 + 同步写文件，与 SqlLogger 批量汇总 + 后台线程写文件
+运行: cd python_project && python benchmarks/bench_sql_logging.py [行数]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import TimedRotatingFileHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from sql_logger import SqlLogger
+
+
+def main(rows: int = 10000) -> None:
+    tmpdir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(64), age INT)"))
+    sql_query = "INSERT INTO users (name, age) VALUES (:name, :age)"
+    params_list = [{"name": f"user{i}", "age": i % 100} for i in range(rows)]
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(sql_query), params_list)
+    insert_cost = time.perf_counter() - start
+
+    # 旧实现：每行编译一次并同步写文件
+    old_logger = logging.getLogger("bench_old_sql_log")
+    old_logger.setLevel(logging.DEBUG)
+    old_logger.addHandler(TimedRotatingFileHandler(os.path.join(tmpdir, "old.log"), when="midnight", encoding="utf-8"))
+    start = time.perf_counter()
+    for params in params_list:
+        compiled_sql = text(sql_query).bindparams(**params).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+        old_logger.info(f"执行成功: {sql_query} | 参数: {params} | 执行结果: {compiled_sql}")
+    old_cost = time.perf_counter() - start
+
+    # 新实现：一条汇总记录，编译在后台线程中完成
+    sql_logger = SqlLogger("bench_new_sql_log", os.path.join(tmpdir, "new.log"))
+    start = time.perf_counter()
+    sql_logger.batch(sql_query, params_list, engine.dialect, success=True)
+    new_cost = time.perf_counter() - start
+    sql_logger.stop()
+
+    print(f"rows={rows}")
+    print(f"batch insert:            {insert_cost * 1000:9.2f} ms")
+    print(f"old per-row logging:     {old_cost * 1000:9.2f} ms")
+    print(f"new queued batch log:    {new_cost * 1000:9.2f} ms")
+    print(f"logger stats: {sql_logger.stats()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,90 @@
+"""
+启动基准：测量导入 main 的耗时与创建的引擎数，以及连接池冷启动/预热后首个请求的延迟
+运行: cd python_project && python benchmarks/bench_startup.py [同步连接地址] [异步连接地址]
+默认使用本地SQLite文件；传入MySQL地址（mysql+pymysql:// 与 mysql+aiomysql://）才能体现建连开销
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, text
+
+from engine_registry import EngineRegistry
+
+SYNC_URL = "sqlite:////tmp/bench_startup.db"
+ASYNC_URL = "sqlite+aiosqlite:////tmp/bench_startup.db"
+SQL_QUERY = "SELECT 1"
+CONCURRENCY = 5
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+from engine_registry import engine_registry
+print(json.dumps({"ms": elapsed * 1000, "engines": engine_registry.created}))
+"""
+
+
+def measure_import(runs: int = 5):
+    """
+    在子进程中导入 main（不同进程避免模块缓存），取耗时中位数
+    """
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True,
+                             check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    results.sort(key=lambda r: r["ms"])
+    return results[len(results) // 2]
+
+
+async def first_requests(sync_url: str, async_url: str, warmup: int):
+    """
+    新建注册表（等同于新进程），可选预热后并发发出第一批请求，返回 (预热耗时, 首批请求最大延迟)
+    """
+    registry = EngineRegistry()
+    sync_engine = registry.get(sync_url, pool_pre_ping=True, pool_recycle=3600)
+    async_engine = registry.get(async_url, is_async=True, pool_pre_ping=True, pool_recycle=3600)
+    warmup_ms = (await registry.warmup([sync_engine, async_engine], warmup))["elapsed_ms"] if warmup else 0.0
+
+    def sync_call():
+        start = time.perf_counter()
+        with sync_engine.connect() as conn:
+            conn.execute(text(SQL_QUERY)).fetchall()
+        return time.perf_counter() - start
+
+    async def async_call():
+        start = time.perf_counter()
+        async with async_engine.connect() as conn:
+            (await conn.execute(text(SQL_QUERY))).fetchall()
+        return time.perf_counter() - start
+
+    sync_times = await asyncio.gather(*[asyncio.to_thread(sync_call) for _ in range(CONCURRENCY)])
+    async_times = await asyncio.gather(*[async_call() for _ in range(CONCURRENCY)])
+    await registry.dispose()
+    return warmup_ms, max(sync_times) * 1000, max(async_times) * 1000
+
+
+def main(sync_url: str = SYNC_URL, async_url: str = ASYNC_URL) -> None:
+    if sync_url.startswith("sqlite"):
+        with create_engine(sync_url).begin() as conn:
+            conn.execute(text("SELECT 1"))
+
+    result = measure_import()
+    print(f"import main: {result['ms']:.1f} ms, engines created at import: {result['engines']}")
+
+    print(f"{'':12}{'warmup ms':>12}{'sync first':>14}{'async first':>14}  (max of {CONCURRENCY} concurrent, ms)")
+    for label, warmup in (("cold", 0), ("warmed", CONCURRENCY)):
+        warmup_ms, sync_ms, async_ms = asyncio.run(first_requests(sync_url, async_url, warmup))
+        print(f"{label:12}{warmup_ms:12.2f}{sync_ms:14.2f}{async_ms:14.2f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,51 @@
+"""
+语句缓存基准：对比每次调用都新建 text() 与使用 statement_cache 的单次调用开销
+运行: cd python_project && python benchmarks/bench_statement_cache.py [次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from statement_cache import StatementCache
+
+SQL_QUERIES = [
+    "SELECT * FROM users WHERE id = :id",
+    "SELECT name FROM users WHERE id = :id",
+    "UPDATE users SET name = :name WHERE id = :id",
+    "SELECT * FROM users LIMIT :limit OFFSET :offset",
+]
+
+
+def _timeit(fn, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main(n: int = 100000) -> None:
+    cache = StatementCache()
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(64), age INT)"))
+        conn.execute(text("INSERT INTO users (name, age) VALUES ('a', 1)"))
+
+    build_plain = _timeit(lambda i: text(SQL_QUERIES[i % 4]), n)
+    build_cached = _timeit(lambda i: cache.text(SQL_QUERIES[i % 4]), n)
+
+    with engine.connect() as conn:
+        exec_plain = _timeit(lambda i: conn.execute(text(SQL_QUERIES[0]), {"id": 1}).fetchall(), n // 10)
+        exec_cached = _timeit(lambda i: conn.execute(cache.text(SQL_QUERIES[0]), {"id": 1}).fetchall(), n // 10)
+
+    print(f"{'':24}{'text()':>12}{'cached':>12}  (us/call)")
+    print(f"{'build clause':24}{build_plain:12.2f}{build_cached:12.2f}")
+    print(f"{'execute + fetch':24}{exec_plain:12.2f}{exec_cached:12.2f}")
+    print(f"cache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,109 @@
+"""
+工作单元事务基准：同一个"先读后写"的请求，逐条调用（每条语句各自签出连接、提交）与在一个事务中执行的
+数据库往返次数（语句 + 提交/回滚 + 签出时的 pre-ping）及耗时对比
+默认使用本地SQLite文件，传入 MYSQL_URL / ASYNC_MYSQL_URL 环境变量可压测真实数据库（会重建 users 表）
+运行: cd python_project && python benchmarks/bench_transaction.py [请求次数]
+依赖: pip install aiosqlite
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+
+from async_database import AsyncMySQLServer
+from database import MySQLServer
+
+DB_PATH = "/tmp/bench_transaction.db"
+
+
+def _seed(url: str) -> None:
+    engine = create_engine(url)
+    id_column = "id INTEGER PRIMARY KEY" if engine.dialect.name == "sqlite" else "id INT AUTO_INCREMENT PRIMARY KEY"
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text(f"CREATE TABLE users ({id_column}, name VARCHAR(64), age INT)"))
+        conn.execute(text("INSERT INTO users (name, age) VALUES (:name, :age)"),
+                     [{"name": f"user{i}", "age": i % 80} for i in range(1, 1001)])
+    engine.dispose()
+
+
+def _count_round_trips(engine, counter: Counter) -> None:
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", lambda *args: counter.update(["statements"]))
+    event.listen(engine, "commit", lambda conn: counter.update(["commits"]))
+    event.listen(engine, "rollback", lambda conn: counter.update(["rollbacks"]))
+    # 连接池签出时 pool_pre_ping 会先发一次 ping
+    event.listen(engine.pool, "checkout", lambda *args: counter.update(["checkouts"]))
+
+
+def _handler(db, i: int) -> None:
+    """
+    典型的多语句请求：读一行、改一行、插一行、再读一个值（db 为服务或事务对象）
+    """
+    user = db.get_row("SELECT * FROM users WHERE id = :id", {"id": i % 1000 + 1})
+    db.execute("UPDATE users SET age = :age WHERE id = :id", {"id": user["id"], "age": user["age"] + 1})
+    db.insert_id("INSERT INTO users (name, age) VALUES (:name, :age)", {"name": f"new{i}", "age": 1})
+    db.get_var("SELECT COUNT(*) FROM users WHERE age > :age", {"age": 50})
+
+
+async def _async_handler(db, i: int) -> None:
+    user = await db.get_row("SELECT * FROM users WHERE id = :id", {"id": i % 1000 + 1})
+    await db.execute("UPDATE users SET age = :age WHERE id = :id", {"id": user["id"], "age": user["age"] + 1})
+    await db.insert_id("INSERT INTO users (name, age) VALUES (:name, :age)", {"name": f"new{i}", "age": 1})
+    await db.get_var("SELECT COUNT(*) FROM users WHERE age > :age", {"age": 50})
+
+
+def _print(label: str, counter: Counter, elapsed: float, n: int) -> None:
+    trips = sum(counter.values())
+    print(f"{label:28}{trips / n:12.1f}{counter['statements'] / n:8.1f}{counter['checkouts'] / n:10.1f}"
+          f"{(counter['commits'] + counter['rollbacks']) / n:8.1f}{elapsed / n * 1e6:12.1f}")
+
+
+def main(n: int = 2000) -> None:
+    sync_url = os.environ.get("MYSQL_URL", f"sqlite:///{DB_PATH}")
+    async_url = os.environ.get("ASYNC_MYSQL_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+    _seed(sync_url)
+    server = MySQLServer(sync_url)
+    async_server = AsyncMySQLServer(async_url)
+    counter: Counter = Counter()
+    _count_round_trips(server.engine, counter)
+    _count_round_trips(async_server.engine, counter)
+
+    def in_transaction(i):
+        with server.transaction() as tx:
+            _handler(tx, i)
+
+    print(f"{'per request':28}{'round trips':>12}{'stmts':>8}{'checkout':>10}{'commit':>8}{'us':>12}")
+    for label, fn in (("sync, one call per stmt", lambda i: _handler(server, i)),
+                      ("sync, transaction", in_transaction)):
+        counter.clear()
+        start = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        _print(label, counter, time.perf_counter() - start, n)
+
+    async def run_async():
+        async def in_async_transaction(i):
+            async with async_server.transaction() as tx:
+                await _async_handler(tx, i)
+
+        for label, fn in (("async, one call per stmt", lambda i: _async_handler(async_server, i)),
+                          ("async, transaction", in_async_transaction)):
+            counter.clear()
+            start = time.perf_counter()
+            for i in range(n):
+                await fn(i)
+            _print(label, counter, time.perf_counter() - start, n)
+        await async_server.engine.dispose()
+
+    asyncio.run(run_async())
+    server.engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
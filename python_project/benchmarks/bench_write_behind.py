@@ -0,0 +1,121 @@
+"""
+写后缓冲基准：并发写请求反复更新一小批热点行（UPDATE users SET name = :name WHERE id = :id），
+对比逐条执行（每次一条语句 + 一次提交）与写后缓冲（按主键合并、批量刷写）的吞吐、UPDATE 语句数、提交次数，
+以及每次刷写的行数与耗时
+默认使用本地SQLite文件，传入 ASYNC_MYSQL_URL 环境变量可压测真实数据库（会重建 users 表）；
+传入 REDIS_URL 时额外测试 Redis 缓冲
+运行: cd python_project && python benchmarks/bench_write_behind.py [并发数] [秒数] [热点行数]
+依赖: pip install aiosqlite
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+
+from async_database import AsyncMySQLServer
+from async_redis import AsyncRedisServer
+from write_behind import RedisStore
+
+DB_PATH = "/tmp/bench_write_behind.db"
+SQL = "UPDATE users SET name = :name WHERE id = :id"
+
+
+def _seed(url: str, rows: int) -> None:
+    engine = create_engine(url)
+    id_column = "id INTEGER PRIMARY KEY" if engine.dialect.name == "sqlite" else "id INT AUTO_INCREMENT PRIMARY KEY"
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text(f"CREATE TABLE users ({id_column}, name VARCHAR(64), age INT)"))
+        conn.execute(text("INSERT INTO users (name, age) VALUES (:name, :age)"),
+                     [{"name": f"user{i}", "age": i % 80} for i in range(1, rows + 1)])
+    engine.dispose()
+
+
+async def _run(update, concurrency: int, seconds: float, hot_rows: int) -> int:
+    deadline = time.perf_counter() + seconds
+    done = 0
+
+    async def worker(seed: int):
+        nonlocal done
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            await update(rng.randint(1, hot_rows), f"name{rng.randint(1, 1000000)}")
+            done += 1
+            # 写入内存缓冲不会让出事件循环，这里模拟请求之间的切换
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return done
+
+
+async def _main(concurrency: int, seconds: float, hot_rows: int) -> None:
+    sync_url = os.environ.get("MYSQL_URL", f"sqlite:///{DB_PATH}")
+    async_url = os.environ.get("ASYNC_MYSQL_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+    _seed(sync_url, max(hot_rows, 1000))
+    counter: Counter = Counter()
+    servers = []
+
+    def count_update(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            counter.update(["updates"])
+
+    def count_commit(conn):
+        counter.update(["commits"])
+
+    def server() -> AsyncMySQLServer:
+        instance = AsyncMySQLServer(async_url)
+        engine = instance.engine.sync_engine
+        # 相同地址的服务共用一个引擎，监听器只注册一次
+        if not event.contains(engine, "commit", count_commit):
+            event.listen(engine, "before_cursor_execute", count_update)
+            event.listen(engine, "commit", count_commit)
+        servers.append(instance)
+        return instance
+
+    direct = server()
+    cases = [("direct execute", lambda key, name: direct.execute(SQL, {"id": key, "name": name}), None)]
+    buffered = server().write_behind("users", flush_size=500, flush_interval=0.1)
+    cases.append(("write-behind memory", lambda key, name: buffered.update(key, {"name": name}), buffered))
+    redis_server = None
+    if os.environ.get("REDIS_URL"):
+        redis_server = AsyncRedisServer(os.environ["REDIS_URL"], max_connections=concurrency + 4)
+        await redis_server.connect()
+        store = RedisStore(redis_server, "bench_write_behind:users")
+        redis_buffered = server().write_behind("users", store=store, flush_size=500, flush_interval=0.1)
+        cases.append(("write-behind redis", lambda key, name: redis_buffered.update(key, {"name": name}),
+                      redis_buffered))
+
+    print(f"{concurrency} writers, {hot_rows} hot rows, {seconds}s")
+    print(f"{'mode':<22}{'updates/s':>11}{'UPDATE stmts':>14}{'commits':>9}{'flushes':>9}{'rows/flush':>12}"
+          f"{'flush ms':>10}")
+    for label, update, buffer in cases:
+        counter.clear()
+        start = time.perf_counter()
+        done = await _run(update, concurrency, seconds, hot_rows)
+        if buffer is not None:
+            # 计入关闭时的最后一次刷写
+            await buffer.close()
+        elapsed = time.perf_counter() - start
+        stats = buffer.stats() if buffer is not None else {}
+        flushes = stats.get("flushes", 0)
+        rows_per_flush = stats["flushed_rows"] / flushes if flushes else 0.0
+        print(f"{label:<22}{done / elapsed:>11.0f}{counter['updates']:>14}{counter['commits']:>9}{flushes:>9}"
+              f"{rows_per_flush:>12.1f}{stats.get('last_flush_ms', 0.0):>10.2f}")
+    if redis_server is not None:
+        await redis_server.close()
+    for instance in servers:
+        await instance.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(int(sys.argv[1]) if len(sys.argv) > 1 else 64,
+                      float(sys.argv[2]) if len(sys.argv) > 2 else 5,
+                      int(sys.argv[3]) if len(sys.argv) > 3 else 100))
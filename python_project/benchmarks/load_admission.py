@@ -0,0 +1,114 @@
+"""
+准入控制压测：模拟一个变慢的本地数据库（同时只能处理 CAPACITY 条语句、每条耗时 SERVICE_MS 毫秒），
+大量写请求（低优先级 /test4）与少量读请求（/test7/1）同时压测，对比关闭/开启准入控制时读写接口的成功数、
+503 数及延迟分位数；开启后过载部分快速返回 503，读请求不再排在堆积的写请求后面
+应用在进程内通过 ASGI 直接调用，不经过网络
+运行: cd python_project && python benchmarks/load_admission.py [写并发] [读并发] [秒数]
+依赖: pip install httpx
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import httpx
+
+DB_PATH = "/tmp/bench_admission.db"
+os.environ.setdefault("MYSQL_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("ASYNC_MYSQL_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+
+import main
+
+CAPACITY = 4
+SERVICE_MS = 20
+WRITE_PATH = "/test4"
+READ_PATH = "/test7/1"
+
+
+def _seed() -> None:
+    engine = create_engine(os.environ["MYSQL_URL"])
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(64), age INT)"))
+        conn.execute(text("INSERT INTO users (name, age) VALUES (:name, :age)"),
+                     [{"name": f"user{i}", "age": i % 80} for i in range(1, 201)])
+    engine.dispose()
+
+
+def _slow_down(engine) -> None:
+    """
+    模拟慢数据库：每条语句先占用一个"数据库处理能力"名额再执行，名额不足时在数据库端排队
+    （同步引擎的语句在工作线程中执行，sleep 不会阻塞事件循环）
+    """
+    capacity = threading.BoundedSemaphore(CAPACITY)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        with capacity:
+            time.sleep(SERVICE_MS / 1000)
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def _run(writers: int, readers: int, seconds: float) -> dict:
+    results = {path: {"ok": [], "503": 0, "other": 0} for path in (WRITE_PATH, READ_PATH)}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def worker(path):
+            stats = results[path]
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get(path)
+                if response.status_code == 200:
+                    stats["ok"].append((time.perf_counter() - start) * 1000)
+                elif response.status_code == 503:
+                    stats["503"] += 1
+                    # 按 Retry-After 退避的客户端会等待，这里只短暂让出，持续施压
+                    await asyncio.sleep(0.01)
+                else:
+                    stats["other"] += 1
+
+        await asyncio.gather(*[worker(WRITE_PATH) for _ in range(writers)],
+                             *[worker(READ_PATH) for _ in range(readers)])
+    return results
+
+
+def _print(label: str, results: dict, seconds: float) -> None:
+    for path, stats in results.items():
+        ok = sorted(stats["ok"])
+        print(f"{label:12}{path:12}{len(ok) / seconds:10.1f}{stats['503']:8}{stats['other']:8}"
+              f"{_percentile(ok, 50):10.1f}{_percentile(ok, 99):10.1f}")
+
+
+async def _main(writers: int, readers: int, seconds: float) -> None:
+    _seed()
+    _slow_down(main.my_sql_server.engine)
+    limiter = main.threaded_sql_server.admission
+    print(f"db capacity {CAPACITY}, {SERVICE_MS} ms/statement, {writers} writers + {readers} readers, {seconds}s")
+    print(f"{'mode':12}{'endpoint':12}{'ok/s':>10}{'503':>8}{'other':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    async with main.app.router.lifespan_context(main.app):
+        for label, admission in (("off", None), ("adaptive", limiter)):
+            main.threaded_sql_server.admission = admission
+            _print(label, await _run(writers, readers, seconds), seconds)
+            # 等待上一轮在线程池中排队的调用执行完
+            while main.threaded_sql_server.active or main.threaded_sql_server.queued:
+                await asyncio.sleep(0.1)
+        if limiter is not None:
+            print("limiter:", limiter.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(int(sys.argv[1]) if len(sys.argv) > 1 else 48,
+                      int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+                      float(sys.argv[3]) if len(sys.argv) > 3 else 8))
@@ -0,0 +1,57 @@
+"""
+事件循环隔离压测：先单独压测异步接口，再在同步接口满负载的同时压测异步接口，对比异步接口的 p50/p99
+同步接口若阻塞事件循环，第二轮的异步接口 p99 会明显升高
+运行: cd python_project && python main.py   # 另开终端
+      python benchmarks/load_event_loop_isolation.py [服务地址] [并发数] [秒数]
+依赖: pip install httpx
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+
+async def _worker(client: httpx.AsyncClient, path: str, deadline: float, latencies: list) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            await client.get(path)
+        except httpx.HTTPError:
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def _run(base_url: str, concurrency: int, seconds: float, with_sync_load: bool) -> list:
+    latencies: list = []
+    background: list = []
+    limits = httpx.Limits(max_connections=concurrency * 2 + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        deadline = time.perf_counter() + seconds
+        tasks = [_worker(client, "/async_test2", deadline, latencies) for _ in range(concurrency)]
+        if with_sync_load:
+            tasks += [_worker(client, "/test2", deadline, background) for _ in range(concurrency)]
+        await asyncio.gather(*tasks)
+    return latencies
+
+
+def main(base_url: str, concurrency: int, seconds: float) -> None:
+    for label, with_sync_load in (("async only", False), ("async + sync load", True)):
+        latencies = asyncio.run(_run(base_url, concurrency, seconds, with_sync_load))
+        print(f"{label:<20} requests={len(latencies):<7} "
+              f"p50={statistics.median(latencies) if latencies else 0:8.2f} ms  "
+              f"p99={_percentile(latencies, 99):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:10011",
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+         float(sys.argv[3]) if len(sys.argv) > 3 else 10)
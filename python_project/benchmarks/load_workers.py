@@ -0,0 +1,104 @@
+"""
+多进程扩展性压测：分别以 1、2、4... 个工作进程启动 run.py，压测同步与异步接口的吞吐量
+默认使用本地SQLite文件（无需MySQL），传入 MYSQL_URL / ASYNC_MYSQL_URL 环境变量可压测真实数据库
+运行: cd python_project && python benchmarks/load_workers.py [最大进程数] [并发数] [秒数]
+依赖: pip install httpx aiosqlite
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, text
+
+DB_PATH = "/tmp/bench_workers.db"
+PORT = 10099
+PATHS = ("/test2", "/async_test2")
+
+
+def _seed() -> None:
+    engine = create_engine(f"sqlite:///{DB_PATH}")
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(64), age INT)"))
+        conn.execute(text("INSERT INTO users (name, age) VALUES (:name, :age)"),
+                     [{"name": f"user{i}", "age": i % 80} for i in range(1, 201)])
+    engine.dispose()
+
+
+def _start(workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(PORT),
+        "HOST": "127.0.0.1",
+    }
+    env.setdefault("MYSQL_URL", f"sqlite:///{DB_PATH}")
+    env.setdefault("ASYNC_MYSQL_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+    return subprocess.Popen([sys.executable, "run.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def _wait_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get(PATHS[0])).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("服务启动超时")
+
+
+async def _load(base_url: str, path: str, concurrency: int, seconds: float) -> float:
+    done = 0
+    limits = httpx.Limits(max_connections=concurrency + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            nonlocal done
+            while time.perf_counter() < deadline:
+                try:
+                    await client.get(path)
+                    done += 1
+                except httpx.HTTPError:
+                    continue
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return done / seconds
+
+
+def main(max_workers: int, concurrency: int, seconds: float) -> None:
+    _seed()
+    base_url = f"http://127.0.0.1:{PORT}"
+    counts = []
+    n = 1
+    while n <= max_workers:
+        counts.append(n)
+        n *= 2
+
+    print(f"{'workers':<10}" + "".join(f"{p + ' req/s':>22}" for p in PATHS))
+    for workers in counts:
+        proc = _start(workers)
+        try:
+            asyncio.run(_wait_ready(base_url))
+            rates = [asyncio.run(_load(base_url, path, concurrency, seconds)) for path in PATHS]
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+        print(f"{workers:<10}" + "".join(f"{rate:22.1f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1),
+         int(sys.argv[2]) if len(sys.argv) > 2 else 64,
+         float(sys.argv[3]) if len(sys.argv) > 3 else 10)
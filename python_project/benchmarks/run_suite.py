@@ -0,0 +1,327 @@
+"""
+全接口基准压测套件：按指定数据量初始化 users 表，启动 run.py（导入 main:app），在固定并发级别下依次压测
+/test1~/test7、/async_test1~/async_test7 及 /redis_test，输出吞吐量、p50/p95/p99 及连接池统计的 JSON 结果，
+结果中带有当前 git 提交，便于在不同提交之间对比
+默认使用本地SQLite文件及独立进程中的 fakeredis TCP 服务（无需MySQL/Redis，可离线运行）；
+设置 MYSQL_URL / ASYNC_MYSQL_URL / REDIS_URL 环境变量可压测真实服务（注意：会重建目标库中的 users 表）
+运行: cd python_project && python benchmarks/run_suite.py [--rows 1000,100000] [--concurrency 1,16,64] [--seconds 5]
+对比: python benchmarks/run_suite.py --compare 旧结果.json 新结果.json
+依赖: pip install httpx aiosqlite fakeredis
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, make_url, text
+
+DB_PATH = "/tmp/bench_suite.db"
+PORT = 10098
+PATHS = (
+    "/test1", "/test2", "/test3", "/test4", "/test5", "/test6", "/test7/1",
+    "/async_test1", "/async_test2", "/async_test3", "/async_test4", "/async_test5", "/async_test6", "/async_test7/1",
+    "/redis_test",
+)
+# 从 /metrics 中取连接池相关的计数（压测前后相减得到本轮增量）
+POOL_METRICS = ("db_pool_checkout_wait_seconds_sum", "db_pool_checkout_wait_seconds_count",
+                "db_pool_preping_failures_total", "db_pool_invalidations_total")
+
+
+def _git_commit() -> Dict[str, Any]:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_fake_redis() -> subprocess.Popen:
+    """
+    在独立进程中启动 fakeredis 的 TCP 服务，作为离线运行时的Redis替身（不与压测客户端争用GIL）
+    @returns {subprocess.Popen} 进程，其 redis_url 属性为连接地址
+    """
+    port = _free_port()
+    code = ("import sys; from fakeredis import TcpFakeServer; "
+            "TcpFakeServer(('127.0.0.1', int(sys.argv[1])), server_type='redis').serve_forever()")
+    proc = subprocess.Popen([sys.executable, "-c", code, str(port)])
+    deadline = time.perf_counter() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            if proc.poll() is not None or time.perf_counter() > deadline:
+                proc.kill()
+                raise RuntimeError("fakeredis 启动失败，请先 pip install fakeredis")
+            time.sleep(0.1)
+    proc.redis_url = f"redis://127.0.0.1:{port}/0"
+    return proc
+
+
+def _seed(sync_url: str, rows: int) -> None:
+    """
+    重建 users 表并写入指定行数
+    @param {str} sync_url - 同步连接地址
+    @param {int} rows - 行数
+    """
+    engine = create_engine(sync_url)
+    if engine.dialect.name == "sqlite":
+        id_column = "id INTEGER PRIMARY KEY"
+    else:
+        id_column = "id INT AUTO_INCREMENT PRIMARY KEY"
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            # WAL 模式下读写互不阻塞，写接口压测时不至于全部报 database is locked
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+        conn.execute(text(f"CREATE TABLE users ({id_column}, name VARCHAR(64), age INT)"))
+        insert = text("INSERT INTO users (name, age) VALUES (:name, :age)")
+        for offset in range(0, rows, 5000):
+            conn.execute(insert, [{"name": f"user{i}", "age": i % 80}
+                                  for i in range(offset + 1, min(rows, offset + 5000) + 1)])
+    engine.dispose()
+
+
+def _start(env: Dict[str, str], workers: int) -> subprocess.Popen:
+    env = {**os.environ, **env, "WEB_CONCURRENCY": str(workers), "PORT": str(PORT), "HOST": "127.0.0.1"}
+    return subprocess.Popen([sys.executable, "run.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def _wait_ready(client: httpx.AsyncClient, proc: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务启动失败，退出码 {proc.returncode}")
+        try:
+            if (await client.get("/engine_stats")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("服务启动超时")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _scrape_pool_metrics(body: str) -> Dict[str, float]:
+    totals = dict.fromkeys(POOL_METRICS, 0.0)
+    for line in body.splitlines():
+        name = line.split("{", 1)[0].split(" ", 1)[0]
+        if name in totals:
+            totals[name] += float(line.rsplit(" ", 1)[1])
+    return totals
+
+
+async def _data(client: httpx.AsyncClient, path: str) -> Any:
+    return (await client.get(path)).json()["data"]
+
+
+async def _load(client: httpx.AsyncClient, path: str, concurrency: int, seconds: float,
+                warmup: float) -> Dict[str, Any]:
+    """
+    固定并发压测单个接口：warmup 秒内的请求不计入结果
+    @returns {Dict[str, Any]} 请求数、错误数、吞吐量及延迟分位数（毫秒）
+    """
+    latencies: List[float] = []
+    errors = 0
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + seconds
+
+    async def worker():
+        nonlocal errors
+        while True:
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+            try:
+                ok = (await client.get(path)).status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if start < measure_from:
+                continue
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / seconds, 1),
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+async def _run_size(base_url: str, paths: List[str], levels: List[int], seconds: float,
+                    warmup: float, proc: subprocess.Popen) -> List[Dict[str, Any]]:
+    results = []
+    limits = httpx.Limits(max_connections=max(levels) + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        await _wait_ready(client, proc)
+        for path in paths:
+            for concurrency in levels:
+                before = _scrape_pool_metrics((await client.get("/metrics")).text)
+                result = await _load(client, path, concurrency, seconds, warmup)
+                after = _scrape_pool_metrics((await client.get("/metrics")).text)
+                checkouts = after["db_pool_checkout_wait_seconds_count"] - before["db_pool_checkout_wait_seconds_count"]
+                wait = after["db_pool_checkout_wait_seconds_sum"] - before["db_pool_checkout_wait_seconds_sum"]
+                result = {
+                    "endpoint": path,
+                    "concurrency": concurrency,
+                    **result,
+                    "pool": {
+                        # 含预热阶段的签出
+                        "checkouts": int(checkouts),
+                        "avg_checkout_wait_ms": round(wait / checkouts * 1000, 3) if checkouts else 0.0,
+                        "preping_failures": int(after["db_pool_preping_failures_total"]
+                                                - before["db_pool_preping_failures_total"]),
+                        "invalidations": int(after["db_pool_invalidations_total"]
+                                             - before["db_pool_invalidations_total"]),
+                        "engines": [{"url": e["url"], "status": e["pool"]}
+                                    for e in (await _data(client, "/engine_stats"))["engines"]],
+                        "executor": await _data(client, "/executor_stats"),
+                    },
+                }
+                print(f"{path:<18}{concurrency:>6}{result['throughput']:>12.1f}{result['p50_ms']:>10.2f}"
+                      f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}", file=sys.stderr)
+                results.append(result)
+    return results
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    sync_url = os.environ.get("MYSQL_URL", f"sqlite:///{DB_PATH}")
+    async_url = os.environ.get("ASYNC_MYSQL_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+    fake_redis = None if "REDIS_URL" in os.environ else _start_fake_redis()
+    redis_url = fake_redis.redis_url if fake_redis else os.environ["REDIS_URL"]
+    # 压测需要读取 /metrics 及各统计接口，被测服务不校验调试口令
+    env = {"MYSQL_URL": sync_url, "ASYNC_MYSQL_URL": async_url, "REDIS_URL": redis_url, "DEBUG_TOKEN": ""}
+    paths = [p for p in PATHS if not args.endpoints or p in args.endpoints]
+    base_url = f"http://127.0.0.1:{PORT}"
+
+    report = {
+        **_git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "mysql_url": make_url(sync_url).render_as_string(hide_password=True),
+            "async_mysql_url": make_url(async_url).render_as_string(hide_password=True),
+            "redis": "fakeredis" if fake_redis else make_url(redis_url).render_as_string(hide_password=True),
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+            "warmup": args.warmup,
+        },
+        "runs": [],
+    }
+    try:
+        for rows in args.rows:
+            print(f"== users: {rows} 行", file=sys.stderr)
+            print(f"{'endpoint':<18}{'conc':>6}{'req/s':>12}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}",
+                  file=sys.stderr)
+            _seed(sync_url, rows)
+            # 每个数据量重启一次服务，避免上一轮的结果缓存影响本轮
+            proc = _start(env, args.workers)
+            try:
+                results = asyncio.run(_run_size(base_url, paths, args.concurrency, args.seconds, args.warmup, proc))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            report["runs"].append({"rows": rows, "results": results})
+    finally:
+        if fake_redis:
+            fake_redis.terminate()
+            fake_redis.wait(timeout=10)
+    return report
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """
+    对比两次结果：按 数据量/接口/并发 对齐，输出吞吐量与 p99 的变化百分比
+    """
+    def index(path):
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+        return report, {(run["rows"], r["endpoint"], r["concurrency"]): r
+                        for run in report["runs"] for r in run["results"]}
+
+    (old, old_results), (new, new_results) = index(old_path), index(new_path)
+    print(f"{(old.get('commit') or '?')[:10]} -> {(new.get('commit') or '?')[:10]}")
+    print(f"{'rows':>8} {'endpoint':<18}{'conc':>6}{'req/s old':>12}{'req/s new':>12}{'change':>9}"
+          f"{'p99 old':>10}{'p99 new':>10}{'change':>9}")
+
+    def pct(a, b):
+        return f"{(b - a) / a * 100:+8.1f}%" if a else f"{'n/a':>9}"
+
+    for key in sorted(old_results.keys() & new_results.keys()):
+        a, b = old_results[key], new_results[key]
+        print(f"{key[0]:>8} {key[1]:<18}{key[2]:>6}{a['throughput']:>12.1f}{b['throughput']:>12.1f}"
+              f"{pct(a['throughput'], b['throughput'])}{a['p99_ms']:>10.2f}{b['p99_ms']:>10.2f}"
+              f"{pct(a['p99_ms'], b['p99_ms'])}")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="全接口基准压测套件")
+    parser.add_argument("--rows", type=_int_list, default=[1000], help="users 表数据量，逗号分隔，如 1000,100000")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 16, 64], help="并发级别，逗号分隔")
+    parser.add_argument("--seconds", type=float, default=5, help="每个接口每个并发级别的压测秒数")
+    parser.add_argument("--warmup", type=float, default=1, help="每轮开始时不计入结果的预热秒数")
+    parser.add_argument("--workers", type=int, default=1, help="服务工作进程数")
+    parser.add_argument("--endpoints", type=lambda v: v.split(","), default=None, help="只压测这些接口，逗号分隔")
+    parser.add_argument("--output", default=None,
+                        help="结果文件路径，默认 benchmarks/results/<提交>-<时间>.json，- 表示输出到标准输出")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两个结果文件")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+    body = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(body)
+        return
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"{(report['commit'] or 'unknown')[:10]}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(body)
+    print(f"结果已写入 {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
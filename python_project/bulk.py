@@ -0,0 +1,217 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import inspect
+
+from pagination import check_identifier
+
+# 未能查询 max_allowed_packet 时使用的包大小上限（MySQL 8 默认 64MB，5.7 默认 4MB，取保守值）
+DEFAULT_MAX_PACKET = 4 * 1024 * 1024
+# 每条语句按 max_allowed_packet 的该比例估算上限，给字符串中引号、反斜杠等转义字符的膨胀留出余量
+PACKET_SAFETY_RATIO = 0.75
+# 每个值在SQL文本中的额外开销估算（引号、逗号）
+_VALUE_OVERHEAD = 4
+# 二进制值的额外开销：PyMySQL 拼接为 _binary'...'
+_BINARY_OVERHEAD = 8
+# MySQL 8.0.19 起支持 INSERT ... AS 别名 ON DUPLICATE KEY UPDATE c = 别名.c，8.0.20 起 VALUES(c) 写法已弃用
+_ROW_ALIAS_VERSION = (8, 0, 19)
+
+
+def placeholder(dialect) -> str:
+    """
+    根据驱动的参数风格返回位置参数占位符
+    @param dialect - SQLAlchemy方言
+    @returns {str} 占位符
+    """
+    if dialect.paramstyle in ("format", "pyformat"):
+        return "%s"
+    if dialect.paramstyle == "qmark":
+        return "?"
+    raise ValueError(f"批量插入不支持的参数风格: {dialect.paramstyle}")
+
+
+def normalize_rows(rows: Sequence[Any], columns: Optional[Sequence[str]] = None) -> Tuple[List[str], List[tuple]]:
+    """
+    统一行数据格式：字典行按列名取值，元组行要求显式传入列名
+    @param {Sequence} rows - 字典或元组组成的行列表
+    @param {Sequence[str]} columns - 列名，字典行时默认取第一行的键
+    @returns {Tuple[List[str], List[tuple]]} (列名, 行元组)
+    """
+    if not rows:
+        return list(columns or []), []
+    if isinstance(rows[0], dict):
+        columns = list(columns or rows[0].keys())
+        return columns, [tuple(row[c] for c in columns) for row in rows]
+    if not columns:
+        raise ValueError("元组行必须传入列名")
+    return list(columns), [tuple(row) for row in rows]
+
+
+def _mysql_row_alias(dialect) -> bool:
+    version = getattr(dialect, "server_version_info", None) or ()
+    return not getattr(dialect, "is_mariadb", False) and tuple(version[:3]) >= _ROW_ALIAS_VERSION
+
+
+def build_insert_sql(table: str, columns: Sequence[str], row_count: int, dialect,
+                     update_columns: Optional[Sequence[str]] = None,
+                     conflict_columns: Optional[Sequence[str]] = None) -> str:
+    """
+    生成多行 INSERT 语句，可带 upsert 子句
+    @param {str} table - 表名
+    @param {Sequence[str]} columns - 列名
+    @param {int} row_count - 行数
+    @param dialect - SQLAlchemy方言（决定占位符及upsert语法，MySQL 按服务器版本选择行别名或 VALUES() 写法）
+    @param {Sequence[str]} update_columns - 主键/唯一键冲突时要更新的列，None表示普通插入
+    @param {Sequence[str]} conflict_columns - 判断冲突的主键/唯一键列（ON CONFLICT (列)），SQLite/PostgreSQL 的 upsert 必须传入
+    @returns {str} SQL语句
+    @throws {ValueError} 标识符不合法、方言不支持upsert，或SQLite/PostgreSQL的upsert未传入 conflict_columns
+    """
+    check_identifier(table)
+    for column in columns:
+        check_identifier(column)
+    mark = placeholder(dialect)
+    row = "(" + ", ".join([mark] * len(columns)) + ")"
+    sql_query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([row] * row_count)
+    if update_columns:
+        for column in update_columns:
+            check_identifier(column)
+        if dialect.name == "mysql":
+            if _mysql_row_alias(dialect):
+                sql_query += " AS new ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = new.{c}" for c in update_columns)
+            else:
+                sql_query += " ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in update_columns)
+        elif dialect.name in ("sqlite", "postgresql"):
+            if not conflict_columns:
+                raise ValueError(f"{dialect.name} 的upsert需要指定冲突判断列 conflict_columns")
+            for column in conflict_columns:
+                check_identifier(column)
+            sql_query += (f" ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET "
+                          + ", ".join(f"{c} = excluded.{c}" for c in update_columns))
+        else:
+            raise ValueError(f"不支持的upsert方言: {dialect.name}")
+    return sql_query
+
+
+def primary_key_columns(connection, table: str) -> List[str]:
+    """
+    读取表的主键列，作为未指定 conflict_columns 时upsert的冲突判断列
+    @param connection - 同步连接（异步连接通过 run_sync 调用）
+    @param {str} table - 表名
+    @returns {List[str]} 主键列名
+    @throws {ValueError} 表没有主键
+    """
+    check_identifier(table)
+    columns = inspect(connection).get_pk_constraint(table).get("constrained_columns") or []
+    if not columns:
+        raise ValueError(f"表 {table} 没有主键，upsert需要指定 conflict_columns")
+    return list(columns)
+
+
+def build_case_update_sql(table: str, key: str, columns: Sequence[str], row_count: int, dialect) -> str:
+    """
+    生成按主键批量更新多行的 UPDATE 语句（每列一个 CASE 表达式）
+    参数顺序: 每列依次 (键, 值) * row_count，最后是 WHERE IN 的 row_count 个键
+    @param {str} table - 表名
+    @param {str} key - 主键列名
+    @param {Sequence[str]} columns - 要更新的列
+    @param {int} row_count - 行数
+    @param dialect - SQLAlchemy方言（决定占位符）
+    @returns {str} SQL语句
+    """
+    check_identifier(table)
+    check_identifier(key)
+    for column in columns:
+        check_identifier(column)
+    mark = placeholder(dialect)
+    whens = " ".join([f"WHEN {mark} THEN {mark}"] * row_count)
+    assignments = ", ".join(f"{c} = CASE {key} {whens} ELSE {c} END" for c in columns)
+    return f"UPDATE {table} SET {assignments} WHERE {key} IN ({', '.join([mark] * row_count)})"
+
+
+def packet_budget(max_packet: int) -> int:
+    """
+    每条语句SQL文本的估算字节上限
+    @param {int} max_packet - 服务器的 max_allowed_packet
+    """
+    return int(max_packet * PACKET_SAFETY_RATIO)
+
+
+def value_size(value: Any) -> int:
+    """
+    估算一个值按 UTF-8 拼接进SQL文本后的字节数（PyMySQL/aiomysql 在客户端转义后拼接参数）
+    """
+    if isinstance(value, str):
+        # isascii 不需要遍历字符串，纯ASCII时字符数即字节数，避免逐个编码
+        return (len(value) if value.isascii() else len(value.encode("utf-8"))) + _VALUE_OVERHEAD
+    if isinstance(value, (bytes, bytearray)):
+        return len(value) + _BINARY_OVERHEAD
+    if isinstance(value, memoryview):
+        return value.nbytes + _BINARY_OVERHEAD
+    return len(str(value)) + _VALUE_OVERHEAD
+
+
+def iter_chunks(rows: List[tuple], max_rows: int, max_bytes: int,
+                max_params: Optional[int] = None) -> Iterator[List[tuple]]:
+    """
+    按行数、估算的SQL字节数及参数个数上限切分行数据，保证每条语句不超过 max_allowed_packet
+    @param {List[tuple]} rows - 行元组
+    @param {int} max_rows - 每块最多行数
+    @param {int} max_bytes - 每块SQL文本的估算字节上限（见 packet_budget）
+    @param {int} max_params - 每块最多绑定参数个数（如SQLite的变量数限制）
+    @returns {Iterator[List[tuple]]} 逐块产出的行列表
+    """
+    if max_params and rows:
+        max_rows = max(1, min(max_rows, max_params // max(1, len(rows[0]))))
+    chunk: List[tuple] = []
+    size = 0
+    for row in rows:
+        row_size = sum(value_size(v) for v in row) + 4
+        if chunk and (len(chunk) >= max_rows or size + row_size > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield chunk
+
+
+def inserted_id_range(dialect, lastrowid: Optional[int], rowcount: int) -> Optional[Tuple[int, int]]:
+    """
+    根据多行插入的 lastrowid 推算本块生成的自增ID区间
+    MySQL 返回本条语句第一行的ID；InnoDB 在 innodb_autoinc_lock_mode 为 0/1 时，
+    单条多行 INSERT 分配的ID连续；为 2（8.0默认）且存在并发插入时可能不连续，区间仅供参考
+    @param dialect - SQLAlchemy方言
+    @param {int} lastrowid - 驱动返回的 lastrowid
+    @param {int} rowcount - 插入行数
+    @returns {Optional[Tuple[int, int]]} (起始ID, 结束ID)
+    """
+    if not lastrowid or rowcount <= 0:
+        return None
+    if dialect.name == "mysql":
+        return lastrowid, lastrowid + rowcount - 1
+    return lastrowid - rowcount + 1, lastrowid
+
+
+def merge_id_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    合并相邻的ID区间
+    @param {List[Tuple[int, int]]} ranges - ID区间列表
+    @returns {List[Tuple[int, int]]} 合并后的区间列表
+    """
+    merged: List[Tuple[int, int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(last, merged[-1][1]))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def max_params_for(dialect) -> Optional[int]:
+    """
+    驱动单条语句的绑定参数个数上限；PyMySQL/aiomysql 在客户端拼接参数，无此限制
+    """
+    return 32766 if dialect.name == "sqlite" else None
+
+
+def bulk_result(rowcount: int, id_ranges: List[Tuple[int, int]], chunks: int) -> Dict[str, Any]:
+    return {"rowcount": rowcount, "id_ranges": merge_id_ranges(id_ranges), "chunks": chunks}
@@ -0,0 +1,198 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from pagination import check_identifier
+
+# 当前请求的查询备忘 {(loader, 键): future}，由 DataLoaderMiddleware 为每个请求创建，请求结束即丢弃
+request_memo: ContextVar[Optional[Dict]] = ContextVar("request_memo", default=None)
+
+BatchFn = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # 所有等待方都已取消时，避免出现 "Future exception was never retrieved" 警告
+    if not future.cancelled():
+        future.exception()
+
+
+class DataLoader:
+    """
+    按键批量加载：同一个事件循环轮次（或 batch_window 秒内）各调用方发起的 load(key) 合并为一次 batch_fn(keys)，
+    再把结果按键分发给每个调用方；同一批次内的相同键只查询一次
+    - 批次完成即释放，不跨批次缓存，之后的 load 会重新查询，不会读到写操作之前的结果
+    - 在 DataLoaderMiddleware 内调用时，同一请求内重复 load 同一个键直接复用第一次的结果
+    - 调用方被取消时只取消自己的等待，不影响同批次的其他调用方
+    所有方法都在事件循环线程中调用，无需加锁
+    """
+
+    def __init__(self, name: str, batch_fn: BatchFn, max_batch_size: int = 1000, batch_window: float = 0.0):
+        """
+        @param {str} name - 名称（统计用）
+        @param {BatchFn} batch_fn - 批量加载协程函数，接收键列表，返回 {键: 值}，缺失的键结果为 None
+        @param {int} max_batch_size - 每批最多键数，攒满立即发出
+        @param {float} batch_window - 攒批等待秒数，0表示只合并同一事件循环轮次内的调用
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = batch_window
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._handle: Optional[asyncio.Handle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.loads = 0
+        self.memo_hits = 0
+        self.shared = 0
+        self.batches = 0
+        self.keys = 0
+        self.errors = 0
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        加载一个键
+        @param {Hashable} key - 键（类型需与 batch_fn 返回的键一致，如整数主键）
+        @returns {Any} 对应的值，不存在时返回 None
+        """
+        self.loads += 1
+        memo = request_memo.get()
+        future = memo.get((self, key)) if memo is not None else None
+        if future is not None:
+            self.memo_hits += 1
+        else:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._schedule(key)
+            else:
+                self.shared += 1
+            if memo is not None:
+                memo[(self, key)] = future
+                # 失败的结果不留在备忘中，同一请求内可以重试
+                future.add_done_callback(
+                    lambda f: memo.pop((self, key), None) if f.cancelled() or f.exception() else None)
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        """
+        加载多个键，合并在同一批次中
+        @param {Iterable[Hashable]} keys - 键
+        @returns {List[Any]} 与 keys 顺序一致的值列表，不存在的为 None
+        """
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self, key: Optional[Hashable] = None) -> None:
+        """
+        清除当前请求内的备忘（写入后再读同一个键时调用）
+        @param {Hashable} key - 键，None表示清除本 loader 的全部备忘
+        """
+        memo = request_memo.get()
+        if memo is None:
+            return
+        if key is not None:
+            memo.pop((self, key), None)
+            return
+        for memo_key in [k for k in memo if k[0] is self]:
+            del memo[memo_key]
+
+    def _schedule(self, key: Hashable) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(_consume_exception)
+        self._pending[key] = future
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._handle is None:
+            # call_soon 的回调在本轮已就绪的协程都执行完之后才运行，本轮发起的 load 都会进入同一批次
+            self._handle = loop.call_later(self.batch_window, self._dispatch) if self.batch_window > 0 \
+                else loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+        self.keys += len(batch)
+        try:
+            values = await self.batch_fn(list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            self.errors += 1
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        批量加载统计
+        @returns {Dict[str, Any]} 调用次数、请求内备忘命中、同批次共享、批次数、平均每批键数、出错批次数
+        """
+        return {
+            "loads": self.loads,
+            "memo_hits": self.memo_hits,
+            "shared": self.shared,
+            "batches": self.batches,
+            "keys": self.keys,
+            "avg_batch_size": round(self.keys / self.batches, 2) if self.batches else 0.0,
+            "errors": self.errors,
+        }
+
+
+def row_loader(name: str, query_in: Callable[..., Awaitable[List[Dict]]], table: str, key: str = "id",
+               columns: str = "*", max_batch_size: int = 1000, batch_window: float = 0.0) -> DataLoader:
+    """
+    按键加载整行的 DataLoader：一批键用一条 SELECT ... WHERE key IN :keys 查询
+    @param {str} name - 名称
+    @param {Callable} query_in - 异步 query_in（AsyncMySQLServer.query_in / ThreadedMySQLServer.query_in）
+    @param {str} table - 表名
+    @param {str} key - 键列名
+    @param {str} columns - 查询列，必须包含键列
+    @param {int} max_batch_size - 每批最多键数
+    @param {float} batch_window - 攒批等待秒数
+    @returns {DataLoader} 结果为 {键: 行字典}
+    """
+    check_identifier(table)
+    check_identifier(key)
+    sql_query = f"SELECT {columns} FROM {table} WHERE {key} IN :keys"
+
+    async def batch_fn(keys: List[Hashable]) -> Dict[Hashable, Any]:
+        rows = await query_in(sql_query, "keys", tuple(keys), chunk_size=max_batch_size)
+        try:
+            return {row[key]: row for row in rows}
+        except KeyError:
+            raise ValueError(f"查询列必须包含键列: {key}")
+
+    return DataLoader(name, batch_fn, max_batch_size=max_batch_size, batch_window=batch_window)
+
+
+class DataLoaderMiddleware:
+    """
+    纯ASGI中间件：为每个请求创建独立的查询备忘，请求内重复加载同一个键只查询一次
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = request_memo.set({})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_memo.reset(token)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import AsyncExitStack, ExitStack
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from instrumentation import instrument_engine
+from pool_health import install_idle_ping
+
+logger = logging.getLogger(__name__)
+
+
+class EngineRegistry:
+    """
+    进程级引擎注册表：按 连接地址 + 引擎参数 共享引擎及连接池，首次使用时才创建
+    同一个库的多个 MySQLServer / AsyncMySQLServer 实例共用一个连接池
+    """
+
+    def __init__(self):
+        self._engines: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _key(database_url: str, is_async: bool, options: Dict[str, Any]) -> Tuple:
+        return str(database_url), is_async, tuple(sorted((k, repr(v)) for k, v in options.items()))
+
+    def get(self, database_url: str, is_async: bool = False, ping_idle_seconds: Optional[float] = None, **options):
+        """
+        获取（必要时创建）共享引擎
+        @param {str} database_url - 数据库连接地址
+        @param {bool} is_async - 是否异步引擎
+        @param {float} ping_idle_seconds - 签出时只 ping 空闲超过该秒数的连接（见 pool_health.install_idle_ping），
+                                           None 不挂载（可配合 pool_pre_ping 每次签出都 ping）
+        @param options - 传给 create_engine / create_async_engine 的参数
+        @returns {Engine|AsyncEngine} 引擎
+        """
+        key = self._key(database_url, is_async, dict(options, ping_idle_seconds=ping_idle_seconds))
+        engine = self._engines.get(key)
+        if engine is not None:
+            self.reused += 1
+            return engine
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = (create_async_engine if is_async else create_engine)(database_url, **options)
+                instrument_engine(engine)
+                if ping_idle_seconds is not None:
+                    install_idle_ping(engine, ping_idle_seconds)
+                self._engines[key] = engine
+                self.created += 1
+            else:
+                self.reused += 1
+        return engine
+
+    def engines(self) -> List[Any]:
+        with self._lock:
+            return list(self._engines.values())
+
+    @staticmethod
+    def _warmup_size(engine, connections: int) -> int:
+        # 只预热常驻连接，超出 pool_size 的溢出连接归还时会被关闭，预热没有意义
+        size = getattr(engine.pool, "size", None)
+        return min(connections, size()) if callable(size) else min(connections, 1)
+
+    @classmethod
+    def _warmup_sync(cls, engine, connections: int) -> int:
+        with ExitStack() as stack:
+            opened = 0
+            for _ in range(cls._warmup_size(engine, connections)):
+                stack.enter_context(engine.connect())
+                opened += 1
+            return opened
+
+    @classmethod
+    async def _warmup_async(cls, engine: AsyncEngine, connections: int) -> int:
+        async with AsyncExitStack() as stack:
+            opened = 0
+            for _ in range(cls._warmup_size(engine.sync_engine, connections)):
+                await stack.enter_async_context(engine.connect())
+                opened += 1
+            return opened
+
+    async def warmup(self, engines: Sequence[Any], connections: int) -> Dict[str, Any]:
+        """
+        预先建立连接池中的连接（同时签出再归还），避免首批请求承担建连开销
+        单个引擎预热失败只记录日志，不影响应用启动
+        @param {Sequence} engines - 要预热的引擎（同步引擎在线程中预热，不阻塞事件循环）
+        @param {int} connections - 每个引擎预热的连接数，不超过其 pool_size
+        @returns {Dict[str, Any]} 预热的连接数、失败数及耗时毫秒
+        """
+        start = time.perf_counter()
+        opened = failed = 0
+        if connections > 0:
+            tasks = []
+            for engine in dict.fromkeys(engines):
+                if isinstance(engine, AsyncEngine):
+                    tasks.append(self._warmup_async(engine, connections))
+                else:
+                    tasks.append(asyncio.to_thread(self._warmup_sync, engine, connections))
+            for engine, result in zip(dict.fromkeys(engines), await asyncio.gather(*tasks, return_exceptions=True)):
+                if isinstance(result, BaseException):
+                    failed += 1
+                    logger.error(f"连接池预热失败: {engine.url.render_as_string(hide_password=True)} | {result}")
+                else:
+                    opened += result
+        return {"connections": opened, "failed": failed, "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    def reset_after_fork(self) -> None:
+        """
+        fork 后在子进程中调用：丢弃从父进程继承的连接池（不关闭底层socket，父进程仍在使用），
+        子进程之后按需建立自己的连接
+        """
+        self._lock = threading.Lock()
+        for engine in self._engines.values():
+            (engine.sync_engine if isinstance(engine, AsyncEngine) else engine).dispose(close=False)
+
+    async def dispose(self) -> None:
+        """
+        关闭所有引擎的连接池（应用关闭时调用），之后再次使用会按需重建连接
+        """
+        for engine in self.engines():
+            try:
+                if isinstance(engine, AsyncEngine):
+                    await engine.dispose()
+                else:
+                    engine.dispose()
+            except Exception as e:
+                logger.error(f"连接池关闭失败: {engine.url.render_as_string(hide_password=True)} | {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        注册表统计
+        @returns {Dict[str, Any]} 创建/复用次数及各引擎连接池状态
+        """
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "engines": [
+                {
+                    "url": engine.url.render_as_string(hide_password=True),
+                    "async": isinstance(engine, AsyncEngine),
+                    "pool": engine.pool.status(),
+                }
+                for engine in self.engines()
+            ],
+        }
+
+
+# 创建全局实例
+engine_registry = EngineRegistry()
+
+# 预加载应用后再 fork 工作进程（如 gunicorn --preload）时，子进程不能复用父进程的连接
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=engine_registry.reset_after_fork)
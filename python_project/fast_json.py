@@ -0,0 +1,170 @@
+import base64
+import datetime
+import json
+import uuid
+from array import array
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json，输出格式一致
+    orjson = None
+
+# orjson 选项：允许非字符串字典键（如按 id 分组的结果）
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _default(obj: Any) -> Any:
+    """
+    orjson / json 无法直接序列化的类型，与 FastAPI jsonable_encoder 的转换规则保持一致：
+    Decimal 按有无小数转换为 int / float，bytes 按UTF-8解码，timedelta 转为秒数，
+    array.array（columnar_typed 结果）转为 list，SQLAlchemy Row 按元组输出
+    datetime / date / time / UUID 由 orjson 原生处理，这里仅供标准库回退使用
+    """
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).decode("utf-8", errors="replace")
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, array):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "_mapping"):
+        return tuple(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    序列化为紧凑的UTF-8 JSON字节，行元组直接输出为JSON数组，不经过中间字典
+    @param {Any} obj - 待序列化对象
+    @returns {bytes} JSON字节
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# 带类型数据的标签键：{"$t": 类型, "v": 值}
+_TAG = "$t"
+_INT64_MIN, _UINT64_MAX = -(1 << 63), (1 << 64) - 1
+
+
+def _pack(obj: Any) -> Any:
+    """
+    把值转换为只含JSON原生类型的结构，JSON无法区分的类型（datetime / Decimal / tuple 等）转为带类型标签的字典
+    """
+    if obj is None or isinstance(obj, (str, bool, float)):
+        return obj
+    if isinstance(obj, int):
+        return obj if _INT64_MIN <= obj <= _UINT64_MAX else {_TAG: "int", "v": str(obj)}
+    if isinstance(obj, dict):
+        if _TAG not in obj and all(type(k) is str for k in obj):
+            return {k: _pack(v) for k, v in obj.items()}
+        return {_TAG: "map", "v": [[_pack(k), _pack(v)] for k, v in obj.items()]}
+    if isinstance(obj, list):
+        return [_pack(v) for v in obj]
+    if isinstance(obj, tuple) or hasattr(obj, "_mapping"):
+        return {_TAG: "tuple", "v": [_pack(v) for v in obj]}
+    if isinstance(obj, datetime.datetime):
+        return {_TAG: "datetime", "v": obj.isoformat()}
+    if isinstance(obj, datetime.date):
+        return {_TAG: "date", "v": obj.isoformat()}
+    if isinstance(obj, datetime.time):
+        return {_TAG: "time", "v": obj.isoformat()}
+    if isinstance(obj, datetime.timedelta):
+        return {_TAG: "timedelta", "v": [obj.days, obj.seconds, obj.microseconds]}
+    if isinstance(obj, Decimal):
+        return {_TAG: "decimal", "v": str(obj)}
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return {_TAG: "bytes", "v": base64.b64encode(bytes(obj)).decode("ascii")}
+    if isinstance(obj, uuid.UUID):
+        return {_TAG: "uuid", "v": str(obj)}
+    if isinstance(obj, array):
+        return {_TAG: "array", "c": obj.typecode, "v": obj.tolist()}
+    if isinstance(obj, (set, frozenset)):
+        return {_TAG: "set", "v": [_pack(v) for v in obj]}
+    raise TypeError(f"Object of type {type(obj).__name__} is not supported by encode_value")
+
+
+_UNPACK = {
+    "int": int,
+    "map": lambda v: {_unpack(k): _unpack(x) for k, x in v},
+    "tuple": lambda v: tuple(_unpack(x) for x in v),
+    "datetime": datetime.datetime.fromisoformat,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "timedelta": lambda v: datetime.timedelta(*v),
+    "decimal": Decimal,
+    "bytes": base64.b64decode,
+    "uuid": uuid.UUID,
+    "set": lambda v: {_unpack(x) for x in v},
+}
+
+
+def _unpack(obj: Any) -> Any:
+    if isinstance(obj, list):
+        return [_unpack(v) for v in obj]
+    if isinstance(obj, dict):
+        tag = obj.get(_TAG)
+        if tag is None:
+            return {k: _unpack(v) for k, v in obj.items()}
+        if tag == "array":
+            return array(obj["c"], obj["v"])
+        return _UNPACK[tag](obj["v"])
+    return obj
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    把缓存值序列化为只含数据的JSON字节（用于Redis等共享存储，不使用 pickle：
+    能写入Redis的人不能借反序列化在应用中执行代码），datetime / Decimal / tuple / bytes 等类型带类型标签，
+    decode_value 还原后类型不变
+    @param {Any} value - 缓存值（查询结果、主键、列值）
+    @returns {bytes} JSON字节
+    @throws {TypeError} 包含不支持的类型
+    """
+    packed = _pack(value)
+    if orjson is not None:
+        return orjson.dumps(packed)
+    return json.dumps(packed, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_value(raw: bytes) -> Any:
+    """
+    反序列化 encode_value 的结果
+    @param {bytes} raw - JSON字节
+    @returns {Any} 原值
+    """
+    value = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    # 不含类型标签时无需再遍历一遍
+    return _unpack(value) if b'"$t"' in raw else value
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    使用 dumps 渲染的JSON响应
+    作为 FastAPI 的 default_response_class 时，返回 dict 的接口仍会先经过 jsonable_encoder；
+    返回大结果集的接口应直接返回 FastJSONResponse，跳过逐个对象递归转换
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def success(data: Any) -> FastJSONResponse:
+    """
+    统一格式的成功响应 {"code": 200, "message": "success", "data": data}，直接序列化，不经过 jsonable_encoder
+    @param {Any} data - 响应数据
+    @returns {FastJSONResponse} 响应
+    """
+    return FastJSONResponse({"code": 200, "message": "success", "data": data})
@@ -0,0 +1,145 @@
+import re
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.sql.elements import TextClause
+
+from statement_cache import statement_cache
+
+# 拆块时每块最多多少个值（拆块需调用方显式传入 chunk_size）：每条语句的占位符个数固定，编译结果可复用
+DEFAULT_IN_CHUNK_SIZE = 1000
+# 异步服务同时执行的块数（每块占用一个连接池连接）
+DEFAULT_IN_CONCURRENCY = 4
+# 值个数超过该阈值时改为：写入临时表后关联查询，只执行一条查询语句
+DEFAULT_TEMP_TABLE_THRESHOLD = 20000
+# 临时表名前缀：临时表只对当前连接可见，SQL 中每处 IN :ids 按出现顺序各用一张 tmp_in_values_0、_1 ...
+# （MySQL 一条语句中不能两次引用同一张临时表），表名固定，改写后的SQL保持不变，语句缓存及指标指纹都能复用
+TEMP_TABLE = "tmp_in_values"
+
+
+@lru_cache(maxsize=256)
+def _in_pattern(param_name: str) -> re.Pattern:
+    # 匹配 IN :ids 或 IN (:ids)，前面可带 NOT
+    name = re.escape(param_name)
+    return re.compile(rf"(\bNOT\s+)?\bIN\s*(?:\(\s*:{name}\s*\)|:{name}\b)", re.IGNORECASE)
+
+
+def in_statement(sql_query: str, param_name: str) -> TextClause:
+    """
+    IN 参数按列表展开的语句（IN :ids 渲染为 IN (?, ?, ...)），各方言通用，按 SQL 及参数名缓存
+    @param {str} sql_query - SQL语句，IN 子句写作 IN :ids 或 IN (:ids)
+    @param {str} param_name - IN子句参数名
+    @returns {TextClause} 语句对象
+    """
+    sql_query = _in_pattern(param_name).sub(lambda m: f"{m.group(1) or ''}IN :{param_name}", sql_query)
+    return statement_cache.text(sql_query, expanding=(param_name,))
+
+
+def is_not_in(sql_query: str, param_name: str) -> bool:
+    """
+    是否为 NOT IN 查询：NOT IN 拆块后各块结果的并集不等于整体结果，只能整条执行
+    """
+    return any(m.group(1) for m in _in_pattern(param_name).finditer(sql_query))
+
+
+# 结果跨值计算的子句：拆块后各块结果直接拼接不等于整体结果（如得到多行 COUNT、各块各自 LIMIT）
+_CROSS_VALUE_RE = re.compile(
+    r"\b(?:ORDER\s+BY|GROUP\s+BY|LIMIT|HAVING|DISTINCT|UNION)\b|\b(?:COUNT|SUM|AVG|MIN|MAX|GROUP_CONCAT)\s*\(",
+    re.IGNORECASE)
+
+
+def can_split(sql_query: str, param_name: str) -> bool:
+    """
+    IN 查询能否拆块执行后拼接结果：不是 NOT IN，且不含排序、分组、聚合、去重、LIMIT 等跨值计算的子句
+    """
+    return not is_not_in(sql_query, param_name) and not _CROSS_VALUE_RE.search(sql_query)
+
+
+def unique_values(values: Iterable[Any]) -> List[Any]:
+    """
+    保持原顺序去重：IN 本身按集合匹配，去重不改变结果，且保证各块之间没有重复值、合并结果不重复
+    """
+    return list(dict.fromkeys(values))
+
+
+def split_values(values: List[Any], chunk_size: int) -> List[tuple]:
+    """
+    按固定大小切分值列表，最后一块用最后一个值补齐，使每块语句的占位符个数相同
+    @param {List[Any]} values - 去重后的值列表
+    @param {int} chunk_size - 每块值个数
+    @returns {List[tuple]} 各块的值元组
+    """
+    chunks = [tuple(values[i:i + chunk_size]) for i in range(0, len(values), chunk_size)]
+    if len(chunks) > 1 and len(chunks[-1]) < chunk_size:
+        chunks[-1] += (chunks[-1][-1],) * (chunk_size - len(chunks[-1]))
+    return chunks
+
+
+def chunk_size_for(dialect, chunk_size: int, other_params: int = 0) -> int:
+    """
+    结合驱动的绑定参数个数上限（如SQLite）确定每块值个数
+    """
+    if dialect.name == "sqlite":
+        return max(1, min(chunk_size, 32766 - other_params))
+    return max(1, chunk_size)
+
+
+def temp_table_sql(dialect, table: str, values: Sequence[Any]) -> Tuple[str, str]:
+    """
+    生成临时表的建表及删表语句，单列 v 带主键，值类型按取值推断
+    @param dialect - SQLAlchemy方言
+    @param {str} table - 临时表名
+    @param {Sequence[Any]} values - 要写入的值
+    @returns {Tuple[str, str]} (建表语句, 删表语句)
+    """
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        column = "v BIGINT PRIMARY KEY"
+    else:
+        length = max((len(str(v)) for v in values), default=1)
+        column = f"v VARCHAR({max(1, length)}) PRIMARY KEY"
+    if dialect.name == "mysql":
+        return f"CREATE TEMPORARY TABLE {table} ({column})", f"DROP TEMPORARY TABLE IF EXISTS {table}"
+    if dialect.name == "sqlite":
+        return f"CREATE TEMP TABLE {table} ({column})", f"DROP TABLE IF EXISTS temp.{table}"
+    return f"CREATE TEMPORARY TABLE {table} ({column})", f"DROP TABLE IF EXISTS {table}"
+
+
+def rewrite_for_temp_table(sql_query: str, param_name: str, table: str) -> Tuple[str, List[str]]:
+    """
+    把每处 IN :ids 改写为 IN (SELECT v FROM 临时表_序号)
+    @param {str} sql_query - SQL语句
+    @param {str} param_name - IN子句参数名
+    @param {str} table - 临时表名前缀
+    @returns {Tuple[str, List[str]]} (改写后的SQL, 按出现顺序各处使用的临时表名)
+    """
+    tables: List[str] = []
+
+    def replace(match: re.Match) -> str:
+        tables.append(f"{table}_{len(tables)}")
+        return f"{match.group(1) or ''}IN (SELECT v FROM {tables[-1]})"
+
+    return _in_pattern(param_name).sub(replace, sql_query), tables
+
+
+def merge_rows(columns: Sequence[str], parts: Iterable[Sequence[Any]], dedupe: bool = False,
+               order_by: Optional[str] = None) -> List[Any]:
+    """
+    合并各块的结果行
+    @param {Sequence[str]} columns - 列名
+    @param {Iterable[Sequence]} parts - 各块的结果行
+    @param {bool} dedupe - 是否去掉完全相同的行（如关联查询在不同块中产生的重复行）
+    @param {str} order_by - 合并后按该列排序，前缀 - 表示倒序，None表示保持各块顺序
+    @returns {List[Any]} 结果行
+    """
+    rows = [row for part in parts for row in part]
+    if dedupe:
+        rows = list(dict.fromkeys(rows))
+    if order_by:
+        descending = order_by.startswith("-")
+        name = order_by.lstrip("-")
+        columns = list(columns)
+        if name not in columns:
+            raise ValueError(f"排序列不在结果中: {name}")
+        index = columns.index(name)
+        rows.sort(key=lambda row: (row[index] is None, row[index]), reverse=descending)
+    return rows
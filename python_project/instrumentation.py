@@ -0,0 +1,146 @@
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from metrics import metrics
+from sql_utils import fingerprint
+
+# 数据库语句（由 MySQLServer / AsyncMySQLServer 在执行处记录，不挂 cursor 事件，避免SQLAlchemy事件分发开销）
+DB_STATEMENT_SECONDS = metrics.histogram(
+    "db_statement_duration_seconds", "SQL语句执行耗时（按语句指纹）", ("fingerprint",))
+DB_STATEMENT_ROWS = metrics.counter(
+    "db_statement_rows_total", "SQL语句返回/影响的行数（按语句指纹）", ("fingerprint",))
+DB_STATEMENT_ERRORS = metrics.counter(
+    "db_statement_errors_total", "SQL语句执行失败次数（按语句指纹）", ("fingerprint",))
+
+# 连接池
+DB_POOL_CHECKOUT_SECONDS = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "从连接池获取连接的等待耗时（含新建连接及空闲连接ping）", ("pool",))
+DB_POOL_PREPING_FAILURES = metrics.counter(
+    "db_pool_preping_failures_total", "签出连接时 ping 检测到失效连接的次数", ("pool",))
+DB_POOL_INVALIDATIONS = metrics.counter(
+    "db_pool_invalidations_total", "连接被判定失效并丢弃的次数", ("pool",))
+
+# Redis
+REDIS_COMMAND_SECONDS = metrics.histogram(
+    "redis_command_duration_seconds", "Redis命令往返耗时（管道按一次往返计）", ("command",))
+
+# HTTP
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "接口请求耗时（按路由模板）", ("method", "route", "status"))
+
+# 已接入统计的引擎（同步引擎） -> 连接池标签
+_pool_labels: Dict[object, str] = {}
+
+
+def pool_label(engine) -> str:
+    """
+    连接池标签：驱动://主机/库名，不含账号密码
+    @param engine - 同步或异步引擎
+    @returns {str} 标签值
+    """
+    engine = getattr(engine, "sync_engine", engine)
+    label = _pool_labels.get(engine)
+    if label is None:
+        url = engine.url
+        label = f"{url.drivername}://{url.host or ''}/{url.database or ''}"
+    return label
+
+
+def _pool_states() -> Iterator[Tuple[str, object]]:
+    for engine, label in list(_pool_labels.items()):
+        yield label, engine.pool
+
+
+def _pool_gauge(getter) -> List[Tuple[Tuple[str], float]]:
+    values = []
+    for label, pool in _pool_states():
+        value = getter(pool)
+        if value is not None:
+            values.append(((label,), value))
+    return values
+
+
+metrics.gauge("db_pool_size", "连接池常驻连接数上限", ("pool",),
+              lambda: _pool_gauge(lambda pool: pool.size() if hasattr(pool, "size") else None))
+metrics.gauge("db_pool_checked_out", "已签出（使用中）的连接数", ("pool",),
+              lambda: _pool_gauge(lambda pool: pool.checkedout() if hasattr(pool, "checkedout") else None))
+metrics.gauge("db_pool_overflow", "当前溢出连接数（为负表示常驻连接尚未建满）", ("pool",),
+              lambda: _pool_gauge(lambda pool: pool.overflow() if hasattr(pool, "overflow") else None))
+
+
+def instrument_engine(engine) -> None:
+    """
+    将引擎纳入连接池指标，并挂载 pre-ping 失败及连接失效统计（只在出错时触发，正常执行路径无开销）
+    @param engine - 同步或异步引擎（异步引擎挂在其 sync_engine 上）
+    """
+    engine = getattr(engine, "sync_engine", engine)
+    if engine in _pool_labels:
+        return
+    label = pool_label(engine)
+    _pool_labels[engine] = label
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if getattr(context, "is_pre_ping", False):
+            DB_POOL_PREPING_FAILURES.inc((label,))
+
+    @event.listens_for(engine.pool, "invalidate")
+    def invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_INVALIDATIONS.inc((label,))
+
+
+def observe_statement(sql_query: str, seconds: float, rows: Optional[int] = None, success: bool = True) -> None:
+    """
+    记录一次语句执行
+    @param {str} sql_query - SQL语句
+    @param {float} seconds - 耗时秒数
+    @param {int} rows - 返回或影响的行数
+    @param {bool} success - 执行是否成功
+    """
+    labels = (fingerprint(sql_query),)
+    if not success:
+        DB_STATEMENT_ERRORS.inc(labels)
+        return
+    DB_STATEMENT_SECONDS.observe(seconds, labels)
+    if rows:
+        DB_STATEMENT_ROWS.inc(labels, rows)
+
+
+def observe_checkout(engine, seconds: float) -> None:
+    """
+    记录一次连接签出等待耗时
+    @param engine - 同步或异步引擎
+    @param {float} seconds - 等待秒数
+    """
+    DB_POOL_CHECKOUT_SECONDS.observe(seconds, (pool_label(engine),))
+
+
+class RouteMetricsMiddleware:
+    """
+    纯ASGI中间件：按路由模板（如 /test7/{page}）记录接口耗时与状态码，未匹配的路径统一记为 unmatched，
+    流式响应记录到最后一块发送完毕
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, (scope["method"], route, str(status)))
@@ -1,28 +1,200 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from database import MySQLServer
 from async_database import AsyncMySQLServer
-app = FastAPI()
+from async_redis import async_redis_server
+import redis
 
-my_sql_server = MySQLServer()
-async_mysql_server = AsyncMySQLServer()
+from query_cache import AsyncQueryCache, InvalidationSubscriber, MemoryCache, RedisQueryCache
+from statement_cache import statement_cache
+from threaded_database import ThreadedMySQLServer
+from streaming import ndjson_response, json_array_response, prefetch
+from result_format import RESULT_FORMATS
+from fast_json import FastJSONResponse, success
+from engine_registry import engine_registry
+from metrics import metrics
+from instrumentation import RouteMetricsMiddleware
+from slow_query import SlowQueryLog
+from admission import PRIORITY_HIGH, PRIORITY_LOW, AdaptiveLimiter, Overloaded, PriorityMiddleware
+from dataloader import DataLoaderMiddleware
+from pagination import COUNT_STRATEGIES
+from write_behind import RedisStore
+from profiler import ProfilerMiddleware, SamplingProfiler
+from pool_health import PoolKeepalive
+import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期：启动时建立Redis长连接池并预热数据库连接池，关闭时等待在用连接归还后断开，
+    关闭同步数据库线程池并释放所有数据库连接
+    """
+    await async_redis_server.connect()
+    # 订阅其他工作进程的表失效广播，清理本进程的内存缓存
+    cache_invalidation.start()
+    app.state.pool_warmup = await engine_registry.warmup([my_sql_server.engine, async_mysql_server.engine],
+                                                         settings.POOL_WARMUP_CONNECTIONS)
+    # 后台保活：提前 ping 空闲连接并重建失效连接，请求路径上签出时基本不需要再 ping
+    if settings.DB_KEEPALIVE_SECONDS > 0:
+        pool_keepalive.start()
+    try:
+        yield
+    finally:
+        await pool_keepalive.close()
+        # 先刷写写后缓冲中剩余的更新（Redis缓冲需在关闭Redis之前）
+        await async_mysql_server.close_write_behind()
+        await async_redis_server.close()
+        await asyncio.to_thread(cache_invalidation.stop)
+        sync_redis.close()
+        threaded_sql_server.shutdown(wait=True)
+        await engine_registry.dispose()
+
+# 默认使用 orjson 渲染响应；返回查询结果的接口直接返回 success(...)，跳过 jsonable_encoder
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+# 按路由记录接口耗时，导出到 /metrics
+app.add_middleware(RouteMetricsMiddleware)
+
+# 接口优先级：数据库过载时写接口先被限流，命中缓存的单行读取最后受影响；未列出的为 normal
+ROUTE_PRIORITIES = {
+    "/test1": PRIORITY_HIGH, "/test2": PRIORITY_HIGH, "/test3": PRIORITY_HIGH,
+    "/async_test1": PRIORITY_HIGH, "/async_test2": PRIORITY_HIGH, "/async_test3": PRIORITY_HIGH,
+    "/test4": PRIORITY_LOW, "/test5": PRIORITY_LOW, "/test6": PRIORITY_LOW,
+    "/async_test4": PRIORITY_LOW, "/async_test5": PRIORITY_LOW, "/async_test6": PRIORITY_LOW,
+}
+app.add_middleware(PriorityMiddleware, priorities=ROUTE_PRIORITIES)
+# 每个请求独立的 DataLoader 查询备忘
+app.add_middleware(DataLoaderMiddleware)
+# 请求采样分析：按比例或携带 X-Debug-Profile 请求头（值须等于 PROFILE_TOKEN）的请求生成火焰图，结果通过 /debug/profiles 下载
+profiler = SamplingProfiler(interval=settings.PROFILE_INTERVAL_MS / 1000, output_dir=settings.PROFILE_DIR or None)
+if settings.PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware, profiler=profiler, sample_rate=settings.PROFILE_SAMPLE_RATE,
+                       token=settings.PROFILE_TOKEN or None, max_concurrent=settings.PROFILE_MAX_CONCURRENT)
+
+
+def _check_token(request: Request, token: str) -> None:
+    """
+    配置了口令时，请求头 X-Debug-Token 或 Authorization: Bearer（便于 Prometheus 抓取）须等于该口令，未配置时不校验
+    @throws {HTTPException} 口令缺失或不匹配时 401
+    """
+    if not token:
+        return
+    supplied = request.headers.get("x-debug-token")
+    if supplied is None:
+        scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+        supplied = credentials if scheme.lower() == "bearer" else ""
+    if not secrets.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="调试口令无效")
+
+
+def require_debug_token(request: Request) -> None:
+    """
+    统计、指标及调试接口的访问校验（DEBUG_TOKEN）
+    """
+    _check_token(request, settings.DEBUG_TOKEN)
+
+
+def require_profile_token(request: Request) -> None:
+    """
+    分析结果接口的访问校验：DEBUG_TOKEN，未配置时使用触发分析的 PROFILE_TOKEN
+    """
+    _check_token(request, settings.DEBUG_TOKEN or settings.PROFILE_TOKEN)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    """
+    数据库过载时快速失败：返回 503 及 Retry-After，而不是在连接池上排队直到超时
+    """
+    return JSONResponse(status_code=503, headers={"Retry-After": str(exc.retry_after)},
+                        content={"code": 503, "message": str(exc), "data": None})
+
+
+# 热点查询结果缓存秒数
+CACHE_TTL = 60
+# 每个工作进程分到的连接池大小（MySQL连接总预算按进程数及连接池个数平分）
+POOL_SIZE, MAX_OVERFLOW = settings.db_pool_size()
+
+
+
+def _admission(name: str) -> Optional[AdaptiveLimiter]:
+    """
+    每个连接池一个准入控制，并发上限从 pool_size 起步，最多到连接池容量
+    """
+    if not settings.ADMISSION_ENABLED:
+        return None
+    return AdaptiveLimiter(name, initial_limit=POOL_SIZE, max_limit=POOL_SIZE + MAX_OVERFLOW,
+                           latency_target=settings.DB_LATENCY_TARGET_MS / 1000,
+                           max_wait=settings.ADMISSION_MAX_WAIT_MS / 1000, max_queue=settings.ADMISSION_MAX_QUEUE)
+
+# 同步、异步两个服务共用一份慢查询统计
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_MS, explain=settings.SLOW_QUERY_EXPLAIN)
+
+# 签出时只 ping 空闲较久的连接，为 0 时退回每次签出都 ping
+PING_IDLE_SECONDS = settings.DB_PING_IDLE_SECONDS or None
+
+# 同步、异步两个服务共用 Redis 中的查询缓存（同一键前缀），任一方的写操作都会使另一方的缓存失效；
+# Redis 不可用时共用同一个进程内回退缓存，其他进程的写操作通过失效广播清理它
+sync_redis = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+    settings.REDIS_URL, max_connections=settings.redis_pool_sizes()[1], timeout=settings.REDIS_POOL_TIMEOUT_MS / 1000,
+    socket_timeout=5, socket_connect_timeout=5, health_check_interval=30))
+fallback_cache = MemoryCache()
+
+my_sql_server = MySQLServer(settings.MYSQL_URL, cache=RedisQueryCache(sync_redis, fallback=fallback_cache), pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                            slow_query=slow_query_log, ping_idle_seconds=PING_IDLE_SECONDS)
+# 同步数据库调用放到与连接池等大的专用线程池中执行，避免阻塞事件循环
+threaded_sql_server = ThreadedMySQLServer(my_sql_server, admission=_admission("mysql"))
+async_mysql_server = AsyncMySQLServer(settings.ASYNC_MYSQL_URL, cache=AsyncQueryCache(async_redis_server, fallback=fallback_cache),
+                                      single_flight=True, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                      slow_query=slow_query_log, admission=_admission("async_mysql"),
+                                      ping_idle_seconds=PING_IDLE_SECONDS)
+cache_invalidation = InvalidationSubscriber(
+    settings.REDIS_URL, [fallback_cache, my_sql_server.count_cache, async_mysql_server.count_cache])
+pool_keepalive = PoolKeepalive(engine_registry.engines, interval=settings.DB_KEEPALIVE_SECONDS or 15)
+# 写后缓冲：/async_test4 的更新先按主键合并在缓冲中，定时/定量批量刷写（默认关闭）
+users_write_behind = async_mysql_server.write_behind(
+    "users",
+    store=RedisStore(async_redis_server, "write_behind:users") if settings.WRITE_BEHIND_STORE == "redis" else None,
+    flush_size=settings.WRITE_BEHIND_FLUSH_SIZE, flush_interval=settings.WRITE_BEHIND_FLUSH_MS / 1000,
+    max_pending=settings.WRITE_BEHIND_MAX_PENDING) if settings.WRITE_BEHIND_ENABLED else None
+
+metrics.gauge("mysql_executor_queued", "同步数据库线程池排队中的调用数",
+              callback=lambda: [((), threaded_sql_server.queued)])
+metrics.gauge("mysql_executor_active", "同步数据库线程池执行中的调用数",
+              callback=lambda: [((), threaded_sql_server.active)])
+_limiters = [limiter for limiter in (threaded_sql_server.admission, async_mysql_server.admission) if limiter]
+metrics.gauge("db_admission_limit", "数据库准入控制当前的并发上限", ("limiter",),
+              lambda: [((limiter.name,), limiter.limit) for limiter in _limiters])
+metrics.gauge("db_admission_in_flight", "已准入、执行中的数据库调用数", ("limiter",),
+              lambda: [((limiter.name,), limiter.in_flight) for limiter in _limiters])
+metrics.gauge("db_admission_queued", "排队等待准入的数据库调用数", ("limiter",),
+              lambda: [((limiter.name,), limiter.queued) for limiter in _limiters])
+metrics.gauge("write_behind_pending", "写后缓冲中等待刷写的行数", ("table",),
+              lambda: [((table,), buffer.pending) for table, buffer in async_mysql_server.write_behinds.items()])
 
 @app.get("/test1")
-async def get_users():
+async def get_users(format: str = "dict"):
     """
     获取所有用户信息
+    @param {str} format - 返回格式 dict / columnar / columnar_typed
     @returns {dict} 用户列表
     """
+    if format not in RESULT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的返回格式: {format}")
     try:
         # 调用 MySQLServer 的 query 方法获取用户信息
         # result = my_sql_server.query("SELECT * FROM users1")
-        result = my_sql_server.query("SELECT * FROM users WHERE id = :id", {"id": 98})
+        result = await threaded_sql_server.query("SELECT * FROM users WHERE id = :id", {"id": 98}, cache_ttl=CACHE_TTL,
+                                                 result_format=format)
         
-        return {
-            "code": 200,
-            "message": "success",
-            "data": result
-        }
+        return success(result)
         
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败")
 
@@ -32,12 +204,10 @@ async def get_row():
     获取单条记录
     """
     try:
-        result = my_sql_server.get_row("SELECT * FROM users WHERE id = :id", {"id": 98})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": result
-        }
+        result = await threaded_sql_server.get_row("SELECT * FROM users WHERE id = :id", {"id": 98}, cache_ttl=CACHE_TTL)
+        return success(result)
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败")
 
@@ -47,12 +217,10 @@ async def get_var():
     获取单个值
     """
     try:
-        result = my_sql_server.get_var("SELECT name FROM users WHERE id = :id", {"id": 98})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {"name": result}
-        }
+        result = await threaded_sql_server.get_var("SELECT name FROM users WHERE id = :id", {"id": 98}, cache_ttl=CACHE_TTL)
+        return success({"name": result})
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败")
 
@@ -62,12 +230,10 @@ async def execute():
     执行SQL语句
     """
     try:
-        result = my_sql_server.execute("UPDATE users SET name = :name WHERE id = :id", {"id": 98, "name": "test"})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {"count": result}
-        }
+        result = await threaded_sql_server.execute("UPDATE users SET name = :name WHERE id = :id", {"id": 98, "name": "test"})
+        return success({"count": result})
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行失败")
 @app.get("/test5")
@@ -82,14 +248,12 @@ async def executemany():
         #                                      {"id": 97, "name": "test22"}])
 
         # 批量插入
-        result = my_sql_server.executemany("INSERT INTO users (name, age) VALUES (:name, :age)", 
-                                            [{"name": "test1111", "age": 18}, 
-                                             {"name": "test2222", "age": 17}])
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {"count": result}
-        }
+        result = await threaded_sql_server.executemany("INSERT INTO users (name, age) VALUES (:name, :age)", 
+                                                        [{"name": "test1111", "age": 18}, 
+                                                         {"name": "test2222", "age": 17}])
+        return success({"count": result})
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行失败")
 
@@ -99,50 +263,83 @@ async def insert_id():
     执行插入操作并返回插入的ID
     """
     try:
-        result = my_sql_server.insert_id("INSERT INTO users (name, age) VALUES (:name, :age)", 
-                                          {"name": "test3333", "age": 16})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {"id": result}
-        }
+        result = await threaded_sql_server.insert_id("INSERT INTO users (name, age) VALUES (:name, :age)", 
+                                                      {"name": "test3333", "age": 16})
+        return success({"id": result})
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行失败")
     
 @app.get("/test7/{page}")
-async def page_and_size(page: int = 1):
+async def page_and_size(page: int = 1, format: str = "dict", total: Optional[str] = None):
     """
     生成分页SQL片段及相关信息
+    @param {str} format - 返回格式 dict / columnar / columnar_typed
+    @param {str} total - 同时返回总数及总页数：exact 精确统计（缓存 CACHE_TTL 秒，写 users 表时失效）/ estimate 估算 / none；
+                         不传时只返回当前页数据
     """
+    if format not in RESULT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的返回格式: {format}")
+    if total is not None and total not in COUNT_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"不支持的总数统计方式: {total}")
     try:
-        result = my_sql_server.page_and_size(page=page, page_size=5)
-        result = my_sql_server.query("SELECT * FROM users LIMIT :limit OFFSET :offset", {"limit": result["limit"], "offset": result["offset"]})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": result
-        }
+        if total is not None:
+            result = await threaded_sql_server.paginate("users", page=page, page_size=5, count=total, count_ttl=CACHE_TTL,
+                                                        result_format=format)
+            return success(result)
+        result = await threaded_sql_server.page_and_size(page=page, page_size=5)
+        result = await threaded_sql_server.query("SELECT * FROM users LIMIT :limit OFFSET :offset", {"limit": result["limit"], "offset": result["offset"]},
+                                                 result_format=format)
+        return success(result)
+    except Overloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"执行失败")
+
+@app.get("/test8")
+async def seek_page(cursor: Optional[str] = None):
+    """
+    游标分页（按主键定位），深分页延迟不随页码增长
+    """
+    try:
+        result = await threaded_sql_server.seek_page("users", cursor=cursor, page_size=5)
+        return success(result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行失败")
 
+@app.get("/test9")
+async def stream_users(format: str = "ndjson"):
+    """
+    流式返回全部用户（服务端游标 + 分块输出），format 可选 ndjson / json
+    """
+    chunks = await prefetch(threaded_sql_server.stream_query("SELECT * FROM users", chunk_size=1000))
+    return json_array_response(chunks) if format == "json" else ndjson_response(chunks)
+
 
 @app.get("/async_test1")
-async def get_users():
+async def get_users(format: str = "dict"):
     """
     获取所有用户信息
+    @param {str} format - 返回格式 dict / columnar / columnar_typed
     @returns {dict} 用户列表
     """
+    if format not in RESULT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的返回格式: {format}")
     try:
         # 调用 MySQLServer 的 query 方法获取用户信息
         # result = my_sql_server.query("SELECT * FROM users1")
-        result =  await async_mysql_server.query("SELECT * FROM users WHERE id = :id", {"id": 98})
+        result =  await async_mysql_server.query("SELECT * FROM users WHERE id = :id", {"id": 98}, cache_ttl=CACHE_TTL,
+                                                 result_format=format)
         
-        return {
-            "code": 200,
-            "message": "success",
-            "data": result
-        }
+        return success(result)
         
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败")
 
@@ -152,12 +349,10 @@ async def get_row():
     获取单条记录
     """
     try:
-        result = await async_mysql_server.get_row("SELECT * FROM users WHERE id = :id", {"id": 98})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": result
-        }
+        result = await async_mysql_server.get_row("SELECT * FROM users WHERE id = :id", {"id": 98}, cache_ttl=CACHE_TTL)
+        return success(result)
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败")
 
@@ -167,12 +362,10 @@ async def get_var():
     获取单个值
     """
     try:
-        result = await async_mysql_server.get_var("SELECT name FROM users WHERE id = :id", {"id": 98})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {"name": result}
-        }
+        result = await async_mysql_server.get_var("SELECT name FROM users WHERE id = :id", {"id": 98}, cache_ttl=CACHE_TTL)
+        return success({"name": result})
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败")
 
@@ -182,12 +375,14 @@ async def execute():
     执行SQL语句
     """
     try:
+        if users_write_behind is not None:
+            # 写后缓冲：更新合并后批量刷写，count 为已接受的更新数
+            await users_write_behind.update(98, {"name": "test"})
+            return success({"count": 1, "buffered": True})
         result = await async_mysql_server.execute("UPDATE users SET name = :name WHERE id = :id", {"id": 98, "name": "test"})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {"count": result}
-        }
+        return success({"count": result})
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行失败")
 @app.get("/async_test5")
@@ -205,11 +400,9 @@ async def executemany():
         result = await async_mysql_server.executemany("INSERT INTO users (name, age) VALUES (:name, :age)", 
                                             [{"name": "test1111", "age": 18}, 
                                              {"name": "test2222", "age": 17}])
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {"count": result}
-        }
+        return success({"count": result})
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行失败")
 
@@ -221,30 +414,89 @@ async def insert_id():
     try:
         result = await async_mysql_server.insert_id("INSERT INTO users (name, age) VALUES (:name, :age)", 
                                           {"name": "test3333", "age": 16})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": {"id": result}
-        }
+        return success({"id": result})
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行失败")
     
 @app.get("/async_test7/{page}")
-async def page_and_size(page: int = 1):
+async def page_and_size(page: int = 1, format: str = "dict", total: Optional[str] = None):
     """
     生成分页SQL片段及相关信息
+    @param {str} format - 返回格式 dict / columnar / columnar_typed
+    @param {str} total - 同时返回总数及总页数：exact 精确统计（缓存 CACHE_TTL 秒，写 users 表时失效）/ estimate 估算 / none；
+                         不传时只返回当前页数据
     """
+    if format not in RESULT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的返回格式: {format}")
+    if total is not None and total not in COUNT_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"不支持的总数统计方式: {total}")
     try:
+        if total is not None:
+            result = await async_mysql_server.paginate("users", page=page, page_size=5, count=total, count_ttl=CACHE_TTL,
+                                                       result_format=format)
+            return success(result)
         result = await async_mysql_server.page_and_size(page=page, page_size=5)
-        result = await async_mysql_server.query("SELECT * FROM users LIMIT :limit OFFSET :offset", {"limit": result["limit"], "offset": result["offset"]})
-        return {
-            "code": 200,
-            "message": "success",
-            "data": result
-        }
+        result = await async_mysql_server.query("SELECT * FROM users LIMIT :limit OFFSET :offset", {"limit": result["limit"], "offset": result["offset"]},
+                                                result_format=format)
+        return success(result)
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行失败")
-    
+
+
+@app.get("/async_test8")
+async def seek_page(cursor: Optional[str] = None):
+    """
+    游标分页（按主键定位），深分页延迟不随页码增长
+    """
+    try:
+        result = await async_mysql_server.seek_page("users", cursor=cursor, page_size=5)
+        return success(result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"执行失败")
+
+@app.get("/async_test9")
+async def stream_users(format: str = "ndjson"):
+    """
+    流式返回全部用户（服务端游标 + 分块输出），format 可选 ndjson / json
+    """
+    chunks = await prefetch(async_mysql_server.stream_query("SELECT * FROM users", chunk_size=1000))
+    return json_array_response(chunks) if format == "json" else ndjson_response(chunks)
+
+# /users 一次最多查询的用户数
+MAX_USER_IDS = 1000
+
+@app.get("/users")
+async def get_users_by_ids(ids: str):
+    """
+    按id批量获取用户，如 /users?ids=1,2,3
+    通过 DataLoader 加载：本请求的多个id及同时到达的其他请求的id合并为一条 WHERE id IN 查询
+    @param {str} ids - 逗号分隔的用户id
+    @returns {dict} {"rows": 按传入顺序排列的用户（重复id只返回一次）, "missing": 不存在的id}
+    """
+    try:
+        user_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids 必须是逗号分隔的整数")
+    if not user_ids or len(user_ids) > MAX_USER_IDS:
+        raise HTTPException(status_code=400, detail=f"ids 个数必须在 1 到 {MAX_USER_IDS} 之间")
+    try:
+        rows = await async_mysql_server.loader("users").load_many(user_ids)
+        return success({
+            "rows": [row for row in rows if row is not None],
+            "missing": [user_id for user_id, row in zip(user_ids, rows) if row is None]
+        })
+    except Overloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询失败")
 
 
 @app.get("/redis_test")
@@ -254,15 +506,14 @@ async def test_redis_connection():
     @returns {dict} Redis操作结果
     """
     try:
-        from async_redis import async_redis_server
-        
-        # 使用异步上下文管理器获取Redis连接
-        async with async_redis_server.get_redis() as redis:
+        # 使用管道在一次往返中完成设置和读取
+        async with async_redis_server.pipeline(transaction=False) as pipe:
             # 设置测试键值对
-            await redis.set('test_key', 'hello_world', ex=30)
+            pipe.set('test_key', 'hello_world', ex=30)
             
             # 获取测试值
-            result = await redis.get('test_key')
+            pipe.get('test_key')
+            _, result = await pipe.execute()
             
             return {
                 "code": 200,
@@ -277,7 +528,171 @@ async def test_redis_connection():
         raise HTTPException(status_code=500, detail=f"Redis操作失败: {str(e)}")
 
 
+@app.get("/cache_stats", dependencies=[Depends(require_debug_token)])
+async def cache_stats():
+    """
+    查询结果缓存及语句缓存命中统计
+    @returns {dict} 同步/异步结果缓存、语句缓存的命中、未命中、失效次数
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "sync": my_sql_server.cache.stats(),
+            "async": async_mysql_server.cache.stats(),
+            "invalidation": cache_invalidation.stats(),
+            "statement": statement_cache.stats(),
+            "single_flight": async_mysql_server.single_flight.stats()
+        }
+    }
+
+@app.get("/executor_stats", dependencies=[Depends(require_debug_token)])
+async def executor_stats():
+    """
+    同步数据库线程池统计
+    @returns {dict} 排队深度、等待时间等指标
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": threaded_sql_server.stats()
+    }
+
+
+@app.get("/loader_stats", dependencies=[Depends(require_debug_token)])
+async def loader_stats():
+    """
+    DataLoader 批量加载统计
+    @returns {dict} 各 loader 的调用次数、批次数、平均每批键数及请求内备忘命中次数
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "sync": {name: loader.stats() for name, loader in threaded_sql_server.loaders.items()},
+            "async": {name: loader.stats() for name, loader in async_mysql_server.loaders.items()}
+        }
+    }
+
+
+@app.get("/write_behind_stats", dependencies=[Depends(require_debug_token)])
+async def write_behind_stats():
+    """
+    写后缓冲统计
+    @returns {dict} 各表缓冲行数、合并次数、刷写次数/行数及上次刷写耗时，未开启时为空
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": {table: buffer.stats() for table, buffer in async_mysql_server.write_behinds.items()}
+    }
+
+
+@app.get("/admission_stats", dependencies=[Depends(require_debug_token)])
+async def admission_stats():
+    """
+    数据库准入控制统计
+    @returns {dict} 同步/异步连接池的并发上限、执行中、排队数及拒绝次数，未开启时为null
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "sync": threaded_sql_server.admission.stats() if threaded_sql_server.admission else None,
+            "async": async_mysql_server.admission.stats() if async_mysql_server.admission else None
+        }
+    }
+
+@app.get("/replica_stats", dependencies=[Depends(require_debug_token)])
+async def replica_stats():
+    """
+    只读副本路由统计
+    @returns {dict} 各副本的在途请求数、复制延迟、摘除状态，未配置副本时为null
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "sync": my_sql_server.router.stats() if my_sql_server.router else None,
+            "async": async_mysql_server.router.stats() if async_mysql_server.router else None
+        }
+    }
+
+@app.get("/engine_stats", dependencies=[Depends(require_debug_token)])
+async def engine_stats():
+    """
+    共享引擎及连接池统计
+    @returns {dict} 引擎创建/复用次数、各连接池状态、启动预热结果及后台保活统计
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": {
+            **engine_registry.stats(),
+            "warmup": getattr(app.state, "pool_warmup", None),
+            "keepalive": pool_keepalive.stats()
+        }
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_debug_token)])
+async def metrics_endpoint():
+    """
+    Prometheus 文本格式的指标：SQL指纹耗时/行数、连接池、Redis往返、接口耗时
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/slow_queries", dependencies=[Depends(require_debug_token)])
+async def slow_queries(limit: int = 20, sort: str = "total"):
+    """
+    慢查询报表：按指纹聚合的次数、总耗时、p95、行数及首个慢样本的执行计划
+    @param {int} limit - 返回前多少个指纹
+    @param {str} sort - 排序字段 total / p95 / max / count / rows
+    """
+    try:
+        report = slow_query_log.report(limit=limit, sort=sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "code": 200,
+        "message": "success",
+        "data": report
+    }
+
+# 分析结果接口只在启用采样分析时注册
+if settings.PROFILER_ENABLED:
+    @app.get("/debug/profiles", dependencies=[Depends(require_profile_token)])
+    async def profiles():
+        """
+        最近被分析的请求列表（编号、名称、耗时、样本数），编号也在被分析请求的响应头 X-Profile-Id 中返回
+        """
+        return {
+            "code": 200,
+            "message": "success",
+            "data": {
+                "active": profiler.active,
+                "profiles": [profile.summary() for profile in reversed(profiler.recent)]
+            }
+        }
+
+    @app.get("/debug/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+    async def profile_output(profile_id: str, format: str = "speedscope"):
+        """
+        下载分析结果，speedscope 格式可直接拖入 https://www.speedscope.app，collapsed 格式可交给 flamegraph.pl / inferno
+        @param {str} profile_id - 分析编号，all 为所有被分析请求的汇总
+        @param {str} format - speedscope / collapsed
+        """
+        if format not in ("speedscope", "collapsed"):
+            raise HTTPException(status_code=400, detail=f"不支持的格式: {format}")
+        if profile_id == "all":
+            target = profiler
+        else:
+            target = profiler.get(profile_id)
+            if target is None:
+                raise HTTPException(status_code=404, detail=f"分析结果不存在: {profile_id}")
+        if format == "collapsed":
+            return PlainTextResponse(target.collapsed())
+        return target.speedscope()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=10011)
+    uvicorn.run(app, host=settings.HOST, port=settings.PORT)
@@ -0,0 +1,224 @@
+import base64
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 只允许普通标识符，防止表名/列名拼接进SQL时被注入
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_$]*$")
+
+
+def check_identifier(name: str) -> str:
+    """
+    校验表名/列名是否为合法标识符
+    @param {str} name - 表名或列名
+    @returns {str} 原样返回
+    """
+    if not _IDENT_RE.match(name or ""):
+        raise ValueError(f"非法的标识符: {name}")
+    return name
+
+
+def encode_cursor(key_values: Sequence[Any], direction: str = "next") -> str:
+    """
+    把排序键的值编码为不透明的游标
+    @param {Sequence[Any]} key_values - 排序键的值（与 key 列顺序一致）
+    @param {str} direction - 翻页方向 next/prev
+    @returns {str} URL安全的游标字符串
+    """
+    payload = json.dumps({"k": list(key_values), "d": direction}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[List[Any], str]:
+    """
+    解码游标
+    @param {str} cursor - encode_cursor 生成的游标
+    @returns {Tuple[List[Any], str]} (排序键的值, 翻页方向)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        direction = payload.get("d", "next")
+        if direction not in ("next", "prev") or not isinstance(payload["k"], list):
+            raise ValueError
+        return payload["k"], direction
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+def build_seek_query(table: str, key: Sequence[str], columns: str = "*", where: Optional[str] = None,
+                     cursor: Optional[str] = None, page_size: int = 10) -> Tuple[str, Dict[str, Any], str]:
+    """
+    生成按索引键定位（seek）的分页SQL，深分页时扫描行数与页码无关
+    @param {str} table - 表名
+    @param {Sequence[str]} key - 排序键列（通常是主键，可为复合键）
+    @param {str} columns - 查询列，必须包含排序键列
+    @param {str} where - 额外的WHERE条件（使用命名参数）
+    @param {str} cursor - 上一次返回的游标，None表示第一页
+    @param {int} page_size - 每页条数
+    @returns {Tuple[str, Dict, str]} (SQL语句, 游标相关参数, 翻页方向)
+    """
+    if page_size < 1:
+        raise ValueError("每页条数必须大于0")
+    check_identifier(table)
+    key = [check_identifier(k) for k in key]
+    if not key:
+        raise ValueError("排序键不能为空")
+
+    params: Dict[str, Any] = {"_seek_limit": page_size + 1}
+    direction = "next"
+    conditions = [f"({where})"] if where else []
+    if cursor:
+        key_values, direction = decode_cursor(cursor)
+        if len(key_values) != len(key):
+            raise ValueError("分页游标与排序键不匹配")
+        op = ">" if direction == "next" else "<"
+        names = [f"_seek_{i}" for i in range(len(key))]
+        params.update(dict(zip(names, key_values)))
+        if len(key) == 1:
+            conditions.append(f"{key[0]} {op} :{names[0]}")
+        else:
+            conditions.append(f"({', '.join(key)}) {op} ({', '.join(':' + n for n in names)})")
+
+    order = "ASC" if direction == "next" else "DESC"
+    sql_query = f"SELECT {columns} FROM {table}"
+    if conditions:
+        sql_query += " WHERE " + " AND ".join(conditions)
+    sql_query += " ORDER BY " + ", ".join(f"{k} {order}" for k in key) + " LIMIT :_seek_limit"
+    return sql_query, params, direction
+
+
+def build_seek_page(rows: List[Dict], key: Sequence[str], page_size: int, direction: str,
+                    has_cursor: bool) -> Dict[str, Any]:
+    """
+    根据多取一行的查询结果生成分页返回值及前后游标
+    @param {List[Dict]} rows - 查询结果（最多 page_size + 1 行）
+    @param {Sequence[str]} key - 排序键列
+    @param {int} page_size - 每页条数
+    @param {str} direction - 翻页方向
+    @param {bool} has_cursor - 本次是否带了游标（第一页没有上一页）
+    @returns {Dict[str, Any]} {"data", "next_cursor", "prev_cursor", "has_more", "page_size"}
+    """
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "prev":
+        rows.reverse()
+    if rows and any(k not in rows[0] for k in key):
+        raise ValueError("查询列必须包含排序键列")
+
+    def cursor_of(row: Dict, to: str) -> str:
+        return encode_cursor([row[k] for k in key], to)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if direction == "next":
+            next_cursor = cursor_of(rows[-1], "next") if has_more else None
+            prev_cursor = cursor_of(rows[0], "prev") if has_cursor else None
+        else:
+            prev_cursor = cursor_of(rows[0], "prev") if has_more else None
+            next_cursor = cursor_of(rows[-1], "next")
+    return {
+        "data": rows,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "has_more": has_more,
+        "page_size": page_size,
+    }
+
+
+# 分页总数统计方式: exact 精确 COUNT(*)（按TTL缓存，写表时失效）/ estimate 按统计信息估算 / none 不统计
+COUNT_STRATEGIES = ("exact", "estimate", "none")
+
+
+def check_count_strategy(strategy: str) -> str:
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError(f"不支持的总数统计方式: {strategy}，可选 {', '.join(COUNT_STRATEGIES)}")
+    return strategy
+
+
+def build_page_query(table: str, columns: str = "*", where: Optional[str] = None,
+                     order_by: Optional[str] = None) -> str:
+    """
+    生成 LIMIT/OFFSET 分页SQL，参数 :_page_limit / :_page_offset
+    @param {str} table - 表名
+    @param {str} columns - 查询列
+    @param {str} where - WHERE条件（使用命名参数）
+    @param {str} order_by - 排序列，前缀 - 表示倒序
+    @returns {str} SQL语句
+    """
+    check_identifier(table)
+    sql_query = f"SELECT {columns} FROM {table}"
+    if where:
+        sql_query += f" WHERE {where}"
+    if order_by:
+        column = check_identifier(order_by.lstrip("-"))
+        sql_query += f" ORDER BY {column} {'DESC' if order_by.startswith('-') else 'ASC'}"
+    return sql_query + " LIMIT :_page_limit OFFSET :_page_offset"
+
+
+def build_count_query(table: str, where: Optional[str] = None) -> str:
+    check_identifier(table)
+    return f"SELECT COUNT(*) FROM {table}" + (f" WHERE {where}" if where else "")
+
+
+def build_estimate_query(dialect, table: str, where: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """
+    生成按统计信息估算行数的SQL，不扫描数据
+    - MySQL 无条件: information_schema.TABLES.TABLE_ROWS；有条件: EXPLAIN 的 rows * filtered
+    - PostgreSQL 无条件: pg_class.reltuples
+    - SQLite 无条件: sqlite_stat1（需执行过 ANALYZE）
+    @param dialect - SQLAlchemy方言
+    @param {str} table - 表名
+    @param {str} where - WHERE条件
+    @returns {Tuple[str, str] | None} (SQL语句, 结果类型 value/explain)，不支持时返回None（调用方改用精确统计）
+    """
+    check_identifier(table)
+    if dialect.name == "mysql":
+        if where:
+            return f"EXPLAIN SELECT * FROM {table} WHERE {where}", "explain"
+        return ("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :_count_table"), "value"
+    if where:
+        return None
+    if dialect.name == "postgresql":
+        return "SELECT reltuples FROM pg_class WHERE relname = :_count_table", "value"
+    if dialect.name == "sqlite":
+        return "SELECT stat FROM sqlite_stat1 WHERE tbl = :_count_table LIMIT 1", "value"
+    return None
+
+
+def estimate_from_rows(kind: str, rows: List[Dict]) -> Optional[int]:
+    """
+    从估算SQL的结果中取出行数
+    @param {str} kind - build_estimate_query 返回的结果类型
+    @param {List[Dict]} rows - 查询结果
+    @returns {int | None} 估算行数，无法估算时返回None
+    """
+    if not rows:
+        return None
+    row = rows[0]
+    if kind == "explain":
+        estimate = float(row.get("rows") or 0) * float(row.get("filtered") or 100) / 100
+        return int(round(estimate))
+    value = next(iter(row.values()))
+    if value is None:
+        return None
+    if isinstance(value, str):
+        # sqlite_stat1.stat 形如 "10000 1"，第一个数为表行数
+        value = value.split()[0]
+    return max(0, int(float(value)))
+
+
+def build_page(rows: Any, page: int, page_size: int, total: Optional[int], exact: bool) -> Dict[str, Any]:
+    """
+    生成带总数的分页返回值
+    @returns {Dict[str, Any]} {"data", "page", "page_size", "total", "total_pages", "total_exact"}，不统计时总数为None
+    """
+    return {
+        "data": rows,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "total_pages": -(-total // page_size) if total is not None else None,
+        "total_exact": exact,
+    }
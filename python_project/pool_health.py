@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Sequence, Union
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from instrumentation import DB_POOL_PREPING_FAILURES, pool_label
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_PINGS = metrics.counter(
+    "db_pool_pings_total", "连接存活检测次数（checkout: 请求签出时 / keepalive: 后台保活）", ("pool", "source"))
+DB_POOL_REAPED = metrics.counter(
+    "db_pool_reaped_total", "后台保活检测到失效并重建的连接数", ("pool",))
+DB_STALE_RETRIES = metrics.counter(
+    "db_stale_connection_retries_total", "语句遇到失效连接后在新连接上重试的次数", ("pool",))
+
+# 连接记录 info 中的键：最近一次归还时间
+CHECKED_IN_AT = "checked_in_at"
+# 后台保活签出时的状态 {"idle_seconds": 阈值, "pinged": 次数, "reaped": 次数}，签出监听按该阈值 ping 并记录结果
+_keepalive_state: ContextVar[Optional[Dict[str, float]]] = ContextVar("keepalive_state", default=None)
+
+
+def _ping(dialect, dbapi_connection) -> None:
+    """
+    ping 一个DBAPI连接，连接已断开时抛出 DisconnectionError，其他错误原样抛出
+    """
+    try:
+        alive = dialect.do_ping(dbapi_connection)
+    except Exception as e:
+        if not dialect.is_disconnect(e, dbapi_connection, None):
+            raise
+        alive = False
+    if not alive:
+        raise exc.DisconnectionError("连接存活检测失败")
+
+
+def install_idle_ping(engine, idle_seconds: float) -> None:
+    """
+    替代 pool_pre_ping：签出连接时只对空闲超过 idle_seconds 秒的连接执行 ping，刚归还的连接直接使用
+    ping 失败时抛出 DisconnectionError，连接池会丢弃该连接并在同一个位置重建（新建连接不需要 ping）
+    @param engine - 同步或异步引擎（异步引擎挂在其 sync_engine 上）
+    @param {float} idle_seconds - 空闲阈值秒数
+    """
+    engine = getattr(engine, "sync_engine", engine)
+    dialect = engine.dialect
+    label = pool_label(engine)
+
+    @event.listens_for(engine.pool, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        connection_record.info[CHECKED_IN_AT] = time.monotonic()
+
+    @event.listens_for(engine.pool, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get(CHECKED_IN_AT)
+        # 新建的连接没有归还记录
+        idle = time.monotonic() - checked_in_at if checked_in_at is not None else 0.0
+        keepalive = _keepalive_state.get()
+        if idle < (idle_seconds if keepalive is None else min(idle_seconds, keepalive["idle_seconds"])):
+            return
+        DB_POOL_PINGS.inc((label, "checkout" if keepalive is None else "keepalive"))
+        if keepalive is not None:
+            keepalive["pinged"] += 1
+        try:
+            _ping(dialect, dbapi_connection)
+        except exc.DisconnectionError:
+            if keepalive is None:
+                DB_POOL_PREPING_FAILURES.inc((label,))
+            else:
+                keepalive["reaped"] += 1
+                DB_POOL_REAPED.inc((label,))
+            raise
+
+
+def is_stale_connection_error(error: BaseException) -> bool:
+    """
+    是否为连接失效（MySQL重启、wait_timeout 断开、代理回收等）导致的语句失败
+    """
+    return isinstance(error, exc.DBAPIError) and error.connection_invalidated
+
+
+class PoolKeepalive:
+    """
+    后台保活：定期签出连接池中空闲较久的连接做 ping（由 install_idle_ping 的签出监听按保活阈值执行），
+    失效的连接由连接池当场重建，使请求路径上签出的连接基本都是刚验证过的，不需要再 ping；
+    pool_recycle 到期的连接也在这里提前回收
+    连接池按先进先出签出空闲连接，遇到空闲时间不足阈值（签出时没有 ping）的连接即停止本轮
+    """
+
+    def __init__(self, engines: Union[Sequence[Any], Callable[[], Sequence[Any]]], interval: float = 15.0,
+                 idle_seconds: Optional[float] = None):
+        """
+        @param {Sequence|Callable} engines - 要保活的引擎，或每轮返回引擎列表的函数（如 engine_registry.engines，
+                                             包含之后按需创建的副本引擎）；同步引擎在线程中执行，不阻塞事件循环
+        @param {float} interval - 每轮间隔秒数
+        @param {float} idle_seconds - 空闲超过该秒数的连接才做 ping，默认等于 interval
+        """
+        self.engines = engines
+        self.interval = interval
+        self.idle_seconds = interval if idle_seconds is None else idle_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._closed = False
+        self.sweeps = 0
+        self.pinged = 0
+        self.reaped = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        """
+        启动后台保活任务（须在事件循环中调用）
+        """
+        if self._task is None or self._task.done():
+            self._closed = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._closed:
+                break
+            await self.sweep()
+
+    async def sweep(self) -> Dict[str, int]:
+        """
+        对所有引擎执行一轮保活
+        @returns {Dict[str, int]} 本轮 ping 及重建的连接数
+        """
+        pinged = reaped = 0
+        engines = self.engines() if callable(self.engines) else self.engines
+        for engine in dict.fromkeys(engines):
+            try:
+                if isinstance(engine, AsyncEngine):
+                    counts = await self._sweep_async(engine)
+                else:
+                    counts = await asyncio.to_thread(self._sweep_sync, engine)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"连接池保活失败: {engine.url.render_as_string(hide_password=True)} | {e}")
+                continue
+            pinged += counts[0]
+            reaped += counts[1]
+        self.sweeps += 1
+        self.pinged += pinged
+        self.reaped += reaped
+        return {"pinged": pinged, "reaped": reaped}
+
+    @staticmethod
+    def _idle_connections(engine) -> int:
+        checkedin = getattr(engine.pool, "checkedin", None)
+        return checkedin() if callable(checkedin) else 0
+
+    def _sweep_sync(self, engine) -> tuple:
+        state = {"idle_seconds": self.idle_seconds, "pinged": 0, "reaped": 0}
+        token = _keepalive_state.set(state)
+        try:
+            for _ in range(self._idle_connections(engine)):
+                pinged = state["pinged"]
+                with engine.connect():
+                    pass
+                if state["pinged"] == pinged:
+                    break
+        finally:
+            _keepalive_state.reset(token)
+        return state["pinged"], state["reaped"]
+
+    async def _sweep_async(self, engine: AsyncEngine) -> tuple:
+        state = {"idle_seconds": self.idle_seconds, "pinged": 0, "reaped": 0}
+        token = _keepalive_state.set(state)
+        try:
+            for _ in range(self._idle_connections(engine.sync_engine)):
+                pinged = state["pinged"]
+                async with engine.connect():
+                    pass
+                if state["pinged"] == pinged:
+                    break
+        finally:
+            _keepalive_state.reset(token)
+        return state["pinged"], state["reaped"]
+
+    async def close(self) -> None:
+        """
+        停止后台保活任务
+        """
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            try:
+                await self._task
+            except Exception:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        保活统计
+        @returns {Dict[str, Any]} 轮数、ping 及重建的连接数、失败次数
+        """
+        return {
+            "interval": self.interval,
+            "idle_seconds": self.idle_seconds,
+            "sweeps": self.sweeps,
+            "pinged": self.pinged,
+            "reaped": self.reaped,
+            "errors": self.errors,
+        }
@@ -0,0 +1,421 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from itertools import count
+from logging.handlers import TimedRotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+# 日志配置
+log_handler = TimedRotatingFileHandler(
+    'profiler_log.log', when='midnight', interval=1, backupCount=7, encoding='utf-8'
+)
+log_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', '%Y-%m-%d %H:%M:%S'))
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+logger.addHandler(log_handler)
+
+PROFILED_REQUESTS = metrics.counter("profiler_requests_total", "被采样分析的请求数（按触发方式）", ("trigger",))
+PROFILER_SKIPPED = metrics.counter("profiler_skipped_total", "因同时分析的请求数已达上限而跳过的请求数")
+PROFILER_SAMPLES = metrics.counter("profiler_samples_total", "采集到的栈样本数")
+
+# 当前请求的分析记录，由 ProfilerMiddleware 设置；未被采样的请求为 None，span 直接返回
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+# 栈底的调度框架（事件循环回调、线程池工作线程），之下的帧对分析没有意义，直接截掉
+_RUNNER_FILES = (os.path.join("asyncio", "events.py"), os.path.join("concurrent", "futures", "thread.py"))
+# 火焰图中 span 及等待状态的帧名
+WAITING = "[waiting]"
+_SLUG_RE = re.compile(r"[^\w.-]+")
+
+
+class span:
+    """
+    标记一段DB/Redis调用：被分析的请求执行到这里时，采集的样本会挂在 [名称] 帧下；请求未被分析时只有一次 ContextVar 读取
+    同步、异步代码均可使用（with span("db.session"): ...），跨 await 有效
+    """
+    __slots__ = ("name", "_owners", "_key", "_prev", "_in_thread")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._owners = None
+
+    def __enter__(self) -> "span":
+        profile = _current_profile.get()
+        if profile is None:
+            return self
+        try:
+            # 事件循环中按任务记录，线程池中按线程记录
+            key = asyncio.current_task()
+            owners = profile.tasks
+            self._in_thread = False
+        except RuntimeError:
+            key = threading.get_ident()
+            owners = profile.threads
+            self._in_thread = True
+        if key is None:
+            return self
+        self._owners, self._key = owners, key
+        self._prev = owners.get(key, ())
+        owners[key] = self._prev + (f"[{self.name}]",)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        owners = self._owners
+        if owners is None:
+            return
+        self._owners = None
+        if self._prev or not self._in_thread:
+            owners[self._key] = self._prev
+        else:
+            # 线程回到线程池后不再属于该请求，停止采集
+            owners.pop(self._key, None)
+
+
+def call_in_span(name: str, fn: Callable[[], Any]) -> Any:
+    """
+    在 span 内调用函数，供线程池在复制的请求上下文中执行任务
+    @param {str} name - span名称
+    @param {Callable} fn - 无参函数
+    @returns {Any} 函数返回值
+    """
+    with span(name):
+        return fn()
+
+
+class Profile:
+    """
+    一个请求的分析记录：折叠栈 -> 样本数
+    """
+    _ids = count(1)
+
+    def __init__(self, name: str, trigger: str, interval: float):
+        self.id = f"{os.getpid()}-{next(self._ids)}"
+        self.name = name
+        self.trigger = trigger
+        self.interval = interval
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.task = asyncio.current_task()
+        # 属于该请求的任务/线程 -> 当前 span 栈
+        self.tasks: Dict[asyncio.Task, Tuple[str, ...]] = {self.task: ()}
+        self.threads: Dict[int, Tuple[str, ...]] = {}
+        self.samples: Counter = Counter()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status: Optional[int] = None
+        self.truncated = False
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.samples.values())
+
+    def collapsed(self) -> str:
+        """
+        折叠栈格式（每行 "帧;帧;帧 样本数"），可直接交给 flamegraph.pl / inferno / speedscope
+        """
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def speedscope(self) -> Dict[str, Any]:
+        """
+        speedscope 文件格式（https://www.speedscope.app/file-format-schema.json），每个样本按采样间隔计权
+        """
+        return speedscope_document(self.name, self.samples, self.interval)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "trigger": self.trigger,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "samples": self.sample_count,
+            "truncated": self.truncated,
+        }
+
+
+def speedscope_document(name: str, samples: Counter, interval: float) -> Dict[str, Any]:
+    """
+    把折叠栈计数转换成 speedscope 的 sampled 类型文档
+    @param {str} name - 分析名称
+    @param {Counter} samples - 折叠栈 -> 样本数
+    @param {float} interval - 采样间隔秒数
+    @returns {Dict} speedscope JSON 文档
+    """
+    frames: List[Dict[str, str]] = []
+    index: Dict[str, int] = {}
+    stacks, weights = [], []
+    for stack, n in samples.most_common():
+        ids = []
+        for frame in stack.split(";"):
+            i = index.get(frame)
+            if i is None:
+                i = index[frame] = len(frames)
+                frames.append({"name": frame})
+            ids.append(i)
+        stacks.append(ids)
+        weights.append(round(n * interval * 1000, 3))
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": round(sum(weights), 3),
+            "samples": stacks,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "python_project.profiler",
+    }
+
+
+class SamplingProfiler:
+    """
+    低开销的采样分析器：后台线程按固定间隔读取 sys._current_frames()，只记录被分析请求的栈
+    - 请求的任务正在事件循环上运行时，记录事件循环线程的栈
+    - 请求在线程池中执行（span 内）时，记录该工作线程的栈
+    - 两者都不在运行时记为 [waiting]，挂在最内层 span 下（如等待连接池、等待MySQL/Redis返回）
+    没有被分析的请求时采样线程退出，不占用任何CPU
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128, max_seconds: float = 30.0,
+                 keep: int = 20, max_stacks: int = 20000, output_dir: Optional[str] = None):
+        """
+        @param {float} interval - 采样间隔秒数
+        @param {int} max_depth - 每个样本最多记录的栈深度
+        @param {float} max_seconds - 单个请求最长采样秒数，超过后停止采集（长连接/流式响应）
+        @param {int} keep - 内存中保留最近多少个请求的分析结果
+        @param {int} max_stacks - 汇总结果最多保留的不同折叠栈个数
+        @param {str} output_dir - 每个分析结果写入的目录（.collapsed 与 .speedscope.json），None不写文件
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+        self.max_stacks = max_stacks
+        self.output_dir = output_dir
+        self.recent: deque = deque(maxlen=keep)
+        # 所有已完成分析的汇总（按请求名称作为根帧）
+        self.aggregate: Counter = Counter()
+        self._active: Dict[str, Profile] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[Any, str] = {}
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def start(self, name: str, trigger: str) -> Profile:
+        """
+        开始分析当前任务（须在事件循环中调用）
+        @param {str} name - 分析名称，如 "GET /test1"
+        @param {str} trigger - 触发方式 header / sample
+        @returns {Profile} 分析记录
+        """
+        profile = Profile(name, trigger, self.interval)
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def stop(self, profile: Profile) -> None:
+        """
+        结束分析，结果放入最近列表并汇总；配置了输出目录时在线程池中写文件
+        @param {Profile} profile - 分析记录
+        """
+        profile.duration = time.perf_counter() - profile.start
+        with self._lock:
+            self._active.pop(profile.id, None)
+            self.recent.append(profile)
+            for stack, n in profile.samples.items():
+                key = f"{profile.name};{stack}"
+                if key in self.aggregate or len(self.aggregate) < self.max_stacks:
+                    self.aggregate[key] += n
+        if self.output_dir:
+            profile.loop.run_in_executor(None, self.save, profile, self.output_dir)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        for profile in list(self.recent):
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.recent.clear()
+            self.aggregate.clear()
+
+    def collapsed(self) -> str:
+        with self._lock:
+            items = self.aggregate.most_common()
+        return "".join(f"{stack} {n}\n" for stack, n in items)
+
+    def speedscope(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = Counter(self.aggregate)
+        return speedscope_document("all profiled requests", samples, self.interval)
+
+    def save(self, profile: Profile, output_dir: str) -> Optional[str]:
+        """
+        写出一个分析结果
+        @param {Profile} profile - 分析记录
+        @param {str} output_dir - 输出目录
+        @returns {str} 文件路径前缀（不含扩展名），写入失败返回 None
+        """
+        slug = _SLUG_RE.sub("_", profile.name).strip("_")[:80]
+        prefix = os.path.join(output_dir, f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(profile.started_at))}"
+                                          f"-{profile.id}-{slug}")
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            with open(prefix + ".collapsed", "w", encoding="utf-8") as f:
+                f.write(profile.collapsed())
+            with open(prefix + ".speedscope.json", "w", encoding="utf-8") as f:
+                json.dump(profile.speedscope(), f, ensure_ascii=False)
+            return prefix
+        except Exception as e:
+            logger.warning(f"分析结果写入失败: {prefix} | {str(e)}")
+            return None
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                profiles = list(self._active.values())
+                if not profiles:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            for profile in profiles:
+                if now - profile.start > self.max_seconds:
+                    profile.truncated = True
+                    with self._lock:
+                        self._active.pop(profile.id, None)
+                    continue
+                try:
+                    self._sample(profile, frames)
+                except Exception as e:
+                    # 采样与请求线程并发读取栈帧，个别样本失败直接丢弃
+                    logger.debug(f"采样失败: {profile.name} | {str(e)}")
+            del frames
+            time.sleep(self.interval)
+
+    def _sample(self, profile: Profile, frames: Dict[int, Any]) -> None:
+        sampled = 0
+        for ident, spans in profile.threads.copy().items():
+            frame = frames.get(ident)
+            if frame is not None:
+                self._add(profile, spans, frame)
+                sampled += 1
+        tasks = profile.tasks.copy()
+        running = asyncio.current_task(profile.loop)
+        if running is not None and running in tasks:
+            self._add(profile, tasks[running], frames.get(profile.loop_thread))
+            sampled += 1
+        if not sampled:
+            # 请求既没有在事件循环上运行也不在线程池中：记为等待，挂在 span 最深的任务下
+            spans = max((s for task, s in tasks.items() if not task.done()), key=len, default=())
+            profile.samples[";".join(spans + (WAITING,))] += 1
+            sampled = 1
+        PROFILER_SAMPLES.inc(amount=sampled)
+
+    def _add(self, profile: Profile, spans: Tuple[str, ...], frame) -> None:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            if code.co_filename.endswith(_RUNNER_FILES):
+                break
+            names.append(self._label(code))
+            frame = frame.f_back
+        names.reverse()
+        profile.samples[";".join(spans + tuple(names))] += 1
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            if len(self._labels) > 50000:
+                self._labels.clear()
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+
+class ProfilerMiddleware:
+    """
+    纯ASGI中间件：按比例或按调试请求头（须携带口令）对请求做采样分析，响应头 X-Profile-Id 返回分析编号
+    同时分析的请求数有上限，超过上限的请求直接放行，可在单个生产工作进程上开启
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, sample_rate: float = 0.0,
+                 header: str = "x-debug-profile", token: Optional[str] = None, max_concurrent: int = 4):
+        """
+        @param profiler - 采样分析器
+        @param {float} sample_rate - 随机分析的请求比例 0~1
+        @param {str} header - 调试请求头，携带该请求头的请求一定会被分析（不受 sample_rate 限制）
+        @param {str} token - 调试请求头须等于该值才生效，None表示不接受请求头触发（只按 sample_rate 采样）
+        @param {int} max_concurrent - 同时分析的请求数上限
+        """
+        self.app = app
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self.token = token.encode("latin-1") if token else None
+        self.max_concurrent = max_concurrent
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.token is not None:
+            for name, value in scope.get("headers", ()):
+                if name == self.header:
+                    if hmac.compare_digest(value, self.token):
+                        return "header"
+                    break
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if self.profiler.active >= self.max_concurrent:
+            PROFILER_SKIPPED.inc()
+            await self.app(scope, receive, send)
+            return
+        PROFILED_REQUESTS.inc((trigger,))
+        profile = self.profiler.start(f"{scope['method']} {scope['path']}", trigger)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", ())) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            # 按路由模板命名，同一接口的分析结果在汇总中合并
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                profile.name = f"{scope['method']} {route}"
+            self.profiler.stop(profile)
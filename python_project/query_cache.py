@@ -0,0 +1,614 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from logging.handlers import TimedRotatingFileHandler
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis
+
+from fast_json import decode_value, encode_value
+from sql_utils import normalize_sql
+
+# 日志配置
+log_handler = TimedRotatingFileHandler(
+    'query_cache_log.log', when='midnight', interval=1, backupCount=7, encoding='utf-8'
+)
+log_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', '%Y-%m-%d %H:%M:%S'))
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+logger.addHandler(log_handler)
+
+
+# 未命中标记，用于区分“缓存了None”与“没有缓存”
+MISS = object()
+
+# 表失效广播频道（相对于键前缀），消息体为表名的JSON数组
+INVALIDATE_CHANNEL = "invalidate"
+
+# 把缓存键登记到表的标签集合，标签集合的过期时间只延长不缩短：
+# 短TTL的写入若把过期时间改短，标签集合会先于其中长TTL的条目过期，失效时就找不到这些条目
+TAG_ADD_SCRIPT = """
+redis.call('SADD', KEYS[1], ARGV[1])
+local ttl = tonumber(ARGV[2])
+if redis.call('TTL', KEYS[1]) < ttl then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+"""
+
+# 带代数检查的写入：KEYS = [缓存键, n个表的代数键..., n个表的标签键...]，ARGV = [值, 过期秒数, 读库前取出的n个代数...]
+# 任一表的代数已变化（读库期间被写操作失效过）则放弃写入，检查与写入在同一脚本中原子执行
+GUARDED_SET_SCRIPT = """
+local n = (#KEYS - 1) / 2
+for i = 1, n do
+    if (redis.call('GET', KEYS[1 + i]) or '') ~= ARGV[2 + i] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+local tag_ttl = tonumber(ARGV[2]) * 2
+for i = 1, n do
+    local tag = KEYS[1 + n + i]
+    redis.call('SADD', tag, KEYS[1])
+    if redis.call('TTL', tag) < tag_ttl then
+        redis.call('EXPIRE', tag, tag_ttl)
+    end
+end
+return 1
+"""
+
+
+def make_cache_key(kind: str, sql_query: str, params: Optional[Dict] = None) -> str:
+    """
+    根据调用方法、规范化SQL及参数生成缓存键
+    @param {str} kind - 调用方法名（query/get_row/get_var），不同方法的结果形态不同
+    @param {str} sql_query - SQL语句
+    @param {Dict} params - 查询参数
+    @returns {str} 缓存键
+    """
+    payload = json.dumps(params or {}, sort_keys=True, default=str, separators=(",", ":"))
+    digest = hashlib.sha1(f"{kind}|{normalize_sql(sql_query)}|{payload}".encode("utf-8")).hexdigest()
+    return f"{kind}:{digest}"
+
+
+class MemoryCache:
+    """
+    进程内查询结果缓存（LRU + TTL，线程安全），按表名打标签以便写操作时失效
+    """
+
+    def __init__(self, maxsize: int = 1024, default_ttl: int = 60):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[str, Tuple[float, Tuple[str, ...], Any]]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        # 各表被失效的次数（代数），clear 时递增 _epoch 使之前取出的代数全部作废
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.stale_sets = 0
+        self.invalidations = 0
+
+    def _drop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for table in entry[1]:
+            keys = self._tags.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[table]
+
+    def get(self, key: str) -> Any:
+        """
+        读取缓存
+        @param {str} key - 缓存键
+        @returns {Any} 缓存值，未命中或已过期时返回 MISS
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def _generation(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        return (self._epoch,) + tuple(self._generations.get(table, 0) for table in tables)
+
+    def generation(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """
+        读取依赖表的失效代数，在查询数据库之前调用，结果传给 set 的 generation
+        @param {Iterable[str]} tables - 表名
+        @returns {Tuple[int, ...]} 代数
+        """
+        with self._lock:
+            return self._generation(tuple(tables))
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tables: Iterable[str] = (),
+            generation: Optional[Tuple[int, ...]] = None) -> bool:
+        """
+        写入缓存
+        @param {str} key - 缓存键
+        @param {Any} value - 缓存值
+        @param {int} ttl - 过期秒数，默认使用 default_ttl
+        @param {Iterable[str]} tables - 该结果依赖的表名，用于失效
+        @param {Tuple[int, ...]} generation - 查询前 generation(tables) 的返回值，其后依赖表被失效过则不写入
+                                             （查询期间并发的写操作已提交，读到的可能是旧数据）
+        @returns {bool} 是否写入
+        """
+        tables = tuple(tables)
+        expire_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            if generation is not None and generation != self._generation(tables):
+                self.stale_sets += 1
+                return False
+            self._drop(key)
+            self._data[key] = (expire_at, tables, value)
+            for table in tables:
+                self._tags.setdefault(table, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+            self.sets += 1
+        return True
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        使依赖指定表的缓存全部失效
+        @param {Iterable[str]} tables - 表名
+        @returns {int} 失效的缓存条数
+        """
+        removed = 0
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._tags.get(table, ())):
+                    self._drop(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self._epoch += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        缓存统计信息
+        @returns {Dict[str, int]} 命中/未命中/写入/放弃写入/失效次数及当前条数
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "stale_sets": self.stale_sets,
+            "invalidations": self.invalidations,
+            "size": len(self._data),
+        }
+
+
+class RedisQueryCache:
+    """
+    基于同步 Redis 客户端的查询结果缓存，供 MySQLServer 使用；键、标签集合及序列化方式与 AsyncQueryCache 相同，
+    两者使用同一前缀时共享缓存条目，任一方的写操作都会使另一方的缓存失效
+    Redis 不可用时回退到进程内 MemoryCache
+    """
+
+    def __init__(self, redis_client=None, default_ttl: int = 60, prefix: str = "qc:",
+                 fallback: Optional[MemoryCache] = None):
+        """
+        @param redis_client - redis.Redis 客户端（多线程共用，连接池应为 BlockingConnectionPool），None 时只用进程内缓存
+        @param {int} default_ttl - 默认过期秒数
+        @param {str} prefix - Redis 键前缀
+        @param {MemoryCache} fallback - Redis 不可用时使用的进程内缓存
+        """
+        self.redis = redis_client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.channel = prefix + INVALIDATE_CHANNEL
+        self.fallback = fallback or MemoryCache(default_ttl=default_ttl)
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.stale_sets = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _tag_key(self, table: str) -> str:
+        return f"{self.prefix}tag:{table}"
+
+    def _gen_key(self, table: str) -> str:
+        return f"{self.prefix}gen:{table}"
+
+    def _guarded_set_args(self, key: str, value: Any, ttl: int, tables: Tuple[str, ...], guard: Tuple[bytes, ...]):
+        # GUARDED_SET_SCRIPT 的参数：键个数、各键及各参数
+        keys = [self.prefix + key, *map(self._gen_key, tables), *map(self._tag_key, tables)]
+        return (len(keys), *keys, encode_value(value), ttl, *guard)
+
+    def get(self, key: str) -> Any:
+        """
+        读取缓存
+        @param {str} key - 缓存键
+        @returns {Any} 缓存值，未命中时返回 MISS
+        """
+        if self.redis is None:
+            value = self.fallback.get(key)
+        else:
+            try:
+                raw = self.redis.get(self.prefix + key)
+                value = MISS if raw is None else decode_value(raw)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis缓存读取失败，回退到进程内缓存: {str(e)}")
+                value = self.fallback.get(key)
+        if value is MISS:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def generation(self, tables: Iterable[str]) -> Tuple[Optional[Tuple[bytes, ...]], Tuple[int, ...]]:
+        """
+        读取依赖表的失效代数（Redis 中的代数及进程内回退缓存的代数），在查询数据库之前调用，结果传给 set 的 generation
+        @param {Iterable[str]} tables - 表名
+        @returns {tuple} (Redis 代数，Redis 不可用时为None；回退缓存代数)
+        """
+        tables = tuple(tables)
+        current = None if tables else ()
+        if self.redis is not None and tables:
+            try:
+                values = self.redis.mget([self._gen_key(table) for table in tables])
+                current = tuple(value or b"" for value in values)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis缓存代数读取失败: {str(e)}")
+        return current, self.fallback.generation(tables)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tables: Iterable[str] = (),
+            generation: Optional[tuple] = None) -> None:
+        """
+        写入缓存，并把键登记到每个依赖表的标签集合中
+        @param {str} key - 缓存键
+        @param {Any} value - 缓存值
+        @param {int} ttl - 过期秒数，默认使用 default_ttl
+        @param {Iterable[str]} tables - 该结果依赖的表名
+        @param {tuple} generation - 查询前 generation(tables) 的返回值，其后依赖表被失效过则不写入
+        """
+        ttl = ttl or self.default_ttl
+        tables = tuple(tables)
+        guard, fallback_generation = generation if generation is not None else (None, None)
+        if self.redis is None or (generation is not None and guard is None):
+            # 未配置 Redis，或读代数时 Redis 不可用，只写进程内缓存
+            stored = self.fallback.set(key, value, ttl, tables, fallback_generation)
+        else:
+            try:
+                if guard is None:
+                    with self.redis.pipeline(transaction=False) as pipe:
+                        pipe.set(self.prefix + key, encode_value(value), ex=ttl)
+                        for table in tables:
+                            pipe.eval(TAG_ADD_SCRIPT, 1, self._tag_key(table), self.prefix + key, ttl * 2)
+                        pipe.execute()
+                    stored = True
+                else:
+                    stored = bool(self.redis.eval(GUARDED_SET_SCRIPT,
+                                                  *self._guarded_set_args(key, value, ttl, tables, guard)))
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis缓存写入失败，回退到进程内缓存: {str(e)}")
+                stored = self.fallback.set(key, value, ttl, tables, fallback_generation)
+        if stored:
+            self.sets += 1
+        else:
+            self.stale_sets += 1
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        使依赖指定表的缓存全部失效（Redis 与进程内回退缓存都会清理），并广播给其他进程清理各自的进程内缓存
+        @param {Iterable[str]} tables - 表名
+        @returns {int} 失效的缓存条数
+        """
+        tables = tuple(tables)
+        removed = self.fallback.invalidate_tables(tables)
+        if self.redis is not None and tables:
+            try:
+                for table in tables:
+                    # 先递增代数：之后完成的读库结果不再写入，之前写入的条目已登记到标签集合、在下面删除
+                    self.redis.incr(self._gen_key(table))
+                    tag_key = self._tag_key(table)
+                    members = self.redis.smembers(tag_key)
+                    if members:
+                        removed += self.redis.delete(*members)
+                    self.redis.delete(tag_key)
+                self.redis.publish(self.channel, json.dumps(tables))
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis缓存失效失败: {tables} | {str(e)}")
+        self.invalidations += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """
+        缓存统计信息
+        @returns {Dict[str, int]} 命中/未命中/写入/放弃写入/失效/错误次数
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "stale_sets": self.stale_sets,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+class AsyncQueryCache:
+    """
+    基于 AsyncRedisServer 的异步查询结果缓存，Redis 不可用时回退到进程内 MemoryCache
+    缓存值使用 fast_json.encode_value 序列化（只含数据，带类型标签以保留 datetime / Decimal 等类型）
+    """
+
+    def __init__(self, redis_server=None, default_ttl: int = 60, prefix: str = "qc:",
+                 fallback: Optional[MemoryCache] = None):
+        """
+        @param redis_server - AsyncRedisServer 实例，或直接传入 redis.asyncio 客户端（如 fakeredis）
+        @param {int} default_ttl - 默认过期秒数
+        @param {str} prefix - Redis 键前缀
+        @param {MemoryCache} fallback - Redis 不可用时使用的进程内缓存
+        """
+        self.redis_server = redis_server
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.channel = prefix + INVALIDATE_CHANNEL
+        self.fallback = fallback or MemoryCache(default_ttl=default_ttl)
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.stale_sets = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @asynccontextmanager
+    async def _client(self):
+        if hasattr(self.redis_server, "get_redis"):
+            async with self.redis_server.get_redis() as redis:
+                yield redis
+        else:
+            yield self.redis_server
+
+    def _tag_key(self, table: str) -> str:
+        return f"{self.prefix}tag:{table}"
+
+    def _gen_key(self, table: str) -> str:
+        return f"{self.prefix}gen:{table}"
+
+    def _guarded_set_args(self, key: str, value: Any, ttl: int, tables: Tuple[str, ...], guard: Tuple[bytes, ...]):
+        # GUARDED_SET_SCRIPT 的参数：键个数、各键及各参数
+        keys = [self.prefix + key, *map(self._gen_key, tables), *map(self._tag_key, tables)]
+        return (len(keys), *keys, encode_value(value), ttl, *guard)
+
+    async def get(self, key: str) -> Any:
+        """
+        读取缓存
+        @param {str} key - 缓存键
+        @returns {Any} 缓存值，未命中时返回 MISS
+        """
+        if self.redis_server is None:
+            value = self.fallback.get(key)
+        else:
+            try:
+                async with self._client() as redis:
+                    raw = await redis.get(self.prefix + key)
+                value = MISS if raw is None else decode_value(raw)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis缓存读取失败，回退到进程内缓存: {str(e)}")
+                value = self.fallback.get(key)
+        if value is MISS:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def generation(self, tables: Iterable[str]) -> Tuple[Optional[Tuple[bytes, ...]], Tuple[int, ...]]:
+        """
+        读取依赖表的失效代数（Redis 中的代数及进程内回退缓存的代数），在查询数据库之前调用，结果传给 set 的 generation
+        @param {Iterable[str]} tables - 表名
+        @returns {tuple} (Redis 代数，Redis 不可用时为None；回退缓存代数)
+        """
+        tables = tuple(tables)
+        current = None if tables else ()
+        if self.redis_server is not None and tables:
+            try:
+                async with self._client() as redis:
+                    values = await redis.mget([self._gen_key(table) for table in tables])
+                current = tuple(value or b"" for value in values)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis缓存代数读取失败: {str(e)}")
+        return current, self.fallback.generation(tables)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, tables: Iterable[str] = (),
+                  generation: Optional[tuple] = None) -> None:
+        """
+        写入缓存，并把键登记到每个依赖表的标签集合中
+        @param {str} key - 缓存键
+        @param {Any} value - 缓存值
+        @param {int} ttl - 过期秒数，默认使用 default_ttl
+        @param {Iterable[str]} tables - 该结果依赖的表名
+        @param {tuple} generation - 查询前 generation(tables) 的返回值，其后依赖表被失效过则不写入
+        """
+        ttl = ttl or self.default_ttl
+        tables = tuple(tables)
+        guard, fallback_generation = generation if generation is not None else (None, None)
+        if self.redis_server is None or (generation is not None and guard is None):
+            # 未配置 Redis，或读代数时 Redis 不可用，只写进程内缓存
+            stored = self.fallback.set(key, value, ttl, tables, fallback_generation)
+        else:
+            try:
+                async with self._client() as redis:
+                    if guard is None:
+                        pipe = redis.pipeline(transaction=False)
+                        pipe.set(self.prefix + key, encode_value(value), ex=ttl)
+                        for table in tables:
+                            pipe.eval(TAG_ADD_SCRIPT, 1, self._tag_key(table), self.prefix + key, ttl * 2)
+                        await pipe.execute()
+                        stored = True
+                    else:
+                        stored = bool(await redis.eval(GUARDED_SET_SCRIPT,
+                                                       *self._guarded_set_args(key, value, ttl, tables, guard)))
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis缓存写入失败，回退到进程内缓存: {str(e)}")
+                stored = self.fallback.set(key, value, ttl, tables, fallback_generation)
+        if stored:
+            self.sets += 1
+        else:
+            self.stale_sets += 1
+
+    async def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        使依赖指定表的缓存全部失效（Redis 与进程内回退缓存都会清理），并广播给其他进程清理各自的进程内缓存
+        @param {Iterable[str]} tables - 表名
+        @returns {int} 失效的缓存条数
+        """
+        tables = tuple(tables)
+        removed = self.fallback.invalidate_tables(tables)
+        if self.redis_server is not None and tables:
+            try:
+                async with self._client() as redis:
+                    for table in tables:
+                        # 先递增代数：之后完成的读库结果不再写入，之前写入的条目已登记到标签集合、在下面删除
+                        await redis.incr(self._gen_key(table))
+                        tag_key = self._tag_key(table)
+                        members = await redis.smembers(tag_key)
+                        if members:
+                            removed += await redis.delete(*members)
+                        await redis.delete(tag_key)
+                    await redis.publish(self.channel, json.dumps(tables))
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis缓存失效失败: {tables} | {str(e)}")
+        self.invalidations += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """
+        缓存统计信息
+        @returns {Dict[str, int]} 命中/未命中/写入/放弃写入/失效/错误次数
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "stale_sets": self.stale_sets,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+class InvalidationSubscriber:
+    """
+    订阅表失效广播（RedisQueryCache / AsyncQueryCache 的 invalidate_tables 发布），在后台线程中清理本进程的
+    进程内缓存（Redis 回退缓存、COUNT 缓存等），使任一工作进程的写操作都能让所有进程的缓存失效
+    每次（重新）订阅成功后先清空这些缓存：断线期间可能漏掉了失效消息
+    每个工作进程在启动后各自 start（订阅连接不能跨 fork 共用）
+    """
+
+    def __init__(self, redis_url: str, caches: Iterable[MemoryCache] = (), prefix: str = "qc:",
+                 poll_timeout: float = 1.0, max_backoff: float = 30.0):
+        """
+        @param {str} redis_url - Redis连接地址
+        @param {Iterable[MemoryCache]} caches - 收到失效消息时要清理的进程内缓存
+        @param {str} prefix - 与查询缓存相同的键前缀
+        @param {float} poll_timeout - 等待消息的超时秒数（也是 stop 的最长响应时间）
+        @param {float} max_backoff - 连接失败后重试的最长间隔秒数
+        """
+        self.redis_url = redis_url
+        self.caches: List[MemoryCache] = list(caches)
+        self.channel = prefix + INVALIDATE_CHANNEL
+        self.poll_timeout = poll_timeout
+        self.max_backoff = max_backoff
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.messages = 0
+        self.subscribes = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        """
+        启动订阅线程
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        停止订阅线程
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        backoff = 0.5
+        while not self._stop.is_set():
+            client = pubsub = None
+            try:
+                client = redis.Redis.from_url(self.redis_url, socket_connect_timeout=5, health_check_interval=30)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self.subscribes += 1
+                for cache in self.caches:
+                    cache.clear()
+                backoff = 0.5
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=self.poll_timeout)
+                    if message is not None and message["type"] == "message":
+                        self._apply(message["data"])
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"缓存失效订阅中断，{backoff}秒后重试: {str(e)}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                for closeable in (pubsub, client):
+                    if closeable is not None:
+                        try:
+                            closeable.close()
+                        except Exception:
+                            pass
+
+    def _apply(self, data: bytes) -> None:
+        self.messages += 1
+        try:
+            tables = json.loads(data)
+        except ValueError:
+            logger.warning(f"无法解析的缓存失效消息: {data!r}")
+            return
+        for cache in self.caches:
+            cache.invalidate_tables(tables)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        订阅统计
+        @returns {Dict[str, int]} 收到的失效消息数、订阅次数、失败次数
+        """
+        return {
+            "messages": self.messages,
+            "subscribes": self.subscribes,
+            "errors": self.errors,
+        }
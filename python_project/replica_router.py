@@ -0,0 +1,153 @@
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.engine import make_url
+
+# 支持的负载均衡策略
+BALANCE_STRATEGIES = ("round_robin", "least_connections")
+
+
+class Replica:
+    """
+    单个只读副本：引擎、会话工厂及路由状态，引擎在第一次路由到该副本时才创建
+    """
+
+    def __init__(self, url: str, engine_factory: Callable[[], Any], session_factory: Callable[[Any], Any]):
+        """
+        @param {str} url - 副本连接地址
+        @param {Callable} engine_factory - 创建（或从注册表获取）引擎的函数
+        @param {Callable} session_factory - 以引擎为参数创建会话工厂的函数
+        """
+        self.url = url
+        self._engine_factory = engine_factory
+        self._session_factory = session_factory
+        self._engine = None
+        self._SessionLocal = None
+        self.in_flight = 0
+        self.lag: Optional[float] = 0.0
+        self.ejected = False
+        self.last_error: Optional[str] = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = self._engine_factory()
+        return self._engine
+
+    @property
+    def SessionLocal(self):
+        if self._SessionLocal is None:
+            self._SessionLocal = self._session_factory(self.engine)
+        return self._SessionLocal
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": make_url(self.url).render_as_string(hide_password=True),
+            "in_flight": self.in_flight,
+            "lag": self.lag,
+            "ejected": self.ejected,
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaRouter:
+    """
+    只读副本路由：轮询或最少连接负载均衡，复制延迟超过阈值的副本会被摘除，恢复后自动加回
+    没有可用副本时返回None，由调用方回退到主库
+    """
+
+    def __init__(self, replicas: List[Replica], balance: str = "round_robin", max_lag: float = 5.0,
+                 lag_check_interval: float = 5.0):
+        """
+        @param {List[Replica]} replicas - 副本列表
+        @param {str} balance - 负载均衡策略 round_robin / least_connections
+        @param {float} max_lag - 允许的最大复制延迟秒数，超过则摘除
+        @param {float} lag_check_interval - 复制延迟检查间隔秒数
+        """
+        if balance not in BALANCE_STRATEGIES:
+            raise ValueError(f"不支持的负载均衡策略: {balance}，可选 {', '.join(BALANCE_STRATEGIES)}")
+        self.replicas = replicas
+        self.balance = balance
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._last_lag_check = 0.0
+        self.routed = 0
+        self.fallbacks = 0
+
+    def acquire(self) -> Optional[Replica]:
+        """
+        选出一个可用副本并占用（in_flight + 1），用完必须调用 release
+        @returns {Optional[Replica]} 副本，无可用副本时返回None
+        """
+        with self._lock:
+            healthy = [r for r in self.replicas if not r.ejected]
+            if not healthy:
+                self.fallbacks += 1
+                return None
+            if self.balance == "least_connections":
+                replica = min(healthy, key=lambda r: r.in_flight)
+            else:
+                replica = healthy[next(self._counter) % len(healthy)]
+            replica.in_flight += 1
+            self.routed += 1
+            return replica
+
+    def release(self, replica: Replica) -> None:
+        with self._lock:
+            replica.in_flight -= 1
+
+    def lag_check_due(self) -> bool:
+        """
+        是否到了检查复制延迟的时间；返回True时同时记下检查时间，避免并发重复检查
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_lag_check < self.lag_check_interval:
+                return False
+            self._last_lag_check = now
+            return True
+
+    def update_lag(self, replica: Replica, lag: Optional[float], error: Optional[str] = None) -> None:
+        """
+        更新副本的复制延迟，延迟未知（复制中断或探测失败）或超过阈值时摘除
+        @param {Replica} replica - 副本
+        @param {float} lag - 复制延迟秒数，None表示未知
+        @param {str} error - 探测失败原因
+        """
+        with self._lock:
+            replica.lag = lag
+            replica.last_error = error
+            replica.ejected = lag is None or lag > self.max_lag
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        路由统计
+        @returns {Dict[str, Any]} 路由到副本次数、回退主库次数及各副本状态
+        """
+        return {
+            "balance": self.balance,
+            "routed": self.routed,
+            "fallbacks": self.fallbacks,
+            "replicas": [r.stats() for r in self.replicas],
+        }
+
+
+def read_mysql_lag(rows: List[Dict[str, Any]]) -> Optional[float]:
+    """
+    从 SHOW REPLICA STATUS / SHOW SLAVE STATUS 的结果中读取复制延迟
+    @param {List[Dict]} rows - 结果行
+    @returns {Optional[float]} 延迟秒数；不是副本时返回0，复制中断时返回None
+    """
+    if not rows:
+        return 0.0
+    row = rows[0]
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+# 复制延迟探测函数签名：接收副本上的同步连接（或异步连接），返回延迟秒数
+LagProbe = Callable[[Any], Optional[float]]
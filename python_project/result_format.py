@@ -0,0 +1,64 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Sequence
+
+# query/query_in 支持的返回格式
+RESULT_FORMATS = ("dict", "columnar", "columnar_typed")
+
+
+def _typed_column(values: List[Any]):
+    """
+    数值列转换为紧凑的 array.array：全部为 int 用 'q'，全部为 float 用 'd'，否则保持 list
+    """
+    if values and all(type(v) is int for v in values):
+        try:
+            return array("q", values)
+        except OverflowError:
+            return values
+    if values and all(type(v) is float for v in values):
+        return array("d", values)
+    return values
+
+
+def to_columnar(columns: Iterable[str], rows: Sequence[Sequence[Any]], typed_arrays: bool = False) -> Dict[str, Any]:
+    """
+    把查询结果转换为列式结构，不再为每一行创建字典、重复列名
+    @param {Iterable[str]} columns - 列名
+    @param {Sequence[Sequence]} rows - 行元组
+    @param {bool} typed_arrays - 为True时按列存储，数值列使用 array.array
+    @returns {Dict[str, Any]} typed_arrays=False: {"columns": [...], "rows": [[...], ...]}
+                              typed_arrays=True:  {"columns": [...], "column_data": [array/list, ...], "row_count": n}
+    """
+    columns = list(columns)
+    if not typed_arrays:
+        return {"columns": columns, "rows": [tuple(row) for row in rows]}
+    column_data = [_typed_column(list(values)) for values in zip(*rows)] if rows else [[] for _ in columns]
+    return {"columns": columns, "column_data": column_data, "row_count": len(rows)}
+
+
+def columnar_jsonable(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把 columnar_typed 结果中的 array.array 转换为 list，便于 JSON 序列化
+    @param {Dict[str, Any]} result - to_columnar 的返回值
+    @returns {Dict[str, Any]} 可直接序列化的结果
+    """
+    if "column_data" not in result:
+        return result
+    return {**result, "column_data": [c.tolist() if isinstance(c, array) else c for c in result["column_data"]]}
+
+
+def format_rows(columns: Iterable[str], rows: Sequence[Sequence[Any]], result_format: str = "dict"):
+    """
+    按指定格式组装查询结果
+    @param {Iterable[str]} columns - 列名
+    @param {Sequence[Sequence]} rows - 行元组
+    @param {str} result_format - dict（默认，每行一个字典）/ columnar / columnar_typed
+    @returns {List[Dict] | Dict[str, Any]} 查询结果
+    """
+    if result_format == "dict":
+        columns = list(columns)
+        return [dict(zip(columns, row)) for row in rows]
+    if result_format == "columnar":
+        return to_columnar(columns, rows)
+    if result_format == "columnar_typed":
+        return to_columnar(columns, rows, typed_arrays=True)
+    raise ValueError(f"不支持的返回格式: {result_format}，可选 {', '.join(RESULT_FORMATS)}")
@@ -0,0 +1,33 @@
+"""
+生产环境启动入口：按 WEB_CONCURRENCY 启动多个 uvicorn 工作进程（未设置时每个CPU核一个，但不超过连接预算能支撑的进程数）
+每个工作进程独立导入 main，各自创建数据库连接池与Redis连接池，连接总预算由 settings 平分
+运行: python run.py
+环境变量: WEB_CONCURRENCY / HOST / PORT / MYSQL_URL / ASYNC_MYSQL_URL / REDIS_URL /
+          DB_MAX_CONNECTIONS / REDIS_MAX_CONNECTIONS / POOL_WARMUP_CONNECTIONS
+"""
+import importlib
+import os
+
+import uvicorn
+
+import settings
+
+# 工作进程从环境变量读取进程数来计算各自的连接池大小；显式配置的进程数超出连接预算时 main 中直接报错
+if "WEB_CONCURRENCY" not in os.environ:
+    os.environ["WEB_CONCURRENCY"] = str(min(os.cpu_count() or 1, settings.max_workers()))
+    # 单进程模式在本进程内导入 main，settings 需按确定后的进程数重新加载
+    settings = importlib.reload(settings)
+
+
+def main() -> None:
+    pool_size, max_overflow = settings.db_pool_size()
+    redis_async, redis_sync = settings.redis_pool_sizes()
+    print(f"启动 {settings.WEB_CONCURRENCY} 个工作进程（CPU核数 {os.cpu_count()}，连接预算最多支撑 "
+          f"{settings.max_workers()} 个），每个数据库连接池 pool_size={pool_size} max_overflow={max_overflow}，"
+          f"Redis连接池上限 异步 {redis_async} / 同步 {redis_sync}", flush=True)
+    # 多进程模式必须传入导入字符串，由每个工作进程自己导入应用
+    uvicorn.run("main:app", host=settings.HOST, port=settings.PORT, workers=settings.WEB_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    main()
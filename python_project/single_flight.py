@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # 所有等待方都已取消时，避免出现 "Task exception was never retrieved" 警告
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    """
+    并发请求合并：同一个键同时只执行一次，其余并发调用方等待并共享同一结果（或同一异常）
+    - 调用方被取消时只取消自己的等待，不会取消正在执行的共享查询
+    - 共享的结果对象会被多个调用方同时持有，应视为只读
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self.errors = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入一个进行中的调用
+        @param {str} key - 合并键（如规范化SQL + 参数）
+        @param {Callable} fn - 无参协程函数，仅在没有进行中的同键调用时执行
+        @returns {Any} fn 的返回值
+        """
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(self._run(key, fn))
+            task.add_done_callback(_consume_exception)
+            self._flights[key] = task
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await fn()
+        except BaseException:
+            self.errors += 1
+            raise
+        finally:
+            # 结束后立即移除，之后的调用会重新查询，避免读到写操作之前的结果
+            self._flights.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        合并统计
+        @returns {Dict[str, int]} 调用次数、实际执行次数、节省的数据库调用次数、出错次数、进行中数量
+        """
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "saved": self.shared,
+            "errors": self.errors,
+            "inflight": len(self._flights),
+        }
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from sql_logger import SqlLogger
+from sql_utils import fingerprint, normalize_sql
+
+# 慢查询日志单独写文件，同样经队列由后台线程写入
+slow_sql_logger = SqlLogger(__name__, 'slow_query_log.log')
+
+# 报表支持的排序字段
+SORT_KEYS = ("total", "p95", "max", "count", "rows")
+
+
+def explain_sql(sql_query: str, dialect_name: str) -> Optional[str]:
+    """
+    生成 EXPLAIN 语句，只对查询语句生成（写语句不做，避免误执行）
+    @param {str} sql_query - 原始SQL
+    @param {str} dialect_name - 方言名
+    @returns {Optional[str]} EXPLAIN语句，不适用时返回None
+    """
+    sql_query = normalize_sql(sql_query)
+    keyword = sql_query.split(" ", 1)[0].upper()
+    if keyword not in ("SELECT", "WITH"):
+        return None
+    if dialect_name == "sqlite":
+        return "EXPLAIN QUERY PLAN " + sql_query
+    return "EXPLAIN " + sql_query
+
+
+class _Aggregate:
+    __slots__ = ("fingerprint", "sample", "count", "total", "max", "rows", "durations", "first_seen",
+                 "last_seen", "explain", "explain_error", "explain_pending")
+
+    def __init__(self, fp: str, sample: str, sample_size: int):
+        self.fingerprint = fp
+        self.sample = sample
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.durations: deque = deque(maxlen=sample_size)
+        self.first_seen = self.last_seen = time.time()
+        self.explain: Optional[List[Dict[str, Any]]] = None
+        self.explain_error: Optional[str] = None
+        self.explain_pending = False
+
+    def p95(self) -> float:
+        values = sorted(self.durations)
+        return values[min(len(values) - 1, int(len(values) * 0.95))] if values else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "sample": self.sample,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p95_ms": round(self.p95() * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "avg_rows": round(self.rows / self.count, 1) if self.count else 0.0,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "explain": self.explain,
+            "explain_error": self.explain_error,
+        }
+
+
+class SlowQueryLog:
+    """
+    慢查询统计：超过阈值的语句按指纹聚合（次数、总耗时、p95、最大耗时、行数），
+    每个指纹第一次变慢时在后台执行一次 EXPLAIN 并保存执行计划
+    """
+
+    def __init__(self, threshold_ms: float = 200, max_fingerprints: int = 1000, sample_size: int = 256,
+                 explain: bool = True):
+        """
+        @param {float} threshold_ms - 慢查询阈值毫秒
+        @param {int} max_fingerprints - 最多保留的指纹数，超出时淘汰总耗时最少的
+        @param {int} sample_size - 每个指纹保留最近多少次耗时用于计算p95
+        @param {bool} explain - 是否自动采集执行计划
+        """
+        self.threshold = threshold_ms / 1000
+        self.max_fingerprints = max_fingerprints
+        self.sample_size = sample_size
+        self.explain = explain
+        self._aggregates: Dict[str, _Aggregate] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.evicted = 0
+
+    def is_slow(self, seconds: float) -> bool:
+        return seconds >= self.threshold
+
+    def record(self, sql_query: str, seconds: float, rows: Optional[int] = None) -> bool:
+        """
+        记录一次慢查询
+        @param {str} sql_query - SQL语句
+        @param {float} seconds - 耗时秒数
+        @param {int} rows - 返回或影响的行数
+        @returns {bool} 是否需要为该指纹采集执行计划（每个指纹只返回一次True）
+        """
+        fp = fingerprint(sql_query)
+        with self._lock:
+            aggregate = self._aggregates.get(fp)
+            if aggregate is None:
+                if len(self._aggregates) >= self.max_fingerprints:
+                    victim = min(self._aggregates.values(), key=lambda a: a.total)
+                    del self._aggregates[victim.fingerprint]
+                    self.evicted += 1
+                aggregate = self._aggregates[fp] = _Aggregate(fp, normalize_sql(sql_query), self.sample_size)
+            aggregate.count += 1
+            aggregate.total += seconds
+            aggregate.max = max(aggregate.max, seconds)
+            aggregate.rows += rows or 0
+            aggregate.durations.append(seconds)
+            aggregate.last_seen = time.time()
+            need_explain = self.explain and aggregate.explain is None and aggregate.explain_error is None \
+                and not aggregate.explain_pending
+            if need_explain:
+                aggregate.explain_pending = True
+        slow_sql_logger.logger.warning("慢查询: %.1f ms | 行数: %s | 指纹: %s | SQL: %s",
+                                       seconds * 1000, rows, fp, sql_query)
+        return need_explain
+
+    def set_explain(self, sql_query: str, plan: Optional[List[Dict[str, Any]]], error: Optional[str] = None) -> None:
+        """
+        保存执行计划
+        @param {str} sql_query - SQL语句
+        @param {List[Dict]} plan - EXPLAIN结果行
+        @param {str} error - 采集失败原因
+        """
+        with self._lock:
+            aggregate = self._aggregates.get(fingerprint(sql_query))
+            if aggregate is not None:
+                aggregate.explain = plan
+                aggregate.explain_error = error
+                aggregate.explain_pending = False
+
+    def submit(self, fn: Callable, *args) -> None:
+        """
+        在后台单线程中执行同步的 EXPLAIN 采集，不占用请求线程
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        self._executor.submit(fn, *args)
+
+    def report(self, limit: int = 20, sort: str = "total") -> Dict[str, Any]:
+        """
+        慢查询报表
+        @param {int} limit - 返回前多少个指纹
+        @param {str} sort - 排序字段 total / p95 / max / count / rows
+        @returns {Dict[str, Any]} 阈值、指纹总数及按排序字段倒序的聚合列表
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {sort}，可选 {', '.join(SORT_KEYS)}")
+        with self._lock:
+            items = [a.to_dict() for a in self._aggregates.values()]
+        key = {"total": "total_ms", "p95": "p95_ms", "max": "max_ms", "count": "count", "rows": "rows"}[sort]
+        items.sort(key=lambda item: item[key], reverse=True)
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "fingerprints": len(items),
+            "evicted": self.evicted,
+            "queries": items[:limit],
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._aggregates.clear()
+            self.evicted = 0
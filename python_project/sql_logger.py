@@ -0,0 +1,169 @@
+import atexit
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Dict, List, Optional
+
+import settings
+from statement_cache import statement_cache
+
+
+class LazySql:
+    """
+    延迟编译的SQL文本：只有日志记录真正被后台线程格式化时，才执行 literal_binds 编译
+    参数在创建时浅拷贝一份，调用方之后修改参数字典不会影响日志内容
+    """
+    __slots__ = ("sql_query", "params", "dialect")
+
+    def __init__(self, sql_query: str, params: Optional[Dict], dialect):
+        self.sql_query = sql_query
+        self.params = dict(params) if params else params
+        self.dialect = dialect
+
+    def __str__(self) -> str:
+        try:
+            return str(statement_cache.text(self.sql_query).bindparams(**(self.params or {})).compile(
+                dialect=self.dialect, compile_kwargs={"literal_binds": True}))
+        except Exception:
+            return self.sql_query
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    有界队列日志处理器：不在请求线程格式化消息，队列满时直接丢弃并计数，绝不阻塞调用方
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 消息合并（包括 LazySql 的编译）推迟到后台写线程中完成
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class SqlLogger:
+    """
+    SQL日志子系统：队列 + 后台写线程，支持采样率、按级别开关及丢弃计数，默认值取自 settings 的 SQL_LOG_* 配置
+    """
+
+    def __init__(self, name: str, filename: str, queue_size: int = settings.SQL_LOG_QUEUE_SIZE,
+                 success_sample_rate: float = settings.SQL_LOG_SUCCESS_SAMPLE_RATE,
+                 failure_sample_rate: float = settings.SQL_LOG_FAILURE_SAMPLE_RATE,
+                 success_enabled: bool = settings.SQL_LOG_SUCCESS_ENABLED,
+                 failure_enabled: bool = settings.SQL_LOG_FAILURE_ENABLED):
+        """
+        @param {str} name - logger名称
+        @param {str} filename - 日志文件名（按天轮转，保留7天）
+        @param {int} queue_size - 日志缓冲队列长度，满了以后新日志被丢弃
+        @param {float} success_sample_rate - 成功SQL日志采样率（0~1）
+        @param {float} failure_sample_rate - 失败SQL日志采样率（0~1）
+        @param {bool} success_enabled - 是否记录成功SQL
+        @param {bool} failure_enabled - 是否记录失败SQL
+        """
+        self.success_sample_rate = success_sample_rate
+        self.failure_sample_rate = failure_sample_rate
+        self.success_enabled = success_enabled
+        self.failure_enabled = failure_enabled
+        self.sampled_out = 0
+
+        file_handler = TimedRotatingFileHandler(filename, when='midnight', interval=1, backupCount=7, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', '%Y-%m-%d %H:%M:%S'))
+        self.queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        self.listener = QueueListener(self.queue_handler.queue, file_handler, respect_handler_level=True)
+        self.listener.start()
+        self._running = True
+        atexit.register(self.stop)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.queue_handler)
+
+    def stop(self) -> None:
+        """
+        停止后台写线程，队列中剩余日志会先写完
+        """
+        if self._running:
+            self._running = False
+            self.listener.stop()
+
+    def _restart_after_fork(self) -> None:
+        # fork 出的子进程没有父进程的后台写线程，换一个新队列并重新启动写线程
+        if self._running:
+            self.queue_handler.queue = queue.Queue(maxsize=self.queue_handler.queue.maxsize)
+            self.listener = QueueListener(self.queue_handler.queue, *self.listener.handlers, respect_handler_level=True)
+            self.listener.start()
+
+    def _sampled(self, rate: float) -> bool:
+        if rate >= 1.0:
+            return True
+        if rate > 0 and random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+    def success(self, sql_query: str, params: Optional[Dict], dialect) -> None:
+        """
+        记录执行成功的SQL
+        @param {str} sql_query - SQL语句
+        @param {Dict} params - 执行参数
+        @param dialect - 用于编译完整SQL的方言
+        """
+        if self.success_enabled and self.logger.isEnabledFor(logging.INFO) and self._sampled(self.success_sample_rate):
+            lazy = LazySql(sql_query, params, dialect)
+            self.logger.info("执行成功: %s | 参数: %s | 执行结果: %s", sql_query, lazy.params, lazy)
+
+    def failure(self, sql_query: str, params: Optional[Dict], dialect) -> None:
+        """
+        记录执行失败的SQL
+        @param {str} sql_query - SQL语句
+        @param {Dict} params - 执行参数
+        @param dialect - 用于编译完整SQL的方言
+        """
+        if self.failure_enabled and self.logger.isEnabledFor(logging.ERROR) and self._sampled(self.failure_sample_rate):
+            lazy = LazySql(sql_query, params, dialect)
+            self.logger.error("执行失败: %s | 参数: %s | 执行结果: %s", sql_query, lazy.params, lazy)
+
+    def batch(self, sql_query: str, params_list: List[Dict], dialect, success: bool = True) -> None:
+        """
+        记录批量执行：只写一条汇总日志（行数 + 首行参数），不再逐行编译
+        @param {str} sql_query - SQL语句
+        @param {List[Dict]} params_list - 批量参数列表
+        @param dialect - 用于编译完整SQL的方言
+        @param {bool} success - 执行是否成功
+        """
+        if success:
+            if not (self.success_enabled and self.logger.isEnabledFor(logging.INFO) and self._sampled(self.success_sample_rate)):
+                return
+            level, label = logging.INFO, "批量执行成功"
+        else:
+            if not (self.failure_enabled and self.logger.isEnabledFor(logging.ERROR) and self._sampled(self.failure_sample_rate)):
+                return
+            level, label = logging.ERROR, "批量执行失败"
+        lazy = LazySql(sql_query, params_list[0] if params_list else None, dialect)
+        self.logger.log(level, "%s: %s | 行数: %d | 首行参数: %s | 首行执行结果: %s",
+                        label, sql_query, len(params_list), lazy.params, lazy)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        日志统计信息
+        @returns {Dict[str, int]} 入队、丢弃、采样跳过条数及当前队列长度
+        """
+        return {
+            "enqueued": self.queue_handler.enqueued,
+            "dropped": self.queue_handler.dropped,
+            "sampled_out": self.sampled_out,
+            "pending": self.queue_handler.queue.qsize(),
+        }
@@ -0,0 +1,80 @@
+import re
+from functools import lru_cache
+from typing import Tuple
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# 读语句中的表名：FROM / JOIN 之后的标识符
+_READ_TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+`?([A-Za-z_][\w$]*)`?(?:\.`?([A-Za-z_][\w$]*)`?)?", re.IGNORECASE)
+# 写语句中的表名：UPDATE / INSERT INTO / REPLACE INTO / DELETE FROM 之后的标识符
+_WRITE_TABLE_RE = re.compile(
+    r"\b(?:UPDATE|INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|DELETE\s+FROM|TRUNCATE\s+(?:TABLE\s+)?)\s*`?([A-Za-z_][\w$]*)`?(?:\.`?([A-Za-z_][\w$]*)`?)?",
+    re.IGNORECASE,
+)
+# 指纹化：字符串/数字字面量、各种风格的绑定参数统一替换为 ?
+_STRING_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL_RE = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s|\?|(?<!:):\w+")
+# IN (?, ?, ?) 及多行 VALUES (?, ?), (?, ?) 折叠成一个，参数个数不同的语句共用一个指纹
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_REPEATED_TUPLE_RE = re.compile(r"(\((?:\?\+|\?)\))(?:\s*,\s*\1)+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql_query: str) -> str:
+    """
+    规范化SQL语句：合并连续空白并去掉首尾空白及末尾分号
+    @param {str} sql_query - SQL语句
+    @returns {str} 规范化后的SQL
+    """
+    return _WHITESPACE_RE.sub(" ", sql_query).strip().rstrip(";").strip()
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql_query: str) -> str:
+    """
+    生成SQL指纹：去掉字面量与参数值，只保留语句结构，用于按语句类型聚合统计
+    如 "SELECT * FROM users WHERE id IN (%s, %s)" -> "select * from users where id in (?+)"
+    @param {str} sql_query - SQL语句（原始语句或驱动执行的语句均可）
+    @returns {str} 指纹
+    """
+    sql_query = normalize_sql(sql_query)
+    sql_query = _STRING_LITERAL_RE.sub("?", sql_query)
+    sql_query = _NUMBER_LITERAL_RE.sub("?", sql_query)
+    sql_query = _PARAM_RE.sub("?", sql_query)
+    sql_query = _LIST_RE.sub("(?+)", sql_query)
+    sql_query = _REPEATED_TUPLE_RE.sub(r"\1+", sql_query)
+    return sql_query.lower()
+
+
+def _collect_tables(pattern: re.Pattern, sql_query: str) -> Tuple[str, ...]:
+    tables = []
+    for schema_or_table, table in pattern.findall(sql_query):
+        name = (table or schema_or_table).lower()
+        if name not in tables:
+            tables.append(name)
+    return tuple(tables)
+
+
+@lru_cache(maxsize=1024)
+def extract_tables(sql_query: str) -> Tuple[str, ...]:
+    """
+    提取SQL语句涉及的所有表名（小写，去重，保持出现顺序）
+    @param {str} sql_query - SQL语句
+    @returns {Tuple[str, ...]} 表名元组
+    """
+    tables = list(_collect_tables(_WRITE_TABLE_RE, sql_query))
+    for name in _collect_tables(_READ_TABLE_RE, sql_query):
+        if name not in tables:
+            tables.append(name)
+    return tuple(tables)
+
+
+@lru_cache(maxsize=1024)
+def extract_write_tables(sql_query: str) -> Tuple[str, ...]:
+    """
+    提取写语句（UPDATE/INSERT/REPLACE/DELETE/TRUNCATE）修改的表名
+    @param {str} sql_query - SQL语句
+    @returns {Tuple[str, ...]} 被修改的表名元组
+    """
+    return _collect_tables(_WRITE_TABLE_RE, sql_query)
@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.sql.elements import TextClause
+
+
+class StatementCache:
+    """
+    预解析SQL语句缓存（有界LRU，线程安全）：按SQL字符串缓存 text() 生成的 TextClause
+    TextClause 执行时不会被修改，可在同步/异步服务及多线程间共享；同一个 TextClause 对象还能稳定命中
+    SQLAlchemy 引擎自带的编译缓存（compiled_cache），编译结果无需另行缓存
+    """
+
+    def __init__(self, maxsize: int = 512):
+        """
+        @param {int} maxsize - 最多缓存的SQL语句条数
+        """
+        self.maxsize = maxsize
+        self._texts: "OrderedDict[object, TextClause]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def text(self, sql_query: str, expanding: Tuple[str, ...] = ()) -> TextClause:
+        """
+        获取SQL语句对应的 TextClause，未命中时解析并缓存
+        @param {str} sql_query - SQL语句
+        @param {Tuple[str, ...]} expanding - 按列表展开的参数名（用于 IN :ids）
+        @returns {TextClause} 可直接传给 execute 的语句对象
+        """
+        key = (sql_query, expanding) if expanding else sql_query
+        with self._lock:
+            clause = self._texts.get(key)
+            if clause is not None:
+                self._texts.move_to_end(key)
+                self.hits += 1
+                return clause
+            self.misses += 1
+        clause = text(sql_query)
+        if expanding:
+            clause = clause.bindparams(*(bindparam(name, expanding=True) for name in expanding))
+        with self._lock:
+            self._texts[key] = clause
+            while len(self._texts) > self.maxsize:
+                self._texts.popitem(last=False)
+                self.evictions += 1
+        return clause
+
+    def clear(self) -> None:
+        with self._lock:
+            self._texts.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        缓存统计信息
+        @returns {Dict[str, int]} 条数、命中、未命中、淘汰次数
+        """
+        return {
+            "size": len(self._texts),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# 创建全局实例，同步与异步服务共享
+statement_cache = StatementCache()
@@ -0,0 +1,157 @@
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from fast_json import dumps
+
+Chunks = Union[Iterable[List[Dict]], AsyncIterable[List[Dict]]]
+
+
+def _ndjson_lines(chunk: List[Dict]) -> bytes:
+    return b"".join(dumps(row) + b"\n" for row in chunk)
+
+
+def _array_items(chunk: List[Dict], first: bool) -> bytes:
+    # 整块一次序列化后去掉首尾方括号
+    body = dumps(chunk)[1:-1]
+    return body if first else b"," + body
+
+
+def _encode(chunks: Chunks, array: bool):
+    """
+    把按块返回的行逐块编码为字节，同步迭代器返回同步生成器，异步迭代器返回异步生成器
+    """
+    if hasattr(chunks, "__aiter__"):
+        async def agen():
+            try:
+                first = True
+                if array:
+                    yield b"["
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    yield _array_items(chunk, first) if array else _ndjson_lines(chunk)
+                    first = False
+                if array:
+                    yield b"]"
+            finally:
+                # async for 不会关闭中途退出的迭代器，这里显式关闭
+                await _aclose(chunks)
+        return agen()
+
+    def gen():
+        first = True
+        if array:
+            yield b"["
+        for chunk in chunks:
+            if not chunk:
+                continue
+            yield _array_items(chunk, first) if array else _ndjson_lines(chunk)
+            first = False
+        if array:
+            yield b"]"
+    return gen()
+
+
+async def _aclose(chunks) -> None:
+    aclose = getattr(chunks, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+class Prefetched:
+    """
+    已取出第一块的按块迭代器；aclose 在迭代开始前调用同样会关闭原迭代器（普通的异步生成器未启动时关闭不会执行 finally）
+    """
+
+    def __init__(self, iterator: AsyncIterator[List[Dict]], first: Optional[List[Dict]]):
+        self._iterator = iterator
+        self._first = first
+        self._closed = first is None
+
+    def __aiter__(self) -> "Prefetched":
+        return self
+
+    async def __anext__(self) -> List[Dict]:
+        if self._closed:
+            raise StopAsyncIteration
+        if self._first is not None:
+            chunk, self._first = self._first, None
+            return chunk
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            # 读完或出错后原迭代器已结束，不必再关闭
+            self._closed = True
+            raise
+
+    async def aclose(self) -> None:
+        """
+        关闭原迭代器，归还连接及准入名额；可重复调用
+        """
+        if not self._closed:
+            self._closed = True
+            self._first = None
+            await _aclose(self._iterator)
+
+
+async def prefetch(chunks: AsyncIterable[List[Dict]]) -> Prefetched:
+    """
+    先取出第一块再返回迭代器：准入被拒绝（Overloaded）或查询出错会在这里抛出，接口能返回 503 / 500，
+    而不是在发送 200 响应头之后才出错、截断响应体
+    返回的迭代器占用着连接及准入名额，交给 ndjson_response / json_array_response 后由响应负责关闭（包括响应未开始发送、
+    客户端断开等情况）；不作为响应体时须自行调用 aclose
+    用法: return ndjson_response(await prefetch(server.stream_query(...)))
+    @param chunks - 异步的按块结果
+    @returns {Prefetched} 与原结果相同的按块迭代器
+    """
+    iterator = chunks.__aiter__()
+    try:
+        first = await iterator.__anext__()
+    except StopAsyncIteration:
+        first = None
+    return Prefetched(iterator, first)
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """
+    无论响应正常结束、发送出错、客户端断开还是被取消，结束时都关闭按块结果
+    （body_iterator 未开始迭代时其 finally 不会执行，不能只依赖编码生成器关闭）
+    """
+
+    def __init__(self, chunks: AsyncIterable[List[Dict]], array: bool, media_type: str):
+        super().__init__(_encode(chunks, array), media_type=media_type)
+        self._chunks = chunks
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            await _aclose(self._chunks)
+
+
+def _response(chunks: Chunks, array: bool, media_type: str) -> StreamingResponse:
+    if hasattr(chunks, "__aiter__"):
+        return _ClosingStreamingResponse(chunks, array, media_type)
+    return StreamingResponse(_encode(chunks, array), media_type=media_type)
+
+
+def ndjson_response(chunks: Chunks) -> StreamingResponse:
+    """
+    把 stream_query 的结果转换为 NDJSON 流式响应（每行一个JSON对象），内存占用与结果集大小无关
+    同步生成器会被 Starlette 放到线程池中迭代，不会阻塞事件循环
+    @param chunks - MySQLServer / ThreadedMySQLServer / AsyncMySQLServer.stream_query 的返回值
+    @returns {StreamingResponse} 流式响应
+    """
+    return _response(chunks, False, "application/x-ndjson")
+
+
+def json_array_response(chunks: Chunks) -> StreamingResponse:
+    """
+    把 stream_query 的结果转换为分块传输的JSON数组响应
+    @param chunks - MySQLServer / ThreadedMySQLServer / AsyncMySQLServer.stream_query 的返回值
+    @returns {StreamingResponse} 流式响应
+    """
+    return _response(chunks, True, "application/json")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 被测模块都在 python_project 根目录下，以模块名直接导入（与 benchmarks 相同）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from admission import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, AdaptiveLimiter, Overloaded
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_limit_grows_additively_when_busy_and_fast():
+    async def main():
+        limiter = AdaptiveLimiter("t", initial_limit=10, latency_target=0.1)
+        for _ in range(10):
+            await limiter.acquire(PRIORITY_HIGH)
+        for _ in range(10):
+            limiter.release(0.01)
+        assert 10 < limiter._limit < 11
+        assert limiter.in_flight == 0
+
+    run(main())
+
+
+def test_limit_does_not_grow_when_idle():
+    async def main():
+        limiter = AdaptiveLimiter("t", initial_limit=10, latency_target=0.1)
+        for _ in range(20):
+            await limiter.acquire(PRIORITY_HIGH)
+            limiter.release(0.01)
+        assert limiter._limit == 10
+
+    run(main())
+
+
+def test_limit_backs_off_once_per_window():
+    async def main():
+        limiter = AdaptiveLimiter("t", initial_limit=10, min_limit=2, latency_target=0.1, backoff=0.5)
+        for _ in range(3):
+            await limiter.acquire(PRIORITY_HIGH)
+        limiter.release(1.0)
+        assert limiter.limit == 5
+        # 同一个目标耗时窗口内的其他慢调用不再下调
+        limiter.release(1.0)
+        limiter.release(0.01, overloaded=True)
+        assert limiter.limit == 5
+        for _ in range(3):
+            await limiter.acquire(PRIORITY_HIGH)
+            limiter._last_drop = 0.0
+            limiter.release(0.01, overloaded=True)
+        assert limiter.limit == 2
+
+    run(main())
+
+
+def test_release_without_feedback_keeps_limit():
+    async def main():
+        limiter = AdaptiveLimiter("t", initial_limit=10, latency_target=0.1)
+        async with limiter.slot(PRIORITY_HIGH, feedback=False):
+            await asyncio.sleep(0.15)
+        assert limiter.limit == 10
+        assert limiter.latency_ewma is None
+        assert limiter.in_flight == 0
+
+    run(main())
+
+
+def test_low_priority_uses_only_its_share():
+    async def main():
+        limiter = AdaptiveLimiter("t", initial_limit=10, max_wait=0.01, priority_shares=(1.0, 0.9, 0.6))
+        for _ in range(6):
+            await limiter.acquire(PRIORITY_LOW)
+        with pytest.raises(Overloaded):
+            await limiter.acquire(PRIORITY_LOW)
+        await limiter.acquire(PRIORITY_HIGH)
+        assert limiter.in_flight == 7
+        assert limiter.timeouts == 1
+
+    run(main())
+
+
+def test_waiters_admitted_by_priority():
+    async def main():
+        limiter = AdaptiveLimiter("t", initial_limit=2, min_limit=1, max_wait=5, priority_shares=(1.0, 1.0, 1.0))
+        await limiter.acquire(PRIORITY_HIGH)
+        await limiter.acquire(PRIORITY_HIGH)
+        normal = asyncio.ensure_future(limiter.acquire(PRIORITY_NORMAL))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(limiter.acquire(PRIORITY_HIGH))
+        await asyncio.sleep(0)
+        assert limiter.queued == 2
+        limiter.release(0.01)
+        await asyncio.sleep(0)
+        assert high.done() and not normal.done()
+        limiter.release(0.01)
+        await asyncio.sleep(0)
+        assert normal.done()
+
+    run(main())
+
+
+def test_full_queue_evicts_lower_priority_waiter():
+    async def main():
+        limiter = AdaptiveLimiter("t", initial_limit=1, min_limit=1, max_wait=5, max_queue=1)
+        await limiter.acquire(PRIORITY_HIGH)
+        low = asyncio.ensure_future(limiter.acquire(PRIORITY_LOW))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(limiter.acquire(PRIORITY_HIGH))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await low
+        assert limiter.evicted == 1
+        limiter.release(0.01)
+        await high
+        assert limiter.in_flight == 1
+
+    run(main())
+
+
+def test_full_queue_rejects_same_priority():
+    async def main():
+        limiter = AdaptiveLimiter("t", initial_limit=1, min_limit=1, max_wait=5, max_queue=1)
+        await limiter.acquire(PRIORITY_NORMAL)
+        waiter = asyncio.ensure_future(limiter.acquire(PRIORITY_NORMAL))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as info:
+            await limiter.acquire(PRIORITY_NORMAL)
+        assert info.value.retry_after >= 1
+        limiter.release(0.01)
+        await waiter
+
+    run(main())
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from bulk import build_insert_sql, iter_chunks, packet_budget, primary_key_columns, value_size
+
+
+def _mysql(version):
+    dialect = mysql.pymysql.dialect()
+    dialect.server_version_info = version
+    return dialect
+
+
+def test_value_size_counts_utf8_bytes():
+    assert value_size("abc") == value_size("xyz")
+    # CJK 字符在 UTF-8 中占 3 字节
+    assert value_size("中文") - value_size("") == 6
+    assert value_size(b"\x00" * 10) > 10
+    assert value_size(memoryview(b"abcd")) == value_size(b"abcd")
+
+
+def test_iter_chunks_limits_by_bytes_not_characters():
+    rows = [("中" * 100,)] * 10
+    chunks = list(iter_chunks(rows, max_rows=100, max_bytes=1000))
+    # 每行约 300 字节，按字符数估算会把 10 行放进同一块
+    assert [len(c) for c in chunks] == [3, 3, 3, 1]
+    assert packet_budget(1000) < 1000
+
+
+def test_iter_chunks_respects_row_and_param_limits():
+    rows = [(i, i) for i in range(10)]
+    assert [len(c) for c in iter_chunks(rows, max_rows=4, max_bytes=10 ** 6)] == [4, 4, 2]
+    assert [len(c) for c in iter_chunks(rows, max_rows=100, max_bytes=10 ** 6, max_params=6)] == [3, 3, 3, 1]
+
+
+def test_upsert_sql_mysql_row_alias_by_version():
+    old = build_insert_sql("users", ["id", "name"], 1, _mysql((8, 0, 18)), ["name"])
+    assert old.endswith("ON DUPLICATE KEY UPDATE name = VALUES(name)")
+    new = build_insert_sql("users", ["id", "name"], 2, _mysql((8, 0, 32)), ["name"])
+    assert new == ("INSERT INTO users (id, name) VALUES (%s, %s), (%s, %s) AS new "
+                   "ON DUPLICATE KEY UPDATE name = new.name")
+
+
+def test_upsert_sql_on_conflict_requires_target():
+    for dialect in (sqlite.dialect(), postgresql.psycopg2.dialect()):
+        with pytest.raises(ValueError):
+            build_insert_sql("users", ["id", "name"], 1, dialect, ["name"])
+    sql = build_insert_sql("users", ["id", "name"], 1, sqlite.dialect(), ["name"], ["id"])
+    assert sql == "INSERT INTO users (id, name) VALUES (?, ?) ON CONFLICT (id) DO UPDATE SET name = excluded.name"
+
+
+def test_upsert_runs_on_sqlite():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO users VALUES (1, 'a')"))
+        assert primary_key_columns(conn, "users") == ["id"]
+        sql = build_insert_sql("users", ["id", "name"], 2, engine.dialect, ["name"], ["id"])
+        conn.exec_driver_sql(sql, (1, "b", 2, "c"))
+        assert conn.execute(text("SELECT id, name FROM users ORDER BY id")).all() == [(1, "b"), (2, "c")]
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from dataloader import DataLoader, request_memo
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Recorder:
+    """
+    记录每次批量加载收到的键，值为键的10倍，None 键缺失
+    """
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.calls.append(list(keys))
+        if self.fail:
+            raise RuntimeError("boom")
+        return {key: key * 10 for key in keys if key is not None}
+
+
+def test_loads_in_same_tick_share_one_batch():
+    async def main():
+        batch = Recorder()
+        loader = DataLoader("t", batch)
+        results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load(None))
+        assert results == [10, 20, 10, None]
+        assert batch.calls == [[1, 2, None]]
+        assert loader.stats()["shared"] == 1
+        # 批次完成即释放，不跨批次缓存
+        assert await loader.load(1) == 10
+        assert batch.calls == [[1, 2, None], [1]]
+
+    run(main())
+
+
+def test_max_batch_size_splits_batches():
+    async def main():
+        batch = Recorder()
+        loader = DataLoader("t", batch, max_batch_size=2)
+        assert await loader.load_many([1, 2, 3]) == [10, 20, 30]
+        assert batch.calls == [[1, 2], [3]]
+
+    run(main())
+
+
+def test_batch_error_reaches_every_caller():
+    async def main():
+        loader = DataLoader("t", Recorder(fail=True))
+        results = await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert loader.stats()["errors"] == 1
+
+    run(main())
+
+
+def test_request_memo_reuses_results_within_request():
+    async def main():
+        batch = Recorder()
+        loader = DataLoader("t", batch)
+        request_memo.set({})
+        assert await loader.load(1) == 10
+        assert await loader.load(1) == 10
+        assert batch.calls == [[1]]
+        assert loader.memo_hits == 1
+        # 写入后清除备忘，再读会重新查询
+        loader.clear(1)
+        assert await loader.load(1) == 10
+        assert batch.calls == [[1], [1]]
+
+    run(main())
+
+
+def test_request_memo_does_not_keep_failures():
+    async def main():
+        batch = Recorder(fail=True)
+        loader = DataLoader("t", batch)
+        request_memo.set({})
+        with pytest.raises(RuntimeError):
+            await loader.load(1)
+        batch.fail = False
+        assert await loader.load(1) == 10
+        assert len(batch.calls) == 2
+
+    run(main())
+
+
+def test_cancelled_caller_does_not_cancel_batch():
+    async def main():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow(keys):
+            started.set()
+            await release.wait()
+            return {key: key for key in keys}
+
+        loader = DataLoader("t", slow)
+        first = asyncio.ensure_future(loader.load(1))
+        second = asyncio.ensure_future(loader.load(1))
+        await started.wait()
+        first.cancel()
+        release.set()
+        assert await second == 1
+        assert first.cancelled()
+
+    run(main())
@@ -0,0 +1,74 @@
+import pytest
+
+from in_query import can_split, is_not_in, merge_rows, rewrite_for_temp_table, split_values, unique_values
+
+
+def test_split_values_pads_last_chunk_with_last_value():
+    chunks = split_values([1, 2, 3, 4, 5], 2)
+    assert chunks == [(1, 2), (3, 4), (5, 5)]
+    # 每块占位符个数相同
+    assert {len(chunk) for chunk in chunks} == {2}
+
+
+def test_split_values_single_chunk_not_padded():
+    assert split_values([1, 2, 3], 10) == [(1, 2, 3)]
+    assert split_values([1, 2, 3, 4], 2) == [(1, 2), (3, 4)]
+    assert split_values([], 10) == []
+
+
+def test_unique_values_keeps_order():
+    assert unique_values([3, 1, 3, 2, 1]) == [3, 1, 2]
+
+
+def test_merge_rows_keeps_chunk_order():
+    assert merge_rows(("id",), [[(1,), (2,)], [(3,)]]) == [(1,), (2,), (3,)]
+
+
+def test_merge_rows_dedupe():
+    # 补齐的重复值或关联查询在不同块中产生的相同行
+    parts = [[(1, "a"), (2, "b")], [(2, "b"), (3, "c")]]
+    assert merge_rows(("id", "name"), parts, dedupe=True) == [(1, "a"), (2, "b"), (3, "c")]
+
+
+def test_merge_rows_order_by_puts_none_last():
+    parts = [[(2, "b"), (None, "n")], [(1, "a")]]
+    assert merge_rows(("id", "name"), parts, order_by="id") == [(1, "a"), (2, "b"), (None, "n")]
+    assert merge_rows(("id", "name"), parts, order_by="-name") == [(None, "n"), (2, "b"), (1, "a")]
+
+
+def test_merge_rows_unknown_order_column():
+    with pytest.raises(ValueError):
+        merge_rows(("id",), [[(1,)]], order_by="name")
+
+
+def test_is_not_in():
+    assert is_not_in("SELECT * FROM users WHERE id NOT IN :ids", "ids")
+    assert not is_not_in("SELECT * FROM users WHERE id IN (:ids)", "ids")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM users WHERE id IN :ids",
+    "SELECT u.id, o.total FROM users u JOIN orders o ON o.user_id = u.id WHERE u.id IN :ids",
+])
+def test_can_split(sql):
+    assert can_split(sql, "ids")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM users WHERE id NOT IN :ids",
+    "SELECT * FROM users WHERE id IN :ids ORDER BY name",
+    "SELECT * FROM users WHERE id IN :ids LIMIT 10",
+    "SELECT COUNT(*) FROM users WHERE id IN :ids",
+    "SELECT status, SUM(amount) FROM orders WHERE user_id IN :ids GROUP BY status",
+    "SELECT DISTINCT status FROM orders WHERE user_id IN :ids",
+])
+def test_cannot_split_cross_value_queries(sql):
+    assert not can_split(sql, "ids")
+
+
+def test_rewrite_for_temp_table_numbers_each_occurrence():
+    sql, tables = rewrite_for_temp_table(
+        "SELECT * FROM a WHERE id IN :ids OR parent_id IN :ids", "ids", "tmp_in_values")
+    assert tables == ["tmp_in_values_0", "tmp_in_values_1"]
+    assert sql == ("SELECT * FROM a WHERE id IN (SELECT v FROM tmp_in_values_0) "
+                   "OR parent_id IN (SELECT v FROM tmp_in_values_1)")
@@ -0,0 +1,235 @@
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+from query_cache import MISS, AsyncQueryCache, MemoryCache, RedisQueryCache
+
+
+def test_memory_cache_invalidates_tagged_entries_only():
+    cache = MemoryCache()
+    cache.set("k1", 1, tables=("users",))
+    cache.set("k2", 2, tables=("orders",))
+    cache.set("k3", 3, tables=("users", "orders"))
+    assert cache.invalidate_tables(["users"]) == 2
+    assert cache.get("k1") is MISS
+    assert cache.get("k3") is MISS
+    assert cache.get("k2") == 2
+    # k3 也已从 orders 的标签中移除
+    assert cache.invalidate_tables(["orders"]) == 1
+
+
+def test_memory_cache_eviction_drops_tags():
+    cache = MemoryCache(maxsize=1)
+    cache.set("k1", 1, tables=("users",))
+    cache.set("k2", 2, tables=("orders",))
+    assert cache.get("k1") is MISS
+    assert cache.invalidate_tables(["users"]) == 0
+    assert cache.get("k2") == 2
+
+
+def test_memory_cache_caches_none():
+    cache = MemoryCache()
+    cache.set("k", None)
+    assert cache.get("k") is None
+    assert cache.get("other") is MISS
+
+
+@pytest.fixture
+def fake_server():
+    fakeredis = pytest.importorskip("fakeredis")
+    # 标签登记使用 Lua 脚本
+    pytest.importorskip("lupa")
+    return fakeredis.FakeServer()
+
+
+def test_async_cache_invalidates_by_tag_and_publishes(fake_server):
+    import fakeredis
+
+    async def main():
+        client = fakeredis.aioredis.FakeRedis(server=fake_server)
+        cache = AsyncQueryCache(client)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(cache.channel)
+        await pubsub.get_message(timeout=1)
+
+        await cache.set("k1", [{"id": 1, "balance": Decimal("2.50")}], tables=("users",))
+        await cache.set("k2", 2, tables=("orders",))
+        assert await cache.get("k1") == [{"id": 1, "balance": Decimal("2.50")}]
+        # 缓存值只含数据（JSON），不是 pickle
+        json.loads(await client.get("qc:k1"))
+        assert await cache.invalidate_tables(["users"]) == 1
+        assert await cache.get("k1") is MISS
+        assert await cache.get("k2") == 2
+        assert not await client.exists("qc:tag:users")
+
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+        assert message["data"] == b'["users"]'
+        await pubsub.aclose()
+
+    asyncio.run(main())
+
+
+def test_async_cache_falls_back_when_redis_unavailable(fake_server):
+    import fakeredis
+
+    fake_server.connected = False
+
+    async def main():
+        cache = AsyncQueryCache(fakeredis.aioredis.FakeRedis(server=fake_server))
+        await cache.set("k", 1, tables=("users",))
+        assert await cache.get("k") == 1
+        assert await cache.invalidate_tables(["users"]) == 1
+        assert await cache.get("k") is MISS
+        assert cache.stats()["errors"] > 0
+
+    asyncio.run(main())
+
+
+def test_tag_ttl_is_only_extended(fake_server):
+    import fakeredis
+
+    client = fakeredis.FakeRedis(server=fake_server)
+    cache = RedisQueryCache(client)
+    cache.set("long", 1, ttl=100, tables=("users",))
+    cache.set("short", 2, ttl=5, tables=("users",))
+    # 标签集合不能先于其中TTL最长的条目过期
+    assert client.ttl("qc:tag:users") > 100
+    assert cache.invalidate_tables(["users"]) == 2
+
+
+def test_sync_and_async_caches_share_entries(fake_server):
+    import fakeredis
+
+    sync_cache = RedisQueryCache(fakeredis.FakeRedis(server=fake_server))
+
+    async def main():
+        async_cache = AsyncQueryCache(fakeredis.aioredis.FakeRedis(server=fake_server))
+        sync_cache.set("k", {"id": 1}, tables=("users",))
+        assert await async_cache.get("k") == {"id": 1}
+        assert await async_cache.invalidate_tables(["users"]) == 1
+
+    asyncio.run(main())
+    assert sync_cache.get("k") is MISS
+
+
+def test_sync_cache_falls_back_when_redis_unavailable(fake_server):
+    import fakeredis
+
+    fake_server.connected = False
+    cache = RedisQueryCache(fakeredis.FakeRedis(server=fake_server))
+    cache.set("k", 1, tables=("users",))
+    assert cache.get("k") == 1
+    assert cache.invalidate_tables(["users"]) == 1
+    assert cache.get("k") is MISS
+    assert cache.stats()["errors"] > 0
+
+
+def test_memory_cache_skips_set_after_invalidation():
+    cache = MemoryCache()
+    generation = cache.generation(("users",))
+    cache.invalidate_tables(["users"])
+    assert cache.set("k", "stale", tables=("users",), generation=generation) is False
+    assert cache.get("k") is MISS
+    # 其他表的失效不影响写入
+    generation = cache.generation(("users",))
+    cache.invalidate_tables(["orders"])
+    assert cache.set("k", "fresh", tables=("users",), generation=generation) is True
+    assert cache.get("k") == "fresh"
+    # clear（订阅重连后）使之前取出的代数全部作废
+    generation = cache.generation(("users",))
+    cache.clear()
+    assert cache.set("k", "stale", tables=("users",), generation=generation) is False
+    assert cache.stats()["stale_sets"] == 2
+
+
+def test_redis_caches_skip_set_after_invalidation(fake_server):
+    import fakeredis
+
+    sync_cache = RedisQueryCache(fakeredis.FakeRedis(server=fake_server))
+    generation = sync_cache.generation(("users",))
+    sync_cache.invalidate_tables(["users"])
+    sync_cache.set("k", "stale", tables=("users",), generation=generation)
+    assert sync_cache.get("k") is MISS
+    generation = sync_cache.generation(("users",))
+    sync_cache.set("k", "fresh", tables=("users",), generation=generation)
+    assert sync_cache.get("k") == "fresh"
+    assert sync_cache.stats()["stale_sets"] == 1
+
+    async def main():
+        async_cache = AsyncQueryCache(fakeredis.aioredis.FakeRedis(server=fake_server))
+        generation = await async_cache.generation(("users",))
+        # 另一进程的写操作同样使代数变化
+        sync_cache.invalidate_tables(["users"])
+        await async_cache.set("k", "stale", tables=("users",), generation=generation)
+        assert await async_cache.get("k") is MISS
+        generation = await async_cache.generation(())
+        await async_cache.set("k", "no tables", generation=generation)
+        assert await async_cache.get("k") == "no tables"
+        assert async_cache.stats()["stale_sets"] == 1
+
+    asyncio.run(main())
+
+
+def test_read_through_does_not_recache_stale_rows(tmp_path):
+    from sqlalchemy import event
+
+    from database import MySQLServer
+
+    server = MySQLServer(f"sqlite:///{tmp_path / 'rt.db'}", cache=MemoryCache())
+    server.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    server.execute("INSERT INTO users (id, name) VALUES (1, 'old')")
+    sql = "SELECT name FROM users WHERE id = :id"
+    selects = []
+
+    def concurrent_write(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT"):
+            selects.append(statement)
+            if len(selects) == 1:
+                # 读到旧值之后、写缓存之前，另一个请求的写操作提交并使缓存失效
+                server._invalidate_tables(("users",))
+
+    event.listen(server.engine, "after_cursor_execute", concurrent_write)
+    assert server.get_var(sql, {"id": 1}, cache_ttl=60) == "old"
+    assert server.cache.stats()["stale_sets"] == 1
+    assert server.get_var(sql, {"id": 1}, cache_ttl=60) == "old"
+    assert server.get_var(sql, {"id": 1}, cache_ttl=60) == "old"
+    assert len(selects) == 2
+
+
+def test_coalesced_read_uses_leader_generation(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from async_database import AsyncMySQLServer
+
+    async def main():
+        server = AsyncMySQLServer(f"sqlite+aiosqlite:///{tmp_path / 'rt.db'}", cache=AsyncQueryCache(),
+                                  single_flight=True)
+        await server.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        await server.execute("INSERT INTO users (id, name) VALUES (1, 'old')")
+        sql = "SELECT name FROM users WHERE id = :id"
+        release = asyncio.Event()
+        fetch_var = server._fetch_var
+
+        async def slow_fetch_var(*args):
+            value = await fetch_var(*args)
+            await release.wait()
+            return value
+
+        server._fetch_var = slow_fetch_var
+        try:
+            leader = asyncio.ensure_future(server.get_var(sql, {"id": 1}, cache_ttl=60))
+            await asyncio.sleep(0.05)
+            # 查询开始之后写操作提交，随后的请求合并到已读到旧值的查询上
+            await server._invalidate_tables(("users",))
+            waiter = asyncio.ensure_future(server.get_var(sql, {"id": 1}, cache_ttl=60))
+            await asyncio.sleep(0)
+            release.set()
+            assert await asyncio.gather(leader, waiter) == ["old", "old"]
+            assert server.single_flight.stats()["saved"] == 1
+            assert server.cache.stats()["sets"] == 0
+            assert server.cache.stats()["stale_sets"] == 2
+        finally:
+            await server.engine.dispose()
+
+    asyncio.run(main())
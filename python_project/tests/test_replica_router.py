@@ -0,0 +1,134 @@
+import threading
+
+from sqlalchemy import create_engine, text
+
+from database import MySQLServer
+from query_cache import MemoryCache
+from replica_router import Replica, ReplicaRouter
+
+
+def make_router(n=3, **kwargs):
+    replicas = [Replica(f"sqlite:///replica{i}.db", lambda: None, lambda engine: None) for i in range(n)]
+    return ReplicaRouter(replicas, **kwargs), replicas
+
+
+def test_round_robin_cycles_through_replicas():
+    router, replicas = make_router()
+    picked = []
+    for _ in range(6):
+        replica = router.acquire()
+        picked.append(replica)
+        router.release(replica)
+    assert picked == replicas + replicas
+    assert router.routed == 6
+    assert all(r.in_flight == 0 for r in replicas)
+
+
+def test_least_connections_picks_least_busy_replica():
+    router, replicas = make_router(balance="least_connections")
+    first = router.acquire()
+    second = router.acquire()
+    assert first is replicas[0] and second is replicas[1]
+    router.release(first)
+    # replicas[0] 与 replicas[2] 都空闲，取第一个
+    assert router.acquire() is replicas[0]
+    assert router.acquire() is replicas[2]
+    assert [r.in_flight for r in replicas] == [1, 1, 1]
+
+
+def test_lag_ejects_and_recovers_replica():
+    router, replicas = make_router(2, max_lag=5.0)
+    router.update_lag(replicas[0], 10.0)
+    assert replicas[0].ejected
+    for _ in range(3):
+        replica = router.acquire()
+        assert replica is replicas[1]
+        router.release(replica)
+
+    router.update_lag(replicas[0], None, "replication stopped")
+    assert replicas[0].ejected and replicas[0].last_error == "replication stopped"
+
+    router.update_lag(replicas[0], 1.0)
+    assert not replicas[0].ejected and replicas[0].last_error is None
+    picked = set()
+    for _ in range(2):
+        replica = router.acquire()
+        picked.add(replica)
+        router.release(replica)
+    assert picked == set(replicas)
+
+
+def test_falls_back_when_all_replicas_ejected():
+    router, replicas = make_router(2)
+    for replica in replicas:
+        router.update_lag(replica, None, "down")
+    assert router.acquire() is None
+    assert router.fallbacks == 1 and router.routed == 0
+
+
+def make_databases(tmp_path):
+    urls = {}
+    for name in ("primary", "replica"):
+        url = f"sqlite:///{tmp_path / name}.db"
+        engine = create_engine(url)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE node (name TEXT)"))
+            conn.execute(text("INSERT INTO node VALUES (:name)"), {"name": name})
+        engine.dispose()
+        urls[name] = url
+    return urls
+
+
+def make_server(tmp_path, **kwargs):
+    urls = make_databases(tmp_path)
+    return MySQLServer(urls["primary"], replica_urls=[urls["replica"]], lag_probe=lambda conn: 0.0, **kwargs)
+
+
+def test_reads_go_to_replica_unless_use_primary(tmp_path):
+    server = make_server(tmp_path)
+    assert server.get_var("SELECT name FROM node") == "replica"
+    assert server.get_var("SELECT name FROM node", use_primary=True) == "primary"
+    assert server.query("SELECT name FROM node", use_primary=True) == [{"name": "primary"}]
+    assert server.router.routed == 1
+
+
+def test_use_primary_bypasses_query_cache(tmp_path):
+    server = make_server(tmp_path, cache=MemoryCache())
+    assert server.get_var("SELECT name FROM node", cache_ttl=60) == "replica"
+    assert server.get_var("SELECT name FROM node", cache_ttl=60, use_primary=True) == "primary"
+    assert server.get_var("SELECT name FROM node", cache_ttl=60) == "replica"
+
+
+def test_lagging_replica_falls_back_to_primary(tmp_path):
+    lag = {"value": 60.0}
+    urls = make_databases(tmp_path)
+    server = MySQLServer(urls["primary"], replica_urls=[urls["replica"]], lag_probe=lambda conn: lag["value"])
+    server.check_replica_lag()
+    assert server.get_var("SELECT name FROM node") == "primary"
+    assert server.router.fallbacks == 1
+
+    lag["value"] = 0.0
+    server.check_replica_lag()
+    assert server.get_var("SELECT name FROM node") == "replica"
+
+
+def test_lag_probe_runs_off_the_request(tmp_path):
+    probing = threading.Event()
+    release = threading.Event()
+
+    def slow_probe(conn):
+        probing.set()
+        release.wait(5)
+        return 0.0
+
+    urls = make_databases(tmp_path)
+    server = MySQLServer(urls["primary"], replica_urls=[urls["replica"]], lag_probe=slow_probe)
+    try:
+        # 探测阻塞时请求照常返回
+        assert server.get_var("SELECT name FROM node") == "replica"
+        assert probing.wait(5)
+        assert server._lag_thread.is_alive()
+    finally:
+        release.set()
+    server._lag_thread.join(5)
+    assert not server._lag_thread.is_alive()
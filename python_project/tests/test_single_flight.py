@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from single_flight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_identical_calls_execute_once():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"id": 1}
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(10)))
+        assert calls == 1
+        assert all(r is results[0] for r in results)
+        assert flight.stats() == {"calls": 10, "executions": 1, "saved": 9, "errors": 0, "inflight": 0}
+
+    run(main())
+
+
+def test_error_reaches_every_waiter():
+    async def main():
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.errors == 1
+        assert flight.stats()["inflight"] == 0
+
+    run(main())
+
+
+def test_cancelled_waiter_does_not_cancel_others():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return 42
+
+        first = asyncio.ensure_future(flight.do("k", fetch))
+        second = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == 42
+        assert first.cancelled()
+
+    run(main())
+
+
+def test_key_cleared_after_completion():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flight.do("k", fetch) == 1
+        # 完成后不再共享，之后的调用重新执行
+        assert await flight.do("k", fetch) == 2
+        assert flight.stats()["saved"] == 0
+        assert flight.stats()["inflight"] == 0
+
+    run(main())
+
+
+def test_server_coalesces_identical_reads_on_sqlite(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from async_database import AsyncMySQLServer
+
+    async def main():
+        server = AsyncMySQLServer(f"sqlite+aiosqlite:///{tmp_path / 'sf.db'}", single_flight=True)
+        await server.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        await server.execute("INSERT INTO users (id, name) VALUES (1, 'a')")
+        statements = []
+        event.listen(server.engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, sql, *args: statements.append(sql))
+        try:
+            results = await asyncio.gather(
+                *(server.query("SELECT * FROM users WHERE id = :id", {"id": 1}) for _ in range(8)))
+            assert results == [[{"id": 1, "name": "a"}]] * 8
+            assert len([s for s in statements if s.startswith("SELECT")]) == 1
+            assert server.single_flight.stats()["saved"] == 7
+        finally:
+            await server.engine.dispose()
+
+    run(main())
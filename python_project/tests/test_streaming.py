@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from streaming import json_array_response, ndjson_response, prefetch
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Source:
+    """
+    模拟 stream_query：记录是否被关闭（归还连接及准入名额）
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    async def stream(self):
+        try:
+            for chunk in self.chunks:
+                yield chunk
+        finally:
+            self.closed = True
+
+
+SCOPE = {"type": "http", "asgi": {"spec_version": "2.4"}}
+
+
+async def receive():
+    return {"type": "http.disconnect"}
+
+
+def test_prefetch_closes_source_when_never_iterated():
+    async def main():
+        source = Source([[{"id": 1}], [{"id": 2}]])
+        chunks = await prefetch(source.stream())
+        assert not source.closed
+        await chunks.aclose()
+        assert source.closed
+
+    run(main())
+
+
+def test_response_streams_rows_and_closes_source():
+    async def main():
+        source = Source([[{"id": 1}], [], [{"id": 2}, {"id": 3}]])
+        response = json_array_response(await prefetch(source.stream()))
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await response(SCOPE, receive, send)
+        body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+        assert body == b'[{"id":1},{"id":2},{"id":3}]'
+        assert source.closed
+
+    run(main())
+
+
+def test_response_closes_source_when_client_disconnects_before_start():
+    async def main():
+        source = Source([[{"id": 1}], [{"id": 2}]])
+        response = ndjson_response(await prefetch(source.stream()))
+
+        async def send(message):
+            raise OSError("connection reset")
+
+        with pytest.raises(Exception):
+            await response(SCOPE, receive, send)
+        assert source.closed
+
+    run(main())
+
+
+def test_response_closes_source_when_client_disconnects_mid_stream():
+    async def main():
+        source = Source([[{"id": i}] for i in range(5)])
+        response = ndjson_response(await prefetch(source.stream()))
+        sent = []
+
+        async def send(message):
+            if len(sent) == 2:
+                raise OSError("connection reset")
+            sent.append(message)
+
+        with pytest.raises(Exception):
+            await response(SCOPE, receive, send)
+        assert source.closed
+
+    run(main())
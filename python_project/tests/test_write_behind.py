@@ -0,0 +1,135 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from write_behind import MemoryStore, RedisStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class FakeRedisServer:
+    """
+    只提供 RedisStore 用到的 get_redis / pipeline 的 AsyncRedisServer 替身，后端为 fakeredis
+    """
+
+    def __init__(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        # 刷写锁的续期、释放使用 Lua 脚本
+        pytest.importorskip("lupa")
+        self.redis = fakeredis.aioredis.FakeRedis()
+
+    @asynccontextmanager
+    async def get_redis(self):
+        yield self.redis
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = True):
+        async with self.redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+
+
+def test_memory_store_merges_same_key():
+    async def main():
+        store = MemoryStore()
+        assert await store.put(1, {"name": "a", "age": 1}) is False
+        assert await store.put(1, {"name": "b"}) is True
+        assert await store.put(2, {"age": 5}) is False
+        assert store.pending == 2
+        assert await store.take() == {1: {"name": "b", "age": 1}, 2: {"age": 5}}
+        # 已取出未刷写完成的行仍计入 pending
+        assert store.pending == 2
+        await store.done()
+        assert store.pending == 0
+        assert await store.take() == {}
+
+    run(main())
+
+
+def test_memory_store_failed_keeps_newer_updates():
+    async def main():
+        store = MemoryStore()
+        await store.put(1, {"name": "a", "age": 1})
+        await store.take()
+        # 刷写期间的新更新
+        await store.put(1, {"name": "b"})
+        await store.put(2, {"age": 2})
+        await store.failed()
+        assert store.pending == 2
+        assert await store.take() == {1: {"name": "b", "age": 1}, 2: {"age": 2}}
+
+    run(main())
+
+
+def test_redis_store_merges_and_round_trips_values():
+    server = FakeRedisServer()
+
+    async def main():
+        store = RedisStore(server, "wb:users")
+        created = datetime(2024, 1, 2, 3, 4, 5)
+        assert await store.put(1, {"name": "a", "balance": Decimal("1.10")}) is False
+        assert await store.put(1, {"name": "b"}) is True
+        assert await store.put(2, {"created_at": created}) is False
+        rows = await store.take()
+        assert rows == {1: {"name": "b", "balance": Decimal("1.10")}, 2: {"created_at": created}}
+        assert store.pending == 2
+        await store.done()
+        assert store.pending == 0
+        assert await store.take() == {}
+        assert not await server.redis.exists("wb:users:lock", "wb:users:name:flushing")
+
+    run(main())
+
+
+def test_redis_store_retries_failed_batch_before_newer_updates():
+    server = FakeRedisServer()
+
+    async def main():
+        store = RedisStore(server, "wb:users")
+        await store.put(1, {"name": "a"})
+        assert await store.take() == {1: {"name": "a"}}
+        await store.put(1, {"name": "b"})
+        await store.failed()
+        # 失败的一批与之后的新更新都计入 pending
+        assert store.pending == 2
+        # 先重试失败的一批，新更新在下一次刷写，按主键后写覆盖保持先后顺序
+        assert await store.take() == {1: {"name": "a"}}
+        await store.done()
+        assert await store.take() == {1: {"name": "b"}}
+        await store.done()
+        assert store.pending == 0
+
+    run(main())
+
+
+def test_redis_store_skips_while_other_process_holds_lock():
+    server = FakeRedisServer()
+
+    async def main():
+        store = RedisStore(server, "wb:users")
+        await store.put(1, {"name": "a"})
+        await server.redis.set("wb:users:lock", "other")
+        assert await store.take() == {}
+        assert await server.redis.get("wb:users:lock") == b"other"
+
+    run(main())
+
+
+def test_redis_store_done_keeps_lock_taken_over_by_other_process():
+    server = FakeRedisServer()
+
+    async def main():
+        store = RedisStore(server, "wb:users")
+        await store.put(1, {"name": "a"})
+        await store.take()
+        # 刷写锁过期后被其他进程取得
+        await server.redis.set("wb:users:lock", "other")
+        await store.done()
+        assert await server.redis.get("wb:users:lock") == b"other"
+        assert await server.redis.hgetall("wb:users:name:flushing")
+
+    run(main())
@@ -0,0 +1,222 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from database import MySQLServer
+from admission import AdaptiveLimiter
+from dataloader import DataLoader, row_loader
+from in_query import DEFAULT_IN_CHUNK_SIZE
+from profiler import call_in_span, span
+
+
+class ThreadedMySQLServer:
+    """
+    MySQLServer 的异步包装：所有阻塞的数据库调用放到专用的有界线程池中执行，不再阻塞事件循环
+    线程数默认等于SQLAlchemy连接池容量（pool_size + max_overflow），线程不会多于可用连接
+    """
+
+    def __init__(self, server: MySQLServer, max_workers: Optional[int] = None,
+                 admission: Optional[AdaptiveLimiter] = None):
+        """
+        @param {MySQLServer} server - 同步数据库服务实例
+        @param {int} max_workers - 线程池大小，默认按连接池容量计算
+        @param {AdaptiveLimiter} admission - 准入控制，传入后调用先申请并发名额，过载时抛出 Overloaded 而不是在连接池上排队
+        """
+        self.server = server
+        self.admission = admission
+        # 线程池在第一次调用时创建，导入时不触发引擎创建
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.queued = 0
+        self.active = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # 按键批量加载器，见 loader()
+        self.loaders: Dict[str, DataLoader] = {}
+
+    @property
+    def max_workers(self) -> int:
+        if self._max_workers is None:
+            pool = self.server.engine.pool
+            size = pool.size() if hasattr(pool, "size") else 5
+            self._max_workers = size + max(getattr(pool, "_max_overflow", 0), 0)
+        return self._max_workers
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mysql-worker")
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        在线程池中执行任意阻塞函数，并记录排队深度与等待时间
+        @param {Callable} fn - 阻塞函数
+        @returns {Any} 函数返回值
+        @throws {Overloaded} 配置了准入控制且数据库过载
+        """
+        if self.admission is not None:
+            async with self.admission.slot():
+                return await self._run(fn, *args, **kwargs)
+        return await self._run(fn, *args, **kwargs)
+
+    async def _run(self, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted_at = time.perf_counter()
+        # run_in_executor 不会传递 contextvars，这里手动复制上下文
+        context = contextvars.copy_context()
+        name = f"threadpool.{getattr(fn, '__name__', 'call')}"
+        with self._lock:
+            self.submitted += 1
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+        def call():
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                # 被分析的请求在工作线程中的栈挂在 [threadpool.函数名] 下
+                return context.run(call_in_span, name, partial(fn, *args, **kwargs))
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        # 排队等待工作线程的时间记在 [threadpool] 下
+        with span("threadpool"):
+            return await loop.run_in_executor(self.executor, call)
+
+    async def query(self, *args, **kwargs):
+        return await self.run(self.server.query, *args, **kwargs)
+
+    async def get_row(self, *args, **kwargs):
+        return await self.run(self.server.get_row, *args, **kwargs)
+
+    async def get_var(self, *args, **kwargs):
+        return await self.run(self.server.get_var, *args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self.run(self.server.execute, *args, **kwargs)
+
+    async def executemany(self, *args, **kwargs):
+        return await self.run(self.server.executemany, *args, **kwargs)
+
+    async def insert_id(self, *args, **kwargs):
+        return await self.run(self.server.insert_id, *args, **kwargs)
+
+    async def query_in(self, *args, **kwargs):
+        return await self.run(self.server.query_in, *args, **kwargs)
+
+    def loader(self, table: str, key: str = "id", columns: str = "*", batch_window: float = 0.0,
+               max_batch_size: int = DEFAULT_IN_CHUNK_SIZE) -> DataLoader:
+        """
+        按键批量加载整行的 DataLoader（同表同键同列共用一个实例）：并发的 load(id) 合并为一条 WHERE key IN 查询，
+        在线程池中只占用一次数据库调用
+        用法: row = await threaded_sql_server.loader("users").load(user_id)
+        @param {str} table - 表名
+        @param {str} key - 键列名
+        @param {str} columns - 查询列，必须包含键列
+        @param {float} batch_window - 攒批等待秒数，0表示只合并同一事件循环轮次内的调用
+        @param {int} max_batch_size - 每批最多键数
+        @returns {DataLoader} 批量加载器
+        """
+        name = f"{table}.{key}:{columns}"
+        loader = self.loaders.get(name)
+        if loader is None:
+            loader = row_loader(name, self.query_in, table, key, columns,
+                                max_batch_size=max_batch_size, batch_window=batch_window)
+            self.loaders[name] = loader
+        return loader
+
+    async def seek_page(self, *args, **kwargs):
+        return await self.run(self.server.seek_page, *args, **kwargs)
+
+    async def count_rows(self, *args, **kwargs):
+        return await self.run(self.server.count_rows, *args, **kwargs)
+
+    async def paginate(self, *args, **kwargs):
+        return await self.run(self.server.paginate, *args, **kwargs)
+
+    async def bulk_insert(self, *args, **kwargs):
+        return await self.run(self.server.bulk_insert, *args, **kwargs)
+
+    async def bulk_upsert(self, *args, **kwargs):
+        return await self.run(self.server.bulk_upsert, *args, **kwargs)
+
+    async def run_in_transaction(self, fn: Callable, *args, isolation_level: Optional[str] = None, **kwargs) -> Any:
+        """
+        在线程池中以一个事务执行多条语句：fn(tx, *args, **kwargs) 中通过 tx 执行的语句共用一个连接、一次提交
+        @param {Callable} fn - 接收 Transaction 的同步函数
+        @param {str} isolation_level - 事务隔离级别
+        @returns {Any} fn 的返回值
+        """
+        def call():
+            with self.server.transaction(isolation_level=isolation_level) as tx:
+                return fn(tx, *args, **kwargs)
+
+        return await self.run(call)
+
+    async def page_and_size(self, *args, **kwargs):
+        # 纯计算，不访问数据库，直接在事件循环中执行
+        return self.server.page_and_size(*args, **kwargs)
+
+    async def stream_query(self, *args, **kwargs) -> AsyncIterator[List[Dict]]:
+        """
+        流式查询：同步生成器的每一块都在专用线程池中取出（不使用 Starlette 的默认线程池），
+        整个迭代期间占用一个准入名额（占用时长取决于客户端下载速度，不计入耗时反馈）
+        作为响应体时先用 streaming.prefetch 取出第一块，使准入被拒绝或查询出错时在发送响应头之前抛出
+        @returns {AsyncIterator[List[Dict]]} 逐块产出的结果列表
+        @throws {Overloaded} 配置了准入控制且数据库过载
+        """
+        async with (self.admission.slot(feedback=False) if self.admission is not None else nullcontext()):
+            chunks = self.server.stream_query(*args, **kwargs)
+            try:
+                while True:
+                    chunk = await self._run(next, chunks, None)
+                    if chunk is None:
+                        break
+                    yield chunk
+            finally:
+                # 客户端中途断开时同样在线程池中关闭生成器，释放服务端游标及连接
+                await self._run(chunks.close)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        关闭线程池
+        @param {bool} wait - 是否等待已提交的任务执行完
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        线程池统计
+        @returns {Dict[str, Any]} 线程数、提交/完成数、当前排队与执行数、最大排队深度、平均/最大等待毫秒
+        """
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "max_workers": self.max_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "queued": self.queued,
+                "active": self.active,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_ms": round(self.total_wait / started * 1000, 3) if started else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
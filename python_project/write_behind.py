@@ -0,0 +1,455 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from logging.handlers import TimedRotatingFileHandler
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from admission import Overloaded
+from bulk import build_case_update_sql, max_params_for
+from fast_json import decode_value, encode_value
+from in_query import split_values
+from metrics import metrics
+from pagination import check_identifier
+
+# 日志配置
+log_handler = TimedRotatingFileHandler(
+    'write_behind_log.log', when='midnight', interval=1, backupCount=7, encoding='utf-8'
+)
+log_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', '%Y-%m-%d %H:%M:%S'))
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+logger.addHandler(log_handler)
+
+WRITE_BEHIND_UPDATES = metrics.counter("write_behind_updates_total", "写入缓冲的更新次数", ("table",))
+WRITE_BEHIND_COALESCED = metrics.counter(
+    "write_behind_coalesced_total", "与缓冲中同主键的更新合并（未单独执行）的更新次数", ("table",))
+WRITE_BEHIND_FLUSH_SECONDS = metrics.histogram("write_behind_flush_seconds", "一次刷写的耗时", ("table",))
+WRITE_BEHIND_FLUSH_ROWS = metrics.histogram(
+    "write_behind_flush_rows", "一次刷写的行数", ("table",), buckets=(1, 10, 50, 100, 500, 1000, 5000, 10000, 50000))
+WRITE_BEHIND_FLUSH_ERRORS = metrics.counter("write_behind_flush_errors_total", "刷写失败次数", ("table",))
+
+Rows = Dict[Hashable, Dict[str, Any]]
+
+# 刷写锁只能由持有者续期、释放：值为持有者的随机令牌，比较一致后才操作（锁已过期被其他进程取得时不动它的锁和数据）
+# KEYS[1] 为锁，释放时其余 KEYS 为要一并删除的 :flushing 哈希
+_LOCK_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', unpack(KEYS))
+end
+return 0
+"""
+_LOCK_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class MemoryStore:
+    """
+    进程内写入缓冲：{主键: {列: 值}}，进程退出前未刷写的更新会丢失
+    """
+
+    def __init__(self):
+        self._rows: Rows = {}
+        self._flushing: Rows = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows) + len(self._flushing)
+
+    async def put(self, key: Hashable, values: Dict[str, Any]) -> bool:
+        """
+        @returns {bool} 是否与缓冲中同主键的更新合并
+        """
+        row = self._rows.get(key)
+        if row is None:
+            self._rows[key] = dict(values)
+            return False
+        row.update(values)
+        return True
+
+    async def take(self) -> Rows:
+        """
+        取出全部待刷写的行，刷写成功后调用 done，失败后调用 failed
+        """
+        self._flushing, self._rows = self._rows, {}
+        return self._flushing
+
+    async def done(self) -> None:
+        self._flushing = {}
+
+    async def failed(self) -> None:
+        # 放回缓冲，取出之后的新更新优先
+        for key, values in self._flushing.items():
+            self._rows[key] = {**values, **self._rows.get(key, {})}
+        self._flushing = {}
+
+
+class RedisStore:
+    """
+    基于 AsyncRedisServer 的写入缓冲，进程崩溃或重启后未刷写的更新仍保留在Redis中
+    每列一个哈希 {namespace}:{列} 存 主键 -> 值（HSET 天然按主键、按列后写覆盖），{namespace}:columns 记录出现过的列；
+    刷写时在一个事务中把各列哈希改名为 :flushing 后读出，数据库提交成功才删除，失败或进程中断时下次刷写先重试这批
+    多个工作进程共用同一个 namespace 时，通过 {namespace}:lock 保证同一时间只有一个进程在刷写：
+    锁的值为本次刷写的随机令牌，刷写期间每 lock_timeout/3 秒续期一次，续期及释放都先比较令牌
+    """
+
+    def __init__(self, redis_server, namespace: str, lock_timeout: float = 30.0):
+        """
+        @param {AsyncRedisServer} redis_server - Redis服务
+        @param {str} namespace - 键前缀，如 write_behind:users
+        @param {float} lock_timeout - 刷写锁过期秒数（持有锁的进程中断后，其他进程最多等待该时间后接手）
+        """
+        self.redis_server = redis_server
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        # 本进程自上次取出后写入的更新数 + 已取出但尚未刷写成功的行数（近似的缓冲行数，用于背压，不额外访问Redis）
+        self._pending = 0
+        self._flushing = 0
+        self._token: Optional[str] = None
+        self._flushing_keys: List[str] = []
+        self._renew_task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending + self._flushing
+
+    def _key(self, column: str) -> str:
+        return f"{self.namespace}:{column}"
+
+    async def put(self, key: Hashable, values: Dict[str, Any]) -> bool:
+        field = encode_value(key)
+        async with self.redis_server.pipeline(transaction=True) as pipe:
+            for column, value in values.items():
+                pipe.hset(self._key(column), field, encode_value(value))
+            pipe.sadd(self._key("columns"), *values.keys())
+            added = await pipe.execute()
+        self._pending += 1
+        # HSET 返回新增的字段数，全部为0说明该主键的这些列已在缓冲中
+        return not any(added[:len(values)])
+
+    async def take(self) -> Rows:
+        token = uuid.uuid4().hex
+        async with self.redis_server.get_redis() as redis:
+            if not await redis.set(self._key("lock"), token, nx=True, px=int(self.lock_timeout * 1000)):
+                # 其他进程正在刷写
+                return {}
+            self._token = token
+            try:
+                rows = await self._take(redis)
+            except BaseException:
+                await self._release(redis)
+                raise
+            if not rows:
+                await self._release(redis)
+                return rows
+        self._renew_task = asyncio.ensure_future(self._renew(token))
+        return rows
+
+    async def _take(self, redis) -> Rows:
+        before = self._pending
+        columns = await self._columns(redis)
+        if not columns:
+            return {}
+        flushing = [self._key(c) + ":flushing" for c in columns]
+        self._flushing_keys = flushing
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in flushing:
+                pipe.hgetall(key)
+            leftover = await pipe.execute()
+        if any(leftover):
+            # 上一次刷写未完成（失败或进程中断），先重试这一批，保持更新的先后顺序
+            rows = self._decode(columns, leftover)
+            self._flushing = len(rows)
+            return rows
+        async with redis.pipeline(transaction=True) as pipe:
+            for column, key in zip(columns, flushing):
+                pipe.renamenx(self._key(column), key)
+            for key in flushing:
+                pipe.hgetall(key)
+            # 不存在的列哈希改名会报错，不影响其他命令
+            results = await pipe.execute(raise_on_error=False)
+        rows = self._decode(columns, [r if isinstance(r, dict) else {} for r in results[len(columns):]])
+        # 取出期间新写入的更新留在 _pending 中
+        self._pending = max(0, self._pending - before)
+        self._flushing = len(rows)
+        return rows
+
+    async def _renew(self, token: str) -> None:
+        """
+        刷写期间定期续期刷写锁，刷写耗时超过 lock_timeout 时其他进程也不会接手同一批
+        """
+        while True:
+            await asyncio.sleep(self.lock_timeout / 3)
+            try:
+                async with self.redis_server.get_redis() as redis:
+                    renewed = await redis.eval(_LOCK_RENEW_SCRIPT, 1, self._key("lock"), token,
+                                               int(self.lock_timeout * 1000))
+            except Exception as e:
+                logger.warning(f"写后缓冲刷写锁续期失败: {self.namespace} | {str(e)}")
+                continue
+            if not renewed:
+                logger.warning(f"写后缓冲刷写锁已失效（被其他进程取得），本次刷写完成后不删除数据: {self.namespace}")
+                return
+
+    async def _release(self, redis, *keys: str) -> bool:
+        """
+        令牌一致时删除刷写锁及 keys
+        @returns {bool} 是否仍持有锁并已删除
+        """
+        token, self._token = self._token, None
+        if self._renew_task is not None:
+            self._renew_task.cancel()
+            self._renew_task = None
+        if token is None:
+            return False
+        return bool(await redis.eval(_LOCK_RELEASE_SCRIPT, 1 + len(keys), self._key("lock"), *keys, token))
+
+    async def _columns(self, redis) -> List[str]:
+        return [c.decode() if isinstance(c, bytes) else c for c in await redis.smembers(self._key("columns"))]
+
+    @staticmethod
+    def _decode(columns: List[str], hashes: List[Dict[bytes, bytes]]) -> Rows:
+        rows: Rows = {}
+        for column, mapping in zip(columns, hashes):
+            for field, value in (mapping or {}).items():
+                rows.setdefault(decode_value(field), {})[column] = decode_value(value)
+        return rows
+
+    async def done(self) -> None:
+        async with self.redis_server.get_redis() as redis:
+            if not await self._release(redis, *self._flushing_keys):
+                # 锁已被其他进程取得，它会重试同一批（按主键覆盖写，结果相同），这里不能删除它的锁和数据
+                logger.warning(f"写后缓冲刷写完成时已不持有刷写锁: {self.namespace}")
+        self._flushing = 0
+
+    async def failed(self) -> None:
+        # :flushing 哈希保留在Redis中，下次刷写重试，仍计入 pending
+        async with self.redis_server.get_redis() as redis:
+            await self._release(redis)
+
+
+class WriteBehind:
+    """
+    写后缓冲（write-behind）：按主键更新先写入缓冲并立即返回，同一主键的多次更新按列后写覆盖合并，
+    缓冲行数达到 flush_size 或每隔 flush_interval 秒由后台任务批量刷写：每批一条按主键 CASE 的多行 UPDATE，
+    一次刷写的所有批次在一个事务中提交，提交后使该表的查询缓存失效
+    - 缓冲中的更新在刷写前对读不可见，只适用于允许短暂延迟可见的字段（如计数、最后访问时间、展示名）
+    - 缓冲行数达到 max_pending 时 update 等待刷写腾出空间，最多等待 max_wait 秒，仍满则抛出 Overloaded
+    - close() 停止后台任务并刷写剩余更新，应在应用关闭时调用
+    所有方法都在事件循环线程中调用，无需加锁
+    """
+
+    def __init__(self, server, table: str, key: str = "id", store=None, flush_size: int = 500,
+                 flush_interval: float = 1.0, max_pending: int = 10000, max_wait: float = 5.0):
+        """
+        @param {AsyncMySQLServer} server - 执行刷写的数据库服务
+        @param {str} table - 表名
+        @param {str} key - 主键列名
+        @param {MemoryStore | RedisStore} store - 缓冲存储，默认进程内 MemoryStore
+        @param {int} flush_size - 缓冲行数达到该值时立即刷写，同时也是每条 UPDATE 的最多行数
+        @param {float} flush_interval - 定时刷写间隔秒数
+        @param {int} max_pending - 缓冲行数上限（背压）
+        @param {float} max_wait - 缓冲已满时 update 最长等待秒数
+        """
+        self.server = server
+        self.table = check_identifier(table)
+        self.key = check_identifier(key)
+        self.store = store if store is not None else MemoryStore()
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max(self.flush_size, max_pending)
+        self.max_wait = max_wait
+        self._columns: set = set()
+        self._lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flushed: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.updates = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.statements = 0
+        self.errors = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def pending(self) -> int:
+        return self.store.pending
+
+    def _start(self) -> None:
+        if self._task is None or self._task.done():
+            self._lock = self._lock or asyncio.Lock()
+            self._wakeup = self._wakeup or asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def update(self, key_value: Hashable, values: Dict[str, Any]) -> None:
+        """
+        缓冲一次按主键的更新，等价于 UPDATE table SET 列 = 值 ... WHERE key = key_value（延迟执行）
+        @param {Hashable} key_value - 主键值
+        @param {Dict[str, Any]} values - 要更新的列及值
+        @throws {Overloaded} 缓冲已满且在 max_wait 秒内未能腾出空间
+        """
+        if self._closed:
+            raise RuntimeError(f"写后缓冲已关闭: {self.table}")
+        if not values:
+            return
+        for column in values:
+            if column not in self._columns:
+                self._columns.add(check_identifier(column))
+        self._start()
+        if self.pending >= self.max_pending:
+            await self._wait_for_room()
+        if await self.store.put(key_value, values):
+            self.coalesced += 1
+            WRITE_BEHIND_COALESCED.inc((self.table,))
+        self.updates += 1
+        WRITE_BEHIND_UPDATES.inc((self.table,))
+        if self.pending >= self.flush_size:
+            self._wakeup.set()
+
+    async def _wait_for_room(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while self.pending >= self.max_pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                self.rejected += 1
+                raise Overloaded(f"写入缓冲已满: {self.table}", math.ceil(self.flush_interval))
+            if self._flushed is None or self._flushed.done():
+                self._flushed = loop.create_future()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(asyncio.shield(self._flushed), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # 已记录日志及指标，缓冲中的更新保留到下次重试
+                await asyncio.sleep(min(self.flush_interval, 1.0))
+
+    async def flush(self) -> int:
+        """
+        立即刷写缓冲中的全部更新
+        @returns {int} 刷写的行数
+        """
+        self._lock = self._lock or asyncio.Lock()
+        async with self._lock:
+            rows = await self.store.take()
+            if not rows:
+                self._notify()
+                return 0
+            start = time.perf_counter()
+            try:
+                statements = await self._write(rows)
+            except BaseException as e:
+                await self.store.failed()
+                if not isinstance(e, asyncio.CancelledError):
+                    self.errors += 1
+                    WRITE_BEHIND_FLUSH_ERRORS.inc((self.table,))
+                    logger.error(f"写后缓冲刷写失败: {self.table} | 行数: {len(rows)} | {str(e)}")
+                raise
+            finally:
+                self._notify()
+            await self.store.done()
+            elapsed = time.perf_counter() - start
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            self.statements += statements
+            self.last_flush_ms = elapsed * 1000
+            WRITE_BEHIND_FLUSH_SECONDS.observe(elapsed, (self.table,))
+            WRITE_BEHIND_FLUSH_ROWS.observe(len(rows), (self.table,))
+            await self.server._invalidate_tables((self.table.lower(),))
+            return len(rows)
+
+    def _notify(self) -> None:
+        if self._flushed is not None and not self._flushed.done():
+            self._flushed.set_result(None)
+
+    def _batches(self, rows: Rows) -> List[Tuple[Tuple[str, ...], List[tuple]]]:
+        """
+        按更新的列分组后切块，每块用最后一行补齐到2的幂行，使语句种类有限（便于语句缓存及指纹统计）
+        """
+        groups: Dict[Tuple[str, ...], List[tuple]] = {}
+        for key_value, values in rows.items():
+            columns = tuple(sorted(values))
+            groups.setdefault(columns, []).append((key_value, *(values[c] for c in columns)))
+        max_params = max_params_for(self.server.engine.dialect)
+        batches = []
+        for columns, items in groups.items():
+            size = self.flush_size
+            if max_params:
+                size = max(1, min(size, max_params // (2 * len(columns) + 1)))
+            for chunk in split_values(items, size):
+                padded = min(size, 1 << (len(chunk) - 1).bit_length())
+                batches.append((columns, list(chunk) + [chunk[-1]] * (padded - len(chunk))))
+        return batches
+
+    async def _write(self, rows: Rows) -> int:
+        dialect = self.server.engine.dialect
+        batches = self._batches(rows)
+        async with self.server.get_db() as db:
+            conn = await db.connection()
+            for columns, chunk in batches:
+                sql_query = build_case_update_sql(self.table, self.key, columns, len(chunk), dialect)
+                params = [v for i in range(len(columns)) for item in chunk for v in (item[0], item[i + 1])]
+                params.extend(item[0] for item in chunk)
+                start = time.perf_counter()
+                result = await conn.exec_driver_sql(sql_query, tuple(params))
+                self.server._observe(sql_query, None, start, result.rowcount)
+            await db.commit()
+        return len(batches)
+
+    async def close(self) -> None:
+        """
+        停止后台刷写任务并刷写剩余更新
+        """
+        self._closed = True
+        if self._task is not None:
+            # 唤醒后台任务，等它完成进行中的刷写后退出
+            self._wakeup.set()
+            try:
+                await self._task
+            except Exception:
+                pass
+            self._task = None
+        try:
+            rows = await self.flush()
+            if rows:
+                logger.info(f"写后缓冲关闭时刷写: {self.table} | 行数: {rows}")
+        except Exception:
+            logger.error(f"写后缓冲关闭时刷写失败，剩余 {self.pending} 行未写入: {self.table}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        写后缓冲统计
+        @returns {Dict[str, Any]} 缓冲行数、更新/合并次数、刷写次数/行数/语句数、失败及被拒绝次数、上次刷写耗时
+        """
+        return {
+            "pending": self.pending,
+            "updates": self.updates,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "statements": self.statements,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }